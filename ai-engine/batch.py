@@ -0,0 +1,372 @@
+"""
+Batch plagiarism and AI-detection scanning for many documents at once.
+
+Work is shared across the whole batch:
+- identical sentences (plagiarism) and identical paragraphs (AI detection) are
+  analyzed once and the result fanned out to every document containing them
+- all documents draw from a single web-search and LLM budget
+- submitted documents are cross-compared with each other for collusion
+Results are yielded per document as soon as its last piece of work finishes,
+so the endpoint can stream them back as NDJSON. Results built from a failed
+search or LLM call are marked `"degraded": True`.
+"""
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import zip_longest
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from incremental import aggregate_ai_detection, paragraph_hash, split_paragraphs
+
+SHINGLE_SIZE = 5
+COLLUSION_THRESHOLD = 0.2
+SENTENCES_PER_DOCUMENT = 5
+MIN_TEXT_CHARS = 50
+
+
+class BatchBudget:
+    """Thread-safe counters for the search and LLM calls a batch may spend."""
+
+    def __init__(self, max_searches: int, max_llm_calls: int):
+        self.searches_left = max(0, max_searches)
+        self.llm_calls_left = max(0, max_llm_calls)
+        self.searches_used = 0
+        self.llm_calls_used = 0
+        self._lock = threading.Lock()
+
+    def take_search(self) -> bool:
+        with self._lock:
+            if self.searches_left <= 0:
+                return False
+            self.searches_left -= 1
+            self.searches_used += 1
+            return True
+
+    def take_llm_call(self) -> bool:
+        with self._lock:
+            if self.llm_calls_left <= 0:
+                return False
+            self.llm_calls_left -= 1
+            self.llm_calls_used += 1
+            return True
+
+
+def ndjson_line(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def normalize_sentence(sentence: str) -> str:
+    return " ".join(re.findall(r'\w+', sentence.lower()))
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def find_collusion(documents: List[Tuple[str, str]], threshold: float = COLLUSION_THRESHOLD) -> List[dict]:
+    """
+    Cross-compare documents using word 5-gram shingles.
+    An inverted index over shingles means only pairs that share text are scored.
+    """
+    shingle_sets = [_shingles(text) for _, text in documents]
+    index: Dict[str, List[int]] = {}
+    for doc_index, shingles in enumerate(shingle_sets):
+        for shingle in shingles:
+            index.setdefault(shingle, []).append(doc_index)
+
+    shared_counts: Dict[Tuple[int, int], int] = {}
+    for doc_indexes in index.values():
+        if len(doc_indexes) < 2:
+            continue
+        for i, a in enumerate(doc_indexes):
+            for b in doc_indexes[i + 1:]:
+                shared_counts[(a, b)] = shared_counts.get((a, b), 0) + 1
+
+    pairs = []
+    for (a, b), shared in shared_counts.items():
+        size_a, size_b = len(shingle_sets[a]), len(shingle_sets[b])
+        overlap = shared / max(min(size_a, size_b), 1)
+        if overlap < threshold:
+            continue
+        pairs.append({
+            "documents": [documents[a][0], documents[b][0]],
+            "similarity": int(shared / max(size_a + size_b - shared, 1) * 100),
+            "overlap": int(overlap * 100)
+        })
+
+    pairs.sort(key=lambda p: p["overlap"], reverse=True)
+    return pairs
+
+
+def _collusion_for(doc_id: str, pairs: List[dict]) -> List[dict]:
+    matches = []
+    for pair in pairs:
+        if doc_id in pair["documents"]:
+            other = pair["documents"][1] if pair["documents"][0] == doc_id else pair["documents"][0]
+            matches.append({"id": other, "similarity": pair["similarity"], "overlap": pair["overlap"]})
+    return matches
+
+
+def iter_plagiarism_batch(documents: List[Tuple[str, str]],
+                          split_fn: Callable[[str], List[str]],
+                          search_fn: Callable[[str], Optional[dict]],
+                          fallback_fn: Callable[[str], Optional[int]],
+                          budget: BatchBudget,
+                          search_available: bool = True,
+                          workers: int = 3,
+                          collusion: bool = True) -> Iterator[dict]:
+    """
+    Yield one {"type": "result", "id", "result"} item per document, then a
+    {"type": "summary"} item.
+
+    split_fn(text) returns the candidate sentences of a document,
+    search_fn(sentence) returns a match dict or None; fallback_fn(text) returns
+    an LLM-estimated score (None on failure) for documents that got no web search.
+    """
+    pairs = find_collusion(documents) if collusion else []
+
+    # Deduplicate sentences across the batch, keeping round-robin order so the
+    # shared search budget is spread fairly over all documents.
+    doc_sentences: Dict[str, List[str]] = {}
+    for doc_id, text in documents:
+        sentences = split_fn(text) if len(text) >= MIN_TEXT_CHARS else []
+        doc_sentences[doc_id] = sentences[:SENTENCES_PER_DOCUMENT]
+
+    sentence_docs: Dict[str, List[str]] = {}
+    sentence_text: Dict[str, str] = {}
+    for row in zip_longest(*[[(doc_id, s) for s in sentences] for doc_id, sentences in doc_sentences.items()]):
+        for item in row:
+            if item is None:
+                continue
+            doc_id, sentence = item
+            key = normalize_sentence(sentence)
+            sentence_text.setdefault(key, sentence)
+            if doc_id not in sentence_docs.setdefault(key, []):
+                sentence_docs[key].append(doc_id)
+
+    matches: Dict[str, Optional[dict]] = {}
+    checked: Dict[str, bool] = {}
+    failed: Dict[str, bool] = {}
+    pending = {doc_id: 0 for doc_id, _ in documents}
+    texts = dict(documents)
+
+    def finalize(doc_id: str) -> dict:
+        text = texts[doc_id]
+        if len(text) < MIN_TEXT_CHARS:
+            result = {"score": 0, "flaggedSentences": [], "suggestions": ["Text too short to analyze."]}
+            return {"type": "result", "id": doc_id, "result": result}
+
+        keys = [normalize_sentence(s) for s in doc_sentences[doc_id]]
+        checked_keys = [k for k in keys if checked.get(k)]
+        failed_keys = [k for k in keys if failed.get(k)]
+        flagged = []
+        for key in checked_keys:
+            if matches.get(key):
+                flagged.append({"id": len(flagged) + 1, **matches[key]})
+
+        suggestions = []
+        degraded = bool(failed_keys)
+        if checked_keys:
+            score = int(len(flagged) / len(checked_keys) * 100)
+        elif budget.take_llm_call():
+            score = fallback_fn(text)
+            if score is None:
+                score = 10  # same default as a failed single-document estimate
+                degraded = True
+        else:
+            score = 0
+            degraded = True
+            suggestions.append("Skipped: batch search and LLM budget exhausted.")
+
+        if flagged:
+            suggestions.insert(0, f"Found {len(flagged)} potential matches from web sources.")
+        elif checked_keys:
+            suggestions.insert(0, "No exact matches found in web search.")
+        if failed_keys:
+            suggestions.append(f"{len(failed_keys)} sentence searches failed; score based on the rest.")
+
+        result = {
+            "score": min(score, 100),
+            "flaggedSentences": flagged,
+            "suggestions": suggestions,
+            "checkedSentences": len(checked_keys),
+            "sharedSentences": [sentence_text[k] for k in keys if len(sentence_docs.get(k, [])) > 1]
+        }
+        if collusion:
+            result["collusion"] = _collusion_for(doc_id, pairs)
+        if failed_keys:
+            result["searchErrors"] = len(failed_keys)
+        if degraded:
+            result["degraded"] = True
+        return {"type": "result", "id": doc_id, "result": result}
+
+    def search(key: str):
+        try:
+            matches[key] = search_fn(sentence_text[key])
+            checked[key] = True
+        except Exception as e:
+            # Not "checked, no match": reported as a search error instead
+            print(f"Search error for sentence: {e}")
+            failed[key] = True
+        return key
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        if search_available:
+            for key, doc_ids in sentence_docs.items():
+                if not budget.take_search():
+                    break
+                for doc_id in doc_ids:
+                    pending[doc_id] += 1
+                futures.append(executor.submit(search, key))
+
+        # Documents with nothing to wait for are reported straight away
+        for doc_id, _ in documents:
+            if pending[doc_id] == 0:
+                yield finalize(doc_id)
+
+        for future in as_completed(futures):
+            key = future.result()
+            for doc_id in sentence_docs[key]:
+                pending[doc_id] -= 1
+                if pending[doc_id] == 0:
+                    yield finalize(doc_id)
+
+    summary = {
+        "type": "summary",
+        "stats": {
+            "documents": len(documents),
+            "sentences": sum(len(s) for s in doc_sentences.values()),
+            "uniqueSentences": len(sentence_docs),
+            "searches": budget.searches_used,
+            "searchErrors": len(failed),
+            "llmCalls": budget.llm_calls_used
+        }
+    }
+    if collusion:
+        summary["collusion"] = pairs
+    yield summary
+
+
+def stream_plagiarism_batch(documents: List[Tuple[str, str]],
+                            split_fn: Callable[[str], List[str]],
+                            search_fn: Callable[[str], Optional[dict]],
+                            fallback_fn: Callable[[str], Optional[int]],
+                            budget: BatchBudget,
+                            search_available: bool = True,
+                            workers: int = 3) -> Iterator[str]:
+    """NDJSON lines of `iter_plagiarism_batch` (one per document, then a summary)."""
+    for item in iter_plagiarism_batch(documents, split_fn, search_fn, fallback_fn, budget,
+                                      search_available=search_available, workers=workers):
+        yield ndjson_line(item)
+
+
+def stream_ai_detection_batch(documents: List[Tuple[str, str]],
+                              paragraph_fn: Callable[[str], dict],
+                              verdict_fn: Callable[[str, dict], dict],
+                              budget: BatchBudget,
+                              workers: int = 3) -> Iterator[str]:
+    """
+    Yield one NDJSON result line per document, then a summary line.
+
+    paragraph_fn(paragraph) is the local (no LLM) analysis of one paragraph;
+    it runs once per unique paragraph of the batch, in parallel. A document's
+    paragraph results are aggregated as soon as they are all in, then
+    verdict_fn(text, aggregate) adds the LLM verdict while the shared budget
+    lasts; otherwise the aggregate is the result.
+    """
+    texts = dict(documents)
+    doc_paragraphs: Dict[str, List[str]] = {}
+    paragraph_text: Dict[str, str] = {}
+    paragraph_docs: Dict[str, List[str]] = {}
+    for doc_id, text in documents:
+        digests = []
+        for paragraph in split_paragraphs(text) if len(text) >= MIN_TEXT_CHARS else []:
+            digest = paragraph_hash(paragraph)
+            digests.append(digest)
+            paragraph_text.setdefault(digest, paragraph)
+            if doc_id not in paragraph_docs.setdefault(digest, []):
+                paragraph_docs[digest].append(doc_id)
+        doc_paragraphs[doc_id] = digests
+
+    paragraph_results: Dict[str, dict] = {}
+    paragraph_errors: Dict[str, str] = {}
+    pending = {doc_id: len(set(digests)) for doc_id, digests in doc_paragraphs.items()}
+    errors = 0
+
+    def result_line(doc_id: str, result: dict) -> str:
+        return ndjson_line({"type": "result", "id": doc_id, "result": result})
+
+    def error_line(doc_id: str, error: str) -> str:
+        nonlocal errors
+        errors += 1
+        return ndjson_line({"type": "result", "id": doc_id, "error": error})
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+
+        def complete(doc_id: str) -> Optional[str]:
+            """Aggregate a document; the line to yield now, or None if its verdict was queued."""
+            digests = doc_paragraphs[doc_id]
+            if not digests:
+                return result_line(doc_id, {"score": 0, "analysis": "Text too short to analyze.", "llmAssessed": False})
+            failed = [paragraph_errors[d] for d in digests if d in paragraph_errors]
+            if failed:
+                return error_line(doc_id, failed[0])
+            aggregate = aggregate_ai_detection([len(paragraph_text[d]) for d in digests],
+                                               [paragraph_results[d] for d in digests])
+            if budget.take_llm_call():
+                futures[executor.submit(verdict_fn, texts[doc_id], aggregate)] = ("verdict", doc_id)
+                return None
+            return result_line(doc_id, {**aggregate, "llmAssessed": False})
+
+        for digest in paragraph_text:
+            futures[executor.submit(paragraph_fn, paragraph_text[digest])] = ("paragraph", digest)
+        for doc_id, _ in documents:
+            if pending[doc_id] == 0:
+                line = complete(doc_id)
+                if line is not None:
+                    yield line
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, key = futures.pop(future)
+                if kind == "verdict":
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # One failing document must not end the stream for the rest
+                        print(f"AI detection error in batch: {e}")
+                        yield error_line(key, str(e))
+                        continue
+                    yield result_line(key, {**result, "llmAssessed": not result.get("degraded")})
+                    continue
+
+                try:
+                    paragraph_results[key] = future.result()
+                except Exception as e:
+                    print(f"AI detection error in batch: {e}")
+                    paragraph_errors[key] = str(e)
+                for doc_id in paragraph_docs[key]:
+                    pending[doc_id] -= 1
+                    if pending[doc_id] == 0:
+                        line = complete(doc_id)
+                        if line is not None:
+                            yield line
+
+    yield ndjson_line({
+        "type": "summary",
+        "stats": {
+            "documents": len(documents),
+            "paragraphs": sum(len(d) for d in doc_paragraphs.values()),
+            "uniqueParagraphs": len(paragraph_text),
+            "errors": errors,
+            "llmCalls": budget.llm_calls_used
+        }
+    })
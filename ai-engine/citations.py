@@ -0,0 +1,280 @@
+"""
+Rule-based citation parsing and IEEE formatting.
+
+Common APA, MLA, Chicago and IEEE citations are parsed into the same fields
+the Node `Reference` model stores (authors, title, journal, volume, issue,
+pages, year, publisher, doi, url) and rendered as IEEE locally. `parse_citation`
+returns None when a citation doesn't match any known shape, so the caller can
+fall back to the LLM for just those entries.
+"""
+import re
+from typing import List, Optional
+
+DOI_RE = re.compile(r'(?:https?://(?:dx\.)?doi\.org/|doi:\s*)?(10\.\d{4,9}/[^\s,;]+)', re.IGNORECASE)
+URL_RE = re.compile(r'(?:Retrieved from\s+|Available(?: at)?:\s*)?(https?://\S+)', re.IGNORECASE)
+YEAR_RE = re.compile(r'\b(1[5-9]\d{2}|20\d{2})[a-z]?\b')
+PAGES_RE = re.compile(r'\b(?:pp?\.\s*)?(\d+)\s*[-–—]\s*(\d+)\b')
+NUMBERING_RE = re.compile(r'^\s*(?:\[\d+\]|\d+[.)])\s*')
+
+# "Smith, J. A." style author (APA)
+APA_AUTHOR_RE = re.compile(r"([A-Z][\w'’\-]+(?:\s+[A-Z][\w'’\-]+)*),\s*((?:[A-Z]\.\s*-?\s*)+)")
+
+
+def split_reference_list(text: str) -> List[str]:
+    """Split a pasted reference section into one citation per entry."""
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.upper() in ("REFERENCES", "BIBLIOGRAPHY", "WORKS CITED"):
+            continue
+        if entries and not NUMBERING_RE.match(line) and not re.match(r'^[A-Z][\w\'’\-]+,', line):
+            # Wrapped continuation of the previous entry
+            entries[-1] += " " + line
+        else:
+            entries.append(line)
+    return [NUMBERING_RE.sub("", e) for e in entries]
+
+
+def _clean(value: str) -> str:
+    return value.strip(" \t\n.,;:")
+
+
+def _initials(given: str) -> str:
+    parts = re.split(r'[\s.]+', given.strip())
+    initials = []
+    for part in parts:
+        if not part:
+            continue
+        if "-" in part:
+            initials.append("-".join(p[0] + "." for p in part.split("-") if p))
+        else:
+            initials.append(part[0] + ".")
+    return " ".join(initials)
+
+
+def _ieee_name(last: str, given: str) -> str:
+    initials = _initials(given)
+    return f"{initials} {last}".strip()
+
+
+def _parse_apa_authors(authors: str) -> List[str]:
+    names = [_ieee_name(m.group(1), m.group(2)) for m in APA_AUTHOR_RE.finditer(authors)]
+    if not names and authors.strip():
+        # Organization as author
+        names = [_clean(authors)]
+    return names
+
+
+def _parse_full_name_authors(authors: str) -> List[str]:
+    """MLA/Chicago authors: "Smith, John, and Jane Doe" or "Smith, John, et al." """
+    authors = _clean(authors)
+    et_al = bool(re.search(r'\bet al\b', authors))
+    authors = re.sub(r',?\s*et al\.?', '', authors)
+    parts = [p.strip() for p in re.split(r',?\s+and\s+|\s*&\s*', authors) if p.strip()]
+    if not parts:
+        return []
+
+    names = []
+    first = parts[0]
+    if "," in first:
+        # Inverted first author, possibly followed by more comma-separated names
+        pieces = [p.strip() for p in first.split(",")]
+        names.append(_ieee_name(pieces[0], pieces[1] if len(pieces) > 1 else ""))
+        rest = pieces[2:]
+    else:
+        rest = [first]
+    for name in rest + parts[1:]:
+        tokens = name.split()
+        if not tokens:
+            continue
+        names.append(_ieee_name(tokens[-1], " ".join(tokens[:-1])))
+    if et_al:
+        names.append("et al.")
+    return names
+
+
+def _parse_ieee_authors(authors: str) -> List[str]:
+    authors = _clean(authors)
+    parts = [p.strip() for p in re.split(r',\s*and\s+|\s+and\s+|,\s*', authors) if p.strip()]
+    return parts
+
+
+def _extract_locators(text: str, fields: dict) -> str:
+    """Pull DOI and URL out of a citation; returns the remaining text."""
+    doi = DOI_RE.search(text)
+    if doi:
+        fields["doi"] = doi.group(1).rstrip(".")
+        text = text[:doi.start()] + text[doi.end():]
+    url = URL_RE.search(text)
+    if url:
+        fields["url"] = url.group(1).rstrip(".")
+        text = text[:url.start()] + text[url.end():]
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _parse_venue(rest: str, fields: dict) -> None:
+    """Parse the part after the title: journal, volume, issue, pages, publisher."""
+    rest = _clean(rest)
+    if not rest:
+        return
+
+    pages = PAGES_RE.search(rest)
+    if pages:
+        fields["pages"] = f"{pages.group(1)}-{pages.group(2)}"
+        before, after = rest[:pages.start()], rest[pages.end():]
+        enclosed = re.search(r'\(\s*$', before) and re.match(r'\s*\)', after)
+        if enclosed:
+            # APA chapter "In Book title (pp. 1-10). Publisher.": drop the
+            # parentheses with the range; what follows them is the publisher
+            publisher = _clean(after[enclosed.end():])
+            if publisher:
+                fields["publisher"] = publisher
+            rest = before[:before.rindex("(")]
+        else:
+            rest = before + after
+
+    # MLA/IEEE style "vol. 12, no. 3"
+    volume = re.search(r'\bvol\.\s*(\w+)', rest, re.IGNORECASE)
+    issue = re.search(r'\bno\.\s*(\w+)', rest, re.IGNORECASE)
+    # APA style "12(3)" / Chicago style "12, no. 3"
+    apa_volume = re.search(r'\b(\d+)\s*\((\w+)\)', rest)
+    chicago_volume = re.search(r'\b(\d+)\s*,\s*no\.', rest)
+    if volume:
+        fields["volume"] = volume.group(1)
+    elif apa_volume:
+        fields["volume"] = apa_volume.group(1)
+        fields.setdefault("issue", apa_volume.group(2))
+    elif chicago_volume:
+        fields["volume"] = chicago_volume.group(1)
+    if issue:
+        fields["issue"] = issue.group(1)
+
+    cut = len(rest)
+    for match in (volume, issue, apa_volume, chicago_volume, re.search(r'\(\s*\d{4}\s*\)', rest), YEAR_RE.search(rest)):
+        if match:
+            cut = min(cut, match.start())
+    venue = _clean(rest[:cut])
+    if not fields.get("volume"):
+        trailing_volume = re.match(r'^(.*\D)\s+(\d+)$', venue)
+        if trailing_volume:
+            venue, fields["volume"] = _clean(trailing_volume.group(1)), trailing_volume.group(2)
+
+    # "In Proc. X" / "In Book title": a paper or chapter inside a larger work
+    container = re.match(r'^in\s+', venue, re.IGNORECASE)
+    if container:
+        venue = venue[container.end():]
+        fields["type"] = "chapter"
+    if venue:
+        if container or fields.get("volume") or fields.get("pages") or re.search(r'journal|proceedings|conference|transactions|review|letters', venue, re.IGNORECASE):
+            fields["journal"] = venue
+        else:
+            fields["publisher"] = venue
+
+
+def _parse_apa(text: str) -> Optional[dict]:
+    match = re.match(r'^(?P<authors>.+?)\s*\((?P<year>\d{4})[a-z]?(?:,[^)]*)?\)\.\s*(?P<rest>.+)$', text)
+    if not match:
+        return None
+    fields = {"authors": _parse_apa_authors(match.group("authors")), "year": match.group("year")}
+    rest = match.group("rest")
+    title = re.match(r'^(?P<title>.+?[.?!])\s+(?P<venue>[A-Z].*)$', rest)
+    if title:
+        fields["title"] = _clean(title.group("title")) if title.group("title").endswith(".") else title.group("title").strip()
+        _parse_venue(title.group("venue"), fields)
+    else:
+        fields["title"] = _clean(rest)
+    return fields
+
+
+def _parse_quoted(text: str) -> Optional[dict]:
+    """MLA, Chicago and IEEE all put the title in quotes."""
+    match = re.match(r'^(?P<authors>.+?)[.,]\s*["“](?P<title>.+?)["”]\s*(?P<rest>.*)$', text)
+    if not match:
+        return None
+    authors = match.group("authors")
+    fields = {"title": _clean(match.group("title"))}
+    if re.search(r'\b[A-Z]\.\s*[A-Z][a-z]', authors) and not re.match(r'^[^,]+,\s*[A-Z][a-z]', authors):
+        # IEEE input: "J. Smith and A. Doe"
+        fields["authors"] = _parse_ieee_authors(authors)
+    else:
+        fields["authors"] = _parse_full_name_authors(authors)
+
+    rest = match.group("rest")
+    years = YEAR_RE.findall(rest)
+    if years:
+        fields["year"] = years[-1]
+        rest = re.sub(r'\(?\b' + years[-1] + r'[a-z]?\b\)?:?', '', rest, count=1)
+    _parse_venue(rest, fields)
+    return fields
+
+
+def parse_citation(citation: str, source_format: str = "") -> Optional[dict]:
+    """
+    Parse a citation into structured fields.
+    Returns None when the citation can't be parsed reliably.
+    """
+    text = NUMBERING_RE.sub("", citation.strip())
+    if not text:
+        return None
+
+    fields = {}
+    text = _extract_locators(text, fields)
+
+    parsers = [_parse_apa, _parse_quoted]
+    if source_format.upper() in ("MLA", "CHICAGO", "IEEE"):
+        parsers.reverse()
+
+    for parser in parsers:
+        parsed = parser(text)
+        if parsed and parsed.get("authors") and parsed.get("title") and (parsed.get("year") or parsed.get("journal") or parsed.get("publisher")):
+            return {**fields, **parsed}
+    return None
+
+
+def _join_authors(authors: List[str]) -> str:
+    if not authors:
+        return ""
+    if len(authors) > 6 or (authors[-1] == "et al."):
+        return f"{authors[0]} et al."
+    if len(authors) == 1:
+        return authors[0]
+    if len(authors) == 2:
+        return f"{authors[0]} and {authors[1]}"
+    return ", ".join(authors[:-1]) + ", and " + authors[-1]
+
+
+def format_ieee(fields: dict, number: Optional[int] = None) -> str:
+    """Render parsed fields as an IEEE reference."""
+    citation = f"[{number}] " if number is not None else ""
+    authors = _join_authors(fields.get("authors", []))
+    if authors:
+        citation += f"{authors}, "
+    citation += f"\"{fields.get('title', 'Untitled')},\""
+
+    parts = []
+    if fields.get("journal"):
+        parts.append(f"in {fields['journal']}" if fields.get("type") == "chapter" else fields["journal"])
+    if fields.get("publisher") and (fields.get("type") == "chapter" or not fields.get("journal")):
+        # Books and chapters name their publisher; journal articles don't
+        parts.append(fields["publisher"])
+    if fields.get("volume"):
+        parts.append(f"vol. {fields['volume']}")
+    if fields.get("issue"):
+        parts.append(f"no. {fields['issue']}")
+    if fields.get("pages"):
+        parts.append(f"pp. {fields['pages']}")
+    if fields.get("year"):
+        parts.append(str(fields["year"]))
+
+    if parts:
+        citation += " " + ", ".join(parts) + "."
+    else:
+        citation = citation.rstrip(",\"") + ".\""
+
+    if fields.get("doi"):
+        citation += f" doi: {fields['doi']}."
+    elif fields.get("url"):
+        citation += f" [Online]. Available: {fields['url']}"
+        if fields.get("accessed"):
+            citation += f" (accessed {fields['accessed']})."
+    return citation
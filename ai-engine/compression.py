@@ -0,0 +1,149 @@
+"""
+Response compression for large text payloads (pure ASGI middleware).
+
+Negotiates `Accept-Encoding` (brotli when the optional `brotli` package is
+installed, else gzip) and compresses JSON/text responses above a size
+threshold. Streaming responses (NDJSON batches) are compressed chunk by chunk
+with a sync flush after every chunk, so clients still receive each line as
+soon as it is produced.
+"""
+import zlib
+from typing import List, Optional, Tuple
+
+from warmup import lazy_import
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """{"gzip": 1.0, "br": 0.8, ...} from an Accept-Encoding header."""
+    weights = {}
+    for part in header.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for field in fields[1:]:
+            if field.startswith("q="):
+                try:
+                    q = float(field[2:])
+                except ValueError:
+                    q = 0.0
+        weights[fields[0].lower()] = q
+    return weights
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    weights = parse_accept_encoding(header or "")
+    candidates = ["br", "gzip"] if lazy_import("brotli") is not None else ["gzip"]
+    best = None
+    for encoding in candidates:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        brotli = lazy_import("brotli")
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def _encoder(encoding: str, level: int):
+    return _BrotliEncoder(level) if encoding == "br" else _GzipEncoder(level)
+
+
+class CompressionMiddleware:
+    """Compress JSON/text/NDJSON responses of at least `minimum_size` bytes."""
+
+    def __init__(self, app, minimum_size: int = 1024, level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self, encoding, send).run(scope, receive)
+
+
+class _CompressedResponse:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope, receive):
+        await self.middleware.app(scope, receive, self.wrapped_send)
+
+    def _compressible(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        values = {k.lower(): v for k, v in headers}
+        if b"content-encoding" in values:
+            return False
+        content_type = values.get(b"content-type", b"").decode("latin-1")
+        return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+    def _headers(self, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [(k, v) for k, v in self.start["headers"] if k.lower() != b"content-length"]
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b"Accept-Encoding"))
+        return headers
+
+    async def wrapped_send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not self._compressible(self.start.get("headers", [])) or (
+                    not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.encoder = _encoder(self.encoding, self.middleware.level)
+            if not more_body:
+                # Whole response in one message: compress it in one go
+                compressed = self.encoder.finish(body)
+                await self.send({**self.start, "headers": self._headers(len(compressed))})
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self.send({**self.start, "headers": self._headers(None)})
+
+        data = self.encoder.chunk(body) if more_body else self.encoder.finish(body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,338 @@
+"""
+Local spelling and grammar checks with offset-anchored results.
+
+Spelling uses a SymSpell-style symmetric-delete index over an English word
+list plus an academic supplement (data/*.txt). Dictionary words are indexed
+with their single-character deletes and queries expand up to two deletes, so
+most edits of distance 1-2 are found with a few dict lookups instead of a
+scan of the vocabulary.
+
+Grammar rules cover repeated words, a/an agreement, punctuation spacing and
+capitalization. Every error carries `offset`/`length` into the checked text.
+Words that are unknown but have no confident correction are reported as
+unresolved, so the caller can send only those paragraphs to the LLM.
+"""
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DICTIONARY_FILES = ("english_words.txt", "academic_words.txt")
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Points lost per error per 100 words, by error type
+ERROR_WEIGHTS = {"spelling": 4, "grammar": 5, "capitalization": 3, "punctuation": 2}
+
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z'’-]*[A-Za-z]|[A-Za-z]")
+URL_RE = re.compile(r'https?://\S+|www\.\S+|\S+@\S+\.\w+|doi:\s*\S+', re.IGNORECASE)
+
+# Correct repetitions ("had had", "that that") are left alone
+ALLOWED_REPEATS = {"had", "that", "is", "do", "very", "so", "bye", "ha"}
+ABBREVIATIONS = {"e.g", "i.e", "al", "etc", "vs", "fig", "figs", "eq", "eqs", "cf", "approx", "no",
+                 "vol", "pp", "dr", "mr", "mrs", "ms", "prof", "sec", "ref", "refs", "ch"}
+# a/an follows pronunciation, not spelling
+AN_CONSONANT_LETTER = ("hour", "honest", "honor", "honour", "heir")
+A_VOWEL_LETTER = ("uni", "use", "usu", "uti", "ubi", "uro", "eu", "one", "once", "ewe")
+VOWEL_SOUND_LETTERS = set("AEFHILMNORSX")
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _deletes(word: str, depth: int) -> set:
+    """All strings reachable by deleting up to `depth` characters."""
+    results = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w)) if len(w) > 1}
+        results |= frontier
+    return results
+
+
+class SymSpell:
+    """
+    Symmetric-delete spelling index. Dictionary words are stored with their
+    1-deletes (of the first PREFIX_LENGTH chars); lookups expand the query by
+    up to MAX_EDIT_DISTANCE deletes and verify candidates by edit distance.
+    """
+
+    def __init__(self):
+        self.words: Dict[str, int] = {}  # word -> rank (0 = most frequent)
+        self._deletes: Dict[str, List[str]] = {}
+
+    def add(self, word: str) -> None:
+        if word in self.words:
+            return
+        self.words[word] = len(self.words)
+        for delete in _deletes(word[:PREFIX_LENGTH], 1):
+            self._deletes.setdefault(delete, []).append(word)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def lookup(self, word: str, max_distance: int = MAX_EDIT_DISTANCE) -> List[Tuple[str, int]]:
+        """(suggestion, distance) pairs, closest then most frequent first."""
+        if word in self.words:
+            return [(word, 0)]
+        candidates = set()
+        for delete in _deletes(word[:PREFIX_LENGTH], max_distance):
+            candidates.update(self._deletes.get(delete, ()))
+        suggestions = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                suggestions.append((candidate, distance))
+        suggestions.sort(key=lambda item: (item[1], self.words[item[0]]))
+        return suggestions
+
+
+_index: Optional[SymSpell] = None
+_index_lock = threading.Lock()
+
+
+def get_spell_index() -> SymSpell:
+    """Spelling index, built from the bundled word lists on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = SymSpell()
+                for name in DICTIONARY_FILES:
+                    path = os.path.join(DATA_DIR, name)
+                    if not os.path.exists(path):
+                        print(f"⚠️  Grammar dictionary missing: {path}")
+                        continue
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            line = line.strip().lower()
+                            if line and not line.startswith("#"):
+                                index.add(line)
+                _index = index
+    return _index
+
+
+def _error(offset: int, text: str, error_type: str, rule: str, message: str, suggestions: List[str]) -> dict:
+    return {
+        "offset": offset,
+        "length": len(text),
+        "text": text,
+        "type": error_type,
+        "rule": rule,
+        "message": message,
+        "suggestions": suggestions
+    }
+
+
+def _known(word: str, index: SymSpell, document_words: set) -> bool:
+    if word in index or word in document_words:
+        return True
+    # Inflections of known words, possessives, hyphenated compounds
+    for suffix, replacement in (("'s", ""), ("’s", ""), ("s", ""), ("es", ""), ("ed", ""), ("ed", "e"),
+                                ("ing", ""), ("ing", "e"), ("ly", ""), ("ies", "y")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if word[:-len(suffix)] + replacement in index:
+                return True
+    if "-" in word:
+        return all(part in index or len(part) <= 2 for part in word.split("-") if part)
+    return False
+
+
+def check_spelling(text: str, skip: List[Tuple[int, int]]) -> Tuple[List[dict], List[dict]]:
+    """Returns (errors, unresolved) where unresolved are unknown words without a confident fix."""
+    index = get_spell_index()
+    tokens = [(m.start(), m.group()) for m in WORD_RE.finditer(text)]
+    # Terms used at least twice in the document are treated as domain vocabulary
+    counts: Dict[str, int] = {}
+    for _, token in tokens:
+        counts[token.lower()] = counts.get(token.lower(), 0) + 1
+    document_words = {w for w, c in counts.items() if c >= 2}
+
+    errors, unresolved = [], []
+    for offset, token in tokens:
+        if _in_spans(offset, skip):
+            continue
+        # Proper nouns, acronyms, identifiers and very short tokens are not spell-checked
+        if token[0].isupper() and not (offset == 0 or _sentence_start(text, offset)):
+            continue
+        if token.isupper() and len(token) > 1:
+            continue
+        if _identifier(text, offset, token):
+            continue
+        word = token.lower().replace("’", "'")
+        if len(word) <= 2 or _known(word, index, document_words):
+            continue
+        suggestions = index.lookup(word)
+        best = [s for s, d in suggestions if d == suggestions[0][1]] if suggestions else []
+        confident = suggestions and (suggestions[0][1] == 1 or (len(best) == 1 and len(word) > 4))
+        if confident:
+            fixes = [_match_case(token, s) for s, _ in suggestions[:3]]
+            errors.append(_error(offset, token, "spelling", "MORFOLOGIK_SPELLING",
+                                 f"Possible spelling mistake: '{token}'", fixes))
+        else:
+            unresolved.append({"offset": offset, "text": token,
+                               "suggestions": [_match_case(token, s) for s, _ in suggestions[:3]]})
+    return errors, unresolved
+
+
+def _identifier(text: str, offset: int, token: str) -> bool:
+    """
+    Model and metric names (mIoU, ResNet, GPT-4o, word2vec): internal
+    capitals or digits glued to the letters. Skipped like acronyms.
+    """
+    if any(c.isupper() for c in token[1:]):
+        return True
+    end = offset + len(token)
+    return (offset > 0 and text[offset - 1].isdigit()) or (end < len(text) and text[end].isdigit())
+
+
+def _match_case(original: str, suggestion: str) -> str:
+    if original[0].isupper():
+        return suggestion[0].upper() + suggestion[1:]
+    return suggestion
+
+
+def _in_spans(offset: int, spans: List[Tuple[int, int]]) -> bool:
+    return any(start <= offset < end for start, end in spans)
+
+
+def _sentence_start(text: str, offset: int) -> bool:
+    before = text[:offset].rstrip()
+    return not before or before[-1] in ".!?\n"
+
+
+def _previous_word_is_abbreviation(text: str, dot_offset: int) -> bool:
+    match = re.search(r'([A-Za-z.]+)$', text[:dot_offset])
+    return bool(match) and (match.group(1).lower().rstrip(".") in ABBREVIATIONS or len(match.group(1)) == 1)
+
+
+def check_rules(text: str, skip: List[Tuple[int, int]]) -> List[dict]:
+    errors = []
+
+    # Repeated words: "the the"
+    for match in re.finditer(r'\b(\w+)(\s+)(\1)\b', text, re.IGNORECASE):
+        word = match.group(1).lower()
+        if word in ALLOWED_REPEATS or word.isdigit() or _in_spans(match.start(), skip):
+            continue
+        errors.append(_error(match.start(), match.group(), "grammar", "WORD_REPETITION",
+                             f"Repeated word: '{match.group(1)}'", [match.group(1)]))
+
+    # a/an agreement
+    for match in re.finditer(r'\b([Aa]n?)\s+([A-Za-z][\w-]*)', text):
+        article, following = match.group(1), match.group(2)
+        if _in_spans(match.start(), skip):
+            continue
+        expected = _expected_article(following)
+        if expected and article.lower() != expected:
+            fixed = expected.capitalize() if article[0].isupper() else expected
+            errors.append(_error(match.start(1), article, "grammar", "EN_A_VS_AN",
+                                 f"Use '{fixed}' before '{following}'", [fixed]))
+
+    # Space before punctuation: "word ,"
+    for match in re.finditer(r'(?<=\w)([ \t]+)([,.;:!?])(?!\d)', text):
+        if _in_spans(match.start(), skip):
+            continue
+        errors.append(_error(match.start(), match.group(), "punctuation", "COMMA_PARENTHESIS_WHITESPACE",
+                             f"Remove the space before '{match.group(2)}'", [match.group(2)]))
+
+    # Missing space after punctuation: "word,next" / "end.Next"
+    for match in re.finditer(r'(?<=[a-z])([,;:!?])(?=[A-Za-z])|(?<=[a-z]{2})(\.)(?=[A-Z][a-z])', text):
+        if _in_spans(match.start(), skip):
+            continue
+        mark = match.group(1) or match.group(2)
+        if mark == "." and _previous_word_is_abbreviation(text, match.start()):
+            continue
+        errors.append(_error(match.start(), mark, "punctuation", "MISSING_SPACE_AFTER_PUNCTUATION",
+                             f"Add a space after '{mark}'", [mark + " "]))
+
+    # Multiple spaces between words
+    for match in re.finditer(r'(?<=\S)( {2,})(?=\S)', text):
+        if not _in_spans(match.start(), skip):
+            errors.append(_error(match.start(), match.group(), "punctuation", "WHITESPACE_RULE",
+                                 "Multiple spaces between words", [" "]))
+
+    # Sentence starting with a lowercase letter
+    for match in re.finditer(r'(?:^|(?<=[.!?])\s+|\n\s*)([a-z][a-z]*)', text):
+        offset = match.start(1)
+        if _in_spans(offset, skip):
+            continue
+        dot = text.rfind(".", 0, offset)
+        if dot != -1 and text[dot + 1:offset].strip() == "" and _previous_word_is_abbreviation(text, dot):
+            continue
+        word = match.group(1)
+        errors.append(_error(offset, word, "capitalization", "UPPERCASE_SENTENCE_START",
+                             "Sentence should start with a capital letter", [word.capitalize()]))
+
+    # Lowercase pronoun "i"
+    for match in re.finditer(r"(?<![\w.])i(?=\s|'m|'ve|'d|'ll)", text):
+        if not _in_spans(match.start(), skip):
+            errors.append(_error(match.start(), "i", "capitalization", "I_LOWERCASE",
+                                 "The pronoun 'I' is always capitalized", ["I"]))
+    return errors
+
+
+def _expected_article(word: str) -> Optional[str]:
+    if word.isupper() and len(word) > 1:
+        # Acronyms are read letter by letter: "an MRI", "a CNN"
+        return "an" if word[0] in VOWEL_SOUND_LETTERS else "a"
+    lower = word.lower()
+    if lower.startswith(AN_CONSONANT_LETTER):
+        return "an"
+    if lower.startswith(A_VOWEL_LETTER):
+        return "a"
+    if not lower[0].isalpha():
+        return None
+    return "an" if lower[0] in "aeiou" else "a"
+
+
+def grammar_score(errors: List[dict], word_count: int) -> int:
+    """0-100: weighted errors per 100 words subtracted from 100."""
+    if word_count == 0:
+        return 100
+    penalty = sum(ERROR_WEIGHTS.get(e["type"], 3) for e in errors) * 100 / max(word_count, 20)
+    return max(0, min(100, int(round(100 - penalty))))
+
+
+def check_text(text: str) -> dict:
+    """
+    Local pass over a text: offset-anchored errors (sorted), unresolved
+    unknown words, and the word count used for scoring.
+    """
+    skip = [(m.start(), m.end()) for m in URL_RE.finditer(text)]
+    spelling, unresolved = check_spelling(text, skip)
+    errors = spelling + check_rules(text, skip)
+    # Keep one error per span (e.g. a repeated misspelled word)
+    seen = set()
+    unique = []
+    for error in sorted(errors, key=lambda e: (e["offset"], -e["length"])):
+        if (error["offset"], error["length"]) not in seen:
+            seen.add((error["offset"], error["length"]))
+            unique.append(error)
+    return {
+        "errors": unique,
+        "unresolved": unresolved,
+        "words": len(WORD_RE.findall(text))
+    }
@@ -0,0 +1,122 @@
+"""
+Idempotent execution of expensive requests.
+
+Results of /generate-paper, /check-plagiarism and /detect-ai-content are kept
+in the shared store, keyed by the client's `Idempotency-Key` header or, without
+one, by a hash of the request content. A request first claims its key:
+- nobody has it -> this request computes and stores the result
+- a finished result exists -> it is returned as is (a replay)
+- another worker/request is still computing -> wait for that result
+Because claims are made inside IMMEDIATE transactions, concurrent duplicates
+across all worker processes run the work once. Degraded results (an upstream
+service failed and a fallback was used) are never stored; the claim is
+released so the next attempt recomputes. The SQLite calls (which may wait on
+another writer's lock) run in the threadpool, never on the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from shared_state import SharedStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotent_results (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+class IdempotencyConflict(Exception):
+    """The Idempotency-Key was already used for a different request body."""
+
+
+class StillInProgress(Exception):
+    """The original request did not finish within the wait timeout."""
+
+
+def fingerprint(endpoint: str, payload: dict) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{endpoint}\n{body}".encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """Claim / complete / wait on request keys in the shared SQLite store."""
+
+    def __init__(self, store: SharedStore, pending_ttl: float = 600, poll_interval: float = 0.25):
+        self.store = store
+        # A pending claim older than this is considered abandoned (crashed worker)
+        self.pending_ttl = pending_ttl
+        self.poll_interval = poll_interval
+        self.store.connection().execute(SCHEMA)
+
+    def claim(self, key: str, request_fingerprint: str) -> Tuple[str, Optional[object]]:
+        """("new", None) | ("done", result) | ("pending", None)."""
+        now = time.time()
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, status, result, expires_at FROM idempotent_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[3] < now:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotent_results (key, fingerprint, status, result, expires_at) "
+                    "VALUES (?, ?, 'pending', NULL, ?)",
+                    (key, request_fingerprint, now + self.pending_ttl)
+                )
+                return "new", None
+        if row[0] != request_fingerprint:
+            raise IdempotencyConflict(key)
+        if row[1] == "done":
+            return "done", json.loads(row[2])
+        return "pending", None
+
+    def complete(self, key: str, result, ttl: float) -> None:
+        self.store.connection().execute(
+            "UPDATE idempotent_results SET status = 'done', result = ?, expires_at = ? WHERE key = ?",
+            (json.dumps(result), time.time() + ttl, key)
+        )
+
+    def release(self, key: str) -> None:
+        """Drop a pending claim after a failure so the next attempt recomputes."""
+        self.store.connection().execute(
+            "DELETE FROM idempotent_results WHERE key = ? AND status = 'pending'", (key,)
+        )
+
+    async def run(self, key: str, request_fingerprint: str, compute: Callable[[], Awaitable],
+                  ttl: float, wait_timeout: float,
+                  storable: Callable[[object], bool] = lambda result: True) -> Tuple[object, bool]:
+        """
+        Result for `key`, computing it at most once across workers.
+        Results for which `storable(result)` is false are returned but not kept.
+        Returns (result, replayed).
+        """
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            state, result = await run_in_threadpool(self.claim, key, request_fingerprint)
+            if state == "done":
+                return result, True
+            if state == "new":
+                break
+            if time.monotonic() > deadline:
+                raise StillInProgress(key)
+            # Another request holds the claim: wait for its result (or for it to fail)
+            await asyncio.sleep(self.poll_interval)
+
+        try:
+            result = await compute()
+        except BaseException:
+            await run_in_threadpool(self.release, key)
+            raise
+        if storable(result):
+            await run_in_threadpool(self.complete, key, result, ttl)
+        else:
+            await run_in_threadpool(self.release, key)
+        return result, False
+
@@ -0,0 +1,228 @@
+"""
+Paragraph-level incremental analysis for editor workflows.
+
+Documents are split into paragraphs, each paragraph is identified by a hash of
+its (whitespace-normalized) content, and per-paragraph check results are kept
+in a bounded LRU cache. Re-checking a document after a small edit only
+recomputes the paragraphs whose hash changed; document-level scores are
+aggregated from the cached parts. Paragraphs can also come from a generator
+(an uploaded document read from disk); cached ones are dropped as soon as they
+are looked up, only the changed ones are kept until they are analyzed.
+
+Analyzers receive all changed paragraphs of a request at once, so they can
+share one search/LLM budget instead of paying the full per-document cost for
+every paragraph. Results marked `"degraded": True` (a failed or skipped search
+or LLM call) are returned but not cached, so the next check retries them.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Paragraphs shorter than this are returned as "too short" by the analyzers,
+# so they carry no weight in the aggregated document score.
+MIN_PARAGRAPH_CHARS = 50
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Split a document into non-empty paragraphs on blank lines."""
+    paragraphs = re.split(r'\n\s*\n', text or "")
+    return [p.strip() for p in paragraphs if p.strip()]
+
+
+def paragraph_hash(paragraph: str) -> str:
+    """Content hash of a paragraph; re-wrapping or extra spaces keep the same hash."""
+    normalized = " ".join(paragraph.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ParagraphCache:
+    """
+    Thread-safe LRU cache of per-paragraph check results.
+    When a shared store is given, results are also written through to it so
+    other worker processes can reuse them; the LRU stays as a fast front.
+    """
+
+    def __init__(self, max_entries: int = 5000, store=None, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.store = store
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, check: str, digest: str) -> Optional[dict]:
+        key = f"{check}:{digest}"
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.store is None:
+            return None
+        result = self.store.get("paragraph", key)
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def set(self, check: str, digest: str, result: dict) -> None:
+        if result.get("degraded"):
+            return  # a fallback result must not be replayed for the cache TTL
+        key = f"{check}:{digest}"
+        self._remember(key, result)
+        if self.store is not None:
+            self.store.set("paragraph", key, result, self.ttl)
+
+    def _remember(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _weight(length: int) -> int:
+    return length if length >= MIN_PARAGRAPH_CHARS else 0
+
+
+def _weighted_average(values: List[float], weights: List[int], default: int = 0) -> int:
+    total = sum(weights)
+    if total == 0:
+        return default
+    return int(round(sum(v * w for v, w in zip(values, weights)) / total))
+
+
+def aggregate_plagiarism(lengths: List[int], results: List[dict]) -> dict:
+    weights = [_weight(n) for n in lengths]
+    score = _weighted_average([r.get("score", 0) for r in results], weights)
+
+    flagged_sentences = []
+    for index, result in enumerate(results):
+        for match in result.get("flaggedSentences", []):
+            flagged_sentences.append({**match, "id": len(flagged_sentences) + 1, "paragraph": index})
+
+    return {
+        "score": min(score, 100),
+        "flaggedSentences": flagged_sentences,
+        "suggestions": [f"Found {len(flagged_sentences)} potential matches from web sources."] if flagged_sentences else ["No exact matches found in web search."]
+    }
+
+
+def aggregate_ai_detection(lengths: List[int], results: List[dict]) -> dict:
+    weights = [_weight(n) for n in lengths]
+    score = _weighted_average([r.get("score", 0) for r in results], weights)
+    confidence = _weighted_average([r.get("confidence", 0) for r in results], weights)
+
+    reasons = []
+    for result in results:
+        analysis = result.get("analysis")
+        if isinstance(analysis, dict):
+            for reason in analysis.get("reasons", []):
+                if reason not in reasons:
+                    reasons.append(reason)
+
+    return {
+        "score": score,
+        "confidence": confidence,
+        "analysis": {
+            "reasons": reasons,
+            "paragraphScores": [r.get("score", 0) for r in results]
+        }
+    }
+
+
+def aggregate_grammar(lengths: List[int], results: List[dict]) -> dict:
+    weights = [_weight(n) for n in lengths]
+    score = _weighted_average([r.get("score", 100) for r in results], weights, default=100)
+
+    errors = []
+    corrections = []
+    for index, result in enumerate(results):
+        for error in result.get("errors", []):
+            errors.append({**error, "paragraph": index})
+        corrections.extend(result.get("corrections", []))
+
+    return {
+        "score": score,
+        "errors": errors,
+        "corrections": corrections
+    }
+
+
+AGGREGATORS = {
+    "plagiarism": aggregate_plagiarism,
+    "ai": aggregate_ai_detection,
+    "grammar": aggregate_grammar,
+}
+
+
+def analyze_incrementally(text: str, analyzers: Dict[str, Callable[[List[str]], List[dict]]],
+                          checks: List[str], cache: ParagraphCache,
+                          paragraphs: Optional[Iterable[str]] = None,
+                          finalizers: Optional[Dict[str, Callable[[str, dict], dict]]] = None,
+                          sample_chars: int = 2000) -> dict:
+    """
+    Run the requested checks over a document paragraph by paragraph.
+    Only paragraphs missing from the cache are passed to the analyzers, in one
+    call per check (`analyzers[check](paragraphs) -> results`).
+    `paragraphs` (e.g. a stored document's generator) replaces splitting `text`.
+    `finalizers[check](sample, aggregate)` may refine a check's document-level
+    result, given the first `sample_chars` of the document.
+    """
+    if paragraphs is None:
+        paragraphs = split_paragraphs(text)
+    finalizers = finalizers or {}
+
+    paragraph_info = []
+    lengths = []
+    results = {check: [] for check in checks}
+    missing = {check: [] for check in checks}  # (index, digest, paragraph)
+    sample = []
+    sample_length = 0
+    reused = 0
+
+    for index, paragraph in enumerate(paragraphs):
+        digest = paragraph_hash(paragraph)
+        paragraph_info.append({"index": index, "hash": digest[:16], "recomputed": []})
+        lengths.append(len(paragraph))
+        if sample_length < sample_chars:
+            sample.append(paragraph)
+            sample_length += len(paragraph) + 2
+        for check in checks:
+            result = cache.get(check, digest)
+            if result is None:
+                missing[check].append((index, digest, paragraph))
+            else:
+                reused += 1
+            results[check].append(result)
+
+    recomputed = 0
+    for check in checks:
+        if not missing[check]:
+            continue
+        computed = analyzers[check]([paragraph for _, _, paragraph in missing[check]])
+        for (index, digest, _), result in zip(missing[check], computed):
+            cache.set(check, digest, result)
+            results[check][index] = result
+            paragraph_info[index]["recomputed"].append(check)
+            recomputed += 1
+
+    response = {}
+    sample_text = "\n\n".join(sample)[:sample_chars]
+    for check in checks:
+        aggregate = AGGREGATORS[check](lengths, results[check])
+        if any(r.get("degraded") for r in results[check]):
+            aggregate["degraded"] = True
+        if check in finalizers and lengths:
+            aggregate = finalizers[check](sample_text, aggregate)
+        response[check] = aggregate
+
+    response["paragraphs"] = paragraph_info
+    response["stats"] = {
+        "paragraphs": len(lengths),
+        "recomputed": recomputed,
+        "cached": reused
+    }
+    return response
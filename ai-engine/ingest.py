@@ -0,0 +1,235 @@
+"""
+Streaming document ingestion.
+
+Uploaded files (spooled to disk by the multipart parser, so memory stays
+bounded) are turned into text incrementally: PDF page by page (optional
+`pypdf`), DOCX paragraph by paragraph (zipfile + iterparse over
+word/document.xml, clearing elements as it goes), plain text line by line.
+Paragraphs are written straight to a file in the document store; nothing
+holds the whole document in memory during extraction.
+
+Each stored document gets a content-addressed handle (sha256 of its text),
+so uploading the same file twice yields the same `documentId`, and later
+requests can refer to the handle instead of re-sending the text.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+import zipfile
+from typing import BinaryIO, Iterator, Optional
+from xml.etree.ElementTree import iterparse
+
+from shared_state import SharedStore
+from warmup import lazy_import
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+FORMATS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".txt": "text",
+    ".md": "text",
+    ".markdown": "text",
+}
+
+
+class UnsupportedDocument(Exception):
+    pass
+
+
+def detect_format(filename: str, content_type: Optional[str] = None) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in FORMATS:
+        return FORMATS[extension]
+    if content_type == "application/pdf":
+        return "pdf"
+    if content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        return "docx"
+    if content_type and content_type.startswith("text/"):
+        return "text"
+    raise UnsupportedDocument(f"Unsupported file type: {filename or content_type}")
+
+
+def iter_pdf_pages(file: BinaryIO) -> Iterator[str]:
+    """Text of each PDF page, one page at a time."""
+    pypdf = lazy_import("pypdf")
+    if pypdf is None:
+        raise UnsupportedDocument("PDF support requires the pypdf package")
+    reader = pypdf.PdfReader(file)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_docx_paragraphs(file: BinaryIO) -> Iterator[str]:
+    """Paragraph texts of a DOCX body, streamed from the zipped XML."""
+    try:
+        archive = zipfile.ZipFile(file)
+        xml = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError):
+        raise UnsupportedDocument("Not a valid DOCX file")
+    with archive, xml:
+        parts = []
+        for event, element in iterparse(xml, events=("start", "end")):
+            if event == "start":
+                if element.tag == W_NS + "p":
+                    parts = []
+                continue
+            if element.tag == W_NS + "t" and element.text:
+                parts.append(element.text)
+            elif element.tag == W_NS + "tab":
+                parts.append("\t")
+            elif element.tag in (W_NS + "br", W_NS + "cr"):
+                parts.append("\n")
+            elif element.tag == W_NS + "p":
+                yield "".join(parts)
+                parts = []
+                element.clear()
+            elif element.tag == W_NS + "body":
+                element.clear()
+
+
+def iter_text_lines(file: BinaryIO) -> Iterator[str]:
+    for line in file:
+        yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def iter_paragraphs(pieces: Iterator[str]) -> Iterator[str]:
+    """
+    Normalize extracted pieces (pages, XML paragraphs or lines) into
+    paragraphs: blank lines separate paragraphs, wrapped lines are joined.
+    """
+    current = []
+    for piece in pieces:
+        for line in piece.split("\n"):
+            line = line.strip()
+            if line:
+                current.append(line)
+            elif current:
+                yield " ".join(current)
+                current = []
+    if current:
+        yield " ".join(current)
+
+
+def extract_paragraphs(file: BinaryIO, document_format: str) -> Iterator[str]:
+    if document_format == "pdf":
+        # Pages end paragraphs; lines inside a page are joined per paragraph
+        return iter_paragraphs(page + "\n\n" for page in iter_pdf_pages(file))
+    if document_format == "docx":
+        # Each DOCX paragraph is already a paragraph
+        return iter_paragraphs(paragraph + "\n\n" for paragraph in iter_docx_paragraphs(file))
+    return iter_paragraphs(iter_text_lines(file))
+
+
+class DocumentStore:
+    """Extracted documents on disk, with metadata and TTL in the shared store."""
+
+    def __init__(self, store: SharedStore, directory: str, ttl: float = 7 * 86400, max_chars: int = 2_000_000):
+        self.store = store
+        self.directory = directory
+        self.ttl = ttl
+        self.max_chars = max_chars
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        if not re.fullmatch(r'[0-9a-f]{32}', document_id or ""):
+            raise KeyError(document_id)
+        return os.path.join(self.directory, f"{document_id}.txt")
+
+    def ingest(self, file: BinaryIO, filename: str, content_type: Optional[str] = None) -> dict:
+        """Extract a file paragraph by paragraph into the store; returns its metadata."""
+        document_format = detect_format(filename, content_type)
+        digest = hashlib.sha256()
+        chars = words = paragraphs = 0
+        preview = ""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as out:
+                for paragraph in extract_paragraphs(file, document_format):
+                    if chars + len(paragraph) > self.max_chars:
+                        raise UnsupportedDocument(f"Document exceeds {self.max_chars} characters")
+                    block = ("\n\n" if paragraphs else "") + paragraph
+                    out.write(block)
+                    digest.update(block.encode("utf-8"))
+                    chars += len(block)
+                    words += len(paragraph.split())
+                    paragraphs += 1
+                    if len(preview) < 300:
+                        preview = (preview + " " + paragraph).strip()[:300]
+            if paragraphs == 0:
+                raise UnsupportedDocument("No text could be extracted from the document")
+            document_id = digest.hexdigest()[:32]
+            os.replace(temp_path, self._path(document_id))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        meta = {
+            "documentId": document_id,
+            "filename": filename,
+            "format": document_format,
+            "chars": chars,
+            "words": words,
+            "paragraphs": paragraphs,
+            "preview": preview,
+            "createdAt": time.time()
+        }
+        self.store.set("document", document_id, meta, self.ttl)
+        self.cleanup()
+        return meta
+
+    def meta(self, document_id: str) -> Optional[dict]:
+        try:
+            path = self._path(document_id)
+        except KeyError:
+            return None
+        meta = self.store.get("document", document_id)
+        if meta is None or not os.path.exists(path):
+            return None
+        return meta
+
+    def _open(self, document_id: str):
+        """The stored file; KeyError if unknown, expired or already removed."""
+        if self.meta(document_id) is None:
+            raise KeyError(document_id)
+        try:
+            return open(self._path(document_id), encoding="utf-8")
+        except FileNotFoundError:
+            raise KeyError(document_id)
+
+    def iter_paragraphs(self, document_id: str) -> Iterator[str]:
+        """
+        Stored paragraphs one at a time. The file is opened right away (so a
+        missing document raises KeyError here) and read incrementally.
+        """
+        f = self._open(document_id)
+
+        def paragraphs():
+            with f:
+                yield from iter_paragraphs(line.rstrip("\n") for line in f)
+        return paragraphs()
+
+    def text(self, document_id: str) -> str:
+        with self._open(document_id) as f:
+            return f.read()
+
+    def delete(self, document_id: str) -> bool:
+        meta = self.meta(document_id)
+        self.store.delete("document", document_id)
+        if meta is not None:
+            os.remove(self._path(document_id))
+        return meta is not None
+
+    def cleanup(self) -> None:
+        """Remove files whose metadata expired (and stale partial uploads)."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,255 @@
+"""
+Per-user reference library with a local BM25 index.
+
+Reference records (title, authors, journal, year, rawText, ...) are imported
+from the Node side and persisted in the shared store, together with a change
+log. Each worker keeps one in-memory `BM25Index` per user and brings it up to
+date by replaying only the changes it has not seen yet, so imports and edits
+made through any worker become searchable everywhere without a rebuild.
+"""
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from retrieval import BM25Index
+from shared_state import SharedStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS library_refs (
+    user_id TEXT NOT NULL,
+    ref_id TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (user_id, ref_id)
+);
+CREATE TABLE IF NOT EXISTS library_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ref_id TEXT NOT NULL,
+    op TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS library_changes_user ON library_changes (user_id, seq);
+CREATE TABLE IF NOT EXISTS library_trimmed (
+    user_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+"""
+
+# Change-log rows kept per user; workers further behind than this reload fully
+CHANGE_LOG_KEEP = 1000
+
+# ~4 chars per token for English (same estimate as truncate_text)
+CHARS_PER_TOKEN = 4
+
+RECORD_FIELDS = ("title", "authors", "journal", "year", "volume", "issue", "pages",
+                 "publisher", "doi", "url", "abstract", "rawText")
+
+
+def normalize_record(reference: dict) -> dict:
+    """Keep the indexed fields of a Reference document; id from `id` or `_id`."""
+    ref_id = reference.get("id") or reference.get("_id")
+    if not ref_id:
+        raise ValueError("reference without id")
+    record = {"id": str(ref_id)}
+    for field in RECORD_FIELDS:
+        value = reference.get(field)
+        if value not in (None, "", []):
+            record[field] = value
+    return record
+
+
+def index_text(record: dict) -> str:
+    authors = record.get("authors") or []
+    if isinstance(authors, str):
+        authors = [authors]
+    title = record.get("title", "")
+    # Title counted twice: it says more about the topic than venue or raw text
+    return " ".join(str(part) for part in (
+        title, title, " ".join(authors), record.get("journal", ""), record.get("year", ""),
+        record.get("abstract", ""), record.get("rawText", "")
+    ))
+
+
+class _UserIndex:
+    def __init__(self):
+        self.index = BM25Index()
+        self.records: Dict[str, dict] = {}
+        self.seq = 0
+        self.lock = threading.Lock()
+
+
+class ReferenceLibrary:
+    """Shared-store backed reference records with per-worker BM25 indexes."""
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+        self._users: Dict[str, _UserIndex] = {}
+        self._users_lock = threading.Lock()
+        self.store.connection().executescript(SCHEMA)
+
+    # --- Writes (shared store) ---
+    def upsert(self, user_id: str, references: List[dict], replace: bool = False) -> dict:
+        """
+        Add or update references. With replace=True the library becomes exactly
+        `references` (records not in the list are deleted).
+        """
+        records = [normalize_record(r) for r in references]
+        new_ids = {r["id"] for r in records}
+        removed = 0
+        with self.store.transaction() as conn:
+            if replace:
+                existing = [row[0] for row in conn.execute(
+                    "SELECT ref_id FROM library_refs WHERE user_id = ?", (user_id,))]
+                stale = [ref_id for ref_id in existing if ref_id not in new_ids]
+                removed = self._delete_locked(conn, user_id, stale)
+            for record in records:
+                conn.execute(
+                    "INSERT OR REPLACE INTO library_refs (user_id, ref_id, record) VALUES (?, ?, ?)",
+                    (user_id, record["id"], json.dumps(record))
+                )
+                conn.execute(
+                    "INSERT INTO library_changes (user_id, ref_id, op) VALUES (?, ?, 'upsert')",
+                    (user_id, record["id"])
+                )
+            self._trim_log(conn, user_id)
+        return {"upserted": len(records), "deleted": removed}
+
+    def delete(self, user_id: str, ref_ids: List[str]) -> int:
+        with self.store.transaction() as conn:
+            removed = self._delete_locked(conn, user_id, [str(r) for r in ref_ids])
+            self._trim_log(conn, user_id)
+        return removed
+
+    def _delete_locked(self, conn, user_id: str, ref_ids: List[str]) -> int:
+        removed = 0
+        for ref_id in ref_ids:
+            cursor = conn.execute("DELETE FROM library_refs WHERE user_id = ? AND ref_id = ?", (user_id, ref_id))
+            if cursor.rowcount:
+                removed += 1
+                conn.execute(
+                    "INSERT INTO library_changes (user_id, ref_id, op) VALUES (?, ?, 'delete')",
+                    (user_id, ref_id)
+                )
+        return removed
+
+    def _trim_log(self, conn, user_id: str) -> None:
+        row = conn.execute(
+            "SELECT seq FROM library_changes WHERE user_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+            (user_id, CHANGE_LOG_KEEP)
+        ).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM library_changes WHERE user_id = ? AND seq <= ?", (user_id, row[0]))
+        conn.execute("INSERT OR REPLACE INTO library_trimmed (user_id, seq) VALUES (?, ?)", (user_id, row[0]))
+
+    # --- Reads (per-worker index) ---
+    def _user(self, user_id: str) -> _UserIndex:
+        with self._users_lock:
+            if user_id not in self._users:
+                self._users[user_id] = _UserIndex()
+            return self._users[user_id]
+
+    def _sync(self, user_id: str) -> _UserIndex:
+        """Apply changes made (by any worker) since this worker last looked."""
+        user = self._user(user_id)
+        conn = self.store.connection()
+        with user.lock:
+            max_seq = conn.execute(
+                "SELECT MAX(seq) FROM library_changes WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            if max_seq is None or max_seq == user.seq:
+                return user
+            trimmed = conn.execute(
+                "SELECT seq FROM library_trimmed WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if user.seq == 0 or (trimmed and user.seq < trimmed[0]):
+                # First load, or the log no longer reaches back far enough
+                user.index = BM25Index()
+                user.records = {}
+                ref_ids = None
+            else:
+                rows = conn.execute(
+                    "SELECT DISTINCT ref_id FROM library_changes WHERE user_id = ? AND seq > ? AND seq <= ?",
+                    (user_id, user.seq, max_seq)
+                ).fetchall()
+                ref_ids = [row[0] for row in rows]
+
+            if ref_ids is None:
+                rows = conn.execute(
+                    "SELECT ref_id, record FROM library_refs WHERE user_id = ?", (user_id,)
+                ).fetchall()
+            else:
+                rows = []
+                for ref_id in ref_ids:
+                    row = conn.execute(
+                        "SELECT ref_id, record FROM library_refs WHERE user_id = ? AND ref_id = ?",
+                        (user_id, ref_id)
+                    ).fetchone()
+                    if row is None:
+                        user.index.remove(ref_id)
+                        user.records.pop(ref_id, None)
+                    else:
+                        rows.append(row)
+            for ref_id, record in rows:
+                record = json.loads(record)
+                user.records[ref_id] = record
+                user.index.add(ref_id, index_text(record))
+            user.seq = max_seq
+        return user
+
+    def search(self, user_id: str, query: str, limit: int = 10) -> List[Tuple[dict, float]]:
+        """Top `limit` references for the query, as (record, score) pairs."""
+        user = self._sync(user_id)
+        return [(user.records[ref_id], score) for ref_id, score in user.index.search(query, limit)
+                if ref_id in user.records]
+
+    def size(self, user_id: str) -> int:
+        return len(self._sync(user_id).records)
+
+
+# --- Prompt packing ---
+def format_reference_entry(number: int, record: dict, excerpt_chars: Optional[int] = None) -> str:
+    authors = record.get("authors") or []
+    if isinstance(authors, str):
+        authors = [authors]
+    head = f"[{number}] "
+    if authors:
+        head += (", ".join(authors[:3]) + (" et al." if len(authors) > 3 else "")) + ". "
+    head += f"\"{record.get('title', 'Untitled')}\""
+    details = ", ".join(str(v) for v in (record.get("journal"), record.get("year")) if v)
+    if details:
+        head += f", {details}"
+    excerpt = (record.get("abstract") or record.get("rawText") or "").strip()
+    if excerpt and excerpt_chars != 0:
+        if excerpt_chars is not None and len(excerpt) > excerpt_chars:
+            excerpt = excerpt[:excerpt_chars].rsplit(" ", 1)[0] + "..."
+        head += f" - {excerpt}"
+    return head
+
+
+def pack_references(records: List[dict], token_budget: int, min_excerpt_chars: int = 80) -> Tuple[str, List[dict]]:
+    """
+    Greedily pack references (best first) into at most `token_budget` tokens.
+    An entry that does not fit whole is retried with a shorter excerpt, then
+    without one; packing stops at the first entry that cannot fit at all.
+    Returns the prompt block and the records that made it in.
+    """
+    budget = token_budget * CHARS_PER_TOKEN
+    lines = []
+    packed = []
+    used = 0
+    for record in records:
+        number = len(packed) + 1
+        entry = format_reference_entry(number, record)
+        if used + len(entry) + 1 > budget:
+            bare = format_reference_entry(number, record, excerpt_chars=0)
+            room = budget - used - len(bare) - 8  # " - " + "..." + newline
+            if room >= min_excerpt_chars:
+                entry = format_reference_entry(number, record, excerpt_chars=room)
+            elif used + len(bare) + 1 <= budget:
+                entry = bare
+            else:
+                break
+        lines.append(entry)
+        packed.append(record)
+        used += len(entry) + 1
+    return "\n".join(lines), packed
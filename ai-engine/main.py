@@ -1,32 +1,51 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, model_validator
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from typing import ClassVar, List, Optional
 import os
 import re
+import threading
 from dotenv import load_dotenv
-from groq import Groq
 import json
-import time
-
-# New imports for professional plagiarism & AI detection
-try:
-    from duckduckgo_search import DDGS
-    DDGS_AVAILABLE = True
-except ImportError:
-    DDGS_AVAILABLE = False
-    print("⚠️  duckduckgo-search not installed. Plagiarism search will be limited.")
-
-try:
-    import textstat
-    TEXTSTAT_AVAILABLE = True
-except ImportError:
-    TEXTSTAT_AVAILABLE = False
-    print("⚠️  textstat not installed. AI detection metrics will be limited.")
+from contextlib import asynccontextmanager, nullcontext
+
+from batch import BatchBudget, iter_plagiarism_batch, stream_ai_detection_batch, stream_plagiarism_batch
+from compression import CompressionMiddleware
+from citations import format_ieee, parse_citation, split_reference_list
+from library import ReferenceLibrary, pack_references
+from grammar import check_text, get_spell_index, grammar_score
+from idempotency import IdempotencyConflict, ResultStore, StillInProgress, fingerprint
+from incremental import ParagraphCache, analyze_incrementally
+from ingest import DocumentStore, UnsupportedDocument
+from paper_sections import SectionPipeline, complete_outline
+from pipeline import active_llm_memo, run_pipeline, transform_in_chunks
+from search_cache import SearchCache, normalize_query
+from search_client import SearchClientManager, create_search_backend
+from shared_state import TokenBucket, cache_key, create_shared_store
+from sources import process_sources
+from summarizer import compress_for_llm, extract_summary
+from tolerant_json import TolerantJSONParser
+from warmup import Warmup, lazy_import
 
 load_dotenv()
 
-app = FastAPI(title="ARPS AI Engine", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients warm up in the background; the server accepts requests at once
+    start_warmup()
+    yield
+
+
+app = FastAPI(title="ARPS AI Engine", version="1.0.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -37,22 +56,109 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure Groq
+# gzip/brotli for large JSON/text/NDJSON responses (negotiated via Accept-Encoding)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+
+# Configure Groq (the SDK is imported and the client built on first use / warm-up)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_CONFIGURED = bool(GROQ_API_KEY) and GROQ_API_KEY != "your-groq-api-key-here"
+# Using Llama 3.3 70B for high quality research generation
+MODEL_NAME = "llama-3.3-70b-versatile"
 print(f"Groq API Key loaded: {bool(GROQ_API_KEY)}")
-
-if GROQ_API_KEY and GROQ_API_KEY != "your-groq-api-key-here":
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-        # Using Llama 3.3 70B for high quality research generation
-        MODEL_NAME = "llama-3.3-70b-versatile" 
-        print(f"✅ Groq AI configured successfully (using {MODEL_NAME})")
-    except Exception as e:
-        print(f"❌ Groq configuration failed: {e}")
-        client = None
-else:
+if not GROQ_CONFIGURED:
     print("⚠️  Groq API key not configured - AI features will be limited")
-    client = None
+
+_groq_client = None
+_groq_client_lock = threading.Lock()
+_groq_client_failed = False
+_textstat_warned = False
+
+
+def get_groq_client():
+    """Groq client, created once on first use; None if unavailable."""
+    global _groq_client, _groq_client_failed
+    if _groq_client is not None or _groq_client_failed or not GROQ_CONFIGURED:
+        return _groq_client
+    with _groq_client_lock:
+        if _groq_client is None and not _groq_client_failed:
+            groq = lazy_import("groq")
+            try:
+                if groq is None:
+                    raise ImportError("groq package not installed")
+                _groq_client = groq.Groq(api_key=GROQ_API_KEY)
+                print(f"✅ Groq AI configured successfully (using {MODEL_NAME})")
+            except Exception as e:
+                print(f"❌ Groq configuration failed: {e}")
+                _groq_client_failed = True
+    return _groq_client
+
+
+def get_textstat():
+    """textstat module, imported on first use; None if not installed."""
+    global _textstat_warned
+    module = lazy_import("textstat")
+    if module is None and not _textstat_warned:
+        _textstat_warned = True
+        print("⚠️  textstat not installed. AI detection metrics will be limited.")
+    return module
+
+# Shared pool of warm web-search sessions (SEARCH_BACKEND=ddgs|stub)
+search_clients = SearchClientManager(
+    create_search_backend(),
+    pool_size=int(os.getenv("SEARCH_POOL_SIZE", "4")),
+    max_session_age=float(os.getenv("SEARCH_SESSION_MAX_AGE", "600")),
+)
+
+# State shared by all worker processes on this machine (SQLite WAL)
+shared_store = create_shared_store()
+
+# Global (cross-worker) request rates for the upstream services
+groq_bucket = TokenBucket(shared_store, "groq",
+                          rate_per_minute=float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+                          capacity=float(os.getenv("GROQ_BURST", "5")))
+search_bucket = TokenBucket(shared_store, "ddgs",
+                            rate_per_minute=float(os.getenv("SEARCH_REQUESTS_PER_MINUTE", "30")),
+                            capacity=float(os.getenv("SEARCH_BURST", "3")))
+RATE_LIMIT_WAIT = float(os.getenv("RATE_LIMIT_WAIT", "60"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+
+# Persistent search-result cache shared by source search and plagiarism checks
+search_cache = SearchCache(
+    shared_store,
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "86400")),
+    negative_ttl=float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "3600")),
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000")),
+)
+
+# Per-user reference libraries (BM25) used to ground literature reviews
+reference_library = ReferenceLibrary(shared_store)
+
+# Results of expensive endpoints, keyed by Idempotency-Key or request content
+result_store = ResultStore(shared_store)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "300"))
+ANALYSIS_RESULT_TTL = float(os.getenv("ANALYSIS_RESULT_TTL", "86400"))
+# Without a key, an identical paper request is answered from the store only for
+# this long (retries and double clicks), so asking again later gives a new paper
+PAPER_DEDUPE_TTL = float(os.getenv("PAPER_DEDUPE_TTL", "300"))
+
+# Uploaded documents (extracted text on disk, referenced by documentId)
+document_store = DocumentStore(
+    shared_store,
+    os.getenv("DOCUMENT_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(shared_store.path)), "documents")),
+    ttl=float(os.getenv("DOCUMENT_TTL", str(7 * 86400))),
+    max_chars=int(os.getenv("DOCUMENT_MAX_CHARS", "2000000")),
+)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+# Section calls of one paper that may run at once (they start while the outline streams)
+PAPER_SECTION_WORKERS = int(os.getenv("PAPER_SECTION_WORKERS", "3"))
+
+# Max paragraphs per grammar check that may be escalated to the LLM
+GRAMMAR_MAX_ESCALATIONS = int(os.getenv("GRAMMAR_MAX_ESCALATIONS", "3"))
+
+# Search over-fetches this many candidates per wanted source before dedup/ranking
+SOURCE_CANDIDATE_FACTOR = int(os.getenv("SOURCE_CANDIDATE_FACTOR", "3"))
 
 # --- Helper: Truncate text to avoid token limits ---
 def truncate_text(text: str, max_chars: int = 6000) -> str:
@@ -62,19 +168,43 @@ def truncate_text(text: str, max_chars: int = 6000) -> str:
     return text[:max_chars] + "\n\n[... Text truncated for processing ...]"
 
 
+# --- Helper: Cached web search ---
+def cached_search(query: str, max_results: int) -> List[dict]:
+    """
+    Web search through the shared result cache.
+    Concurrent identical queries from any worker are searched once, and network
+    searches are paced by the global search token bucket.
+    Search errors are raised and never cached.
+    """
+    results = search_cache.get(query, max_results)
+    if results is not None:
+        return results
+    with shared_store.single_flight(f"search:{normalize_query(query)}:{max_results}",
+                                    lambda: search_cache.get(query, max_results)) as results:
+        # Another worker may have finished the same search while we waited
+        if results is not None:
+            return results
+        if not search_bucket.acquire(timeout=RATE_LIMIT_WAIT):
+            raise RuntimeError("Search rate limit: timed out waiting for a slot")
+        results = search_clients.text(query, max_results=max_results)
+        search_cache.set(query, max_results, results)
+    return results
+
+
 # --- Helper: Search for academic sources ---
 def search_academic_sources(topic: str, keywords: List[str] = [], max_results: int = 5) -> List[dict]:
     """
     Search for real academic sources using DuckDuckGo.
-    Returns a list of sources with title, url, and snippet.
+    Over-fetches candidates, then dedupes, ranks them against the topic (BM25)
+    and keeps the top `max_results`, each with title, url, snippet, year and venue.
     """
-    if not DDGS_AVAILABLE:
+    if not search_clients.available:
         print("⚠️  DuckDuckGo search not available, using fallback")
         return []
     
     sources = []
     try:
-        ddgs = DDGS()
+        candidates = max_results * SOURCE_CANDIDATE_FACTOR
         
         # Try a simpler search query first (site-specific searches may be blocked)
         search_query = f"{topic} research paper academic"
@@ -85,32 +215,36 @@ def search_academic_sources(topic: str, keywords: List[str] = [], max_results: i
         
         try:
             # Use the text search method
-            results = ddgs.text(search_query, max_results=max_results)
-            results_list = list(results) if results else []
+            results_list = cached_search(search_query, max_results=candidates)
         except Exception as search_error:
             print(f"⚠️  Primary search failed: {search_error}")
             # Try an even simpler query
             try:
-                results = ddgs.text(topic, max_results=max_results)
-                results_list = list(results) if results else []
+                results_list = cached_search(topic, max_results=candidates)
             except:
                 results_list = []
         
-        for i, result in enumerate(results_list):
-            sources.append({
-                "id": i + 1,
-                "title": result.get("title", "Unknown Title"),
-                "url": result.get("href", "#"),
-                "snippet": result.get("body", "")[:200],
-                "year": "2024"
-            })
+        relevance_query = " ".join([topic] + list(keywords))
+        sources = process_sources(results_list, relevance_query, max_results)
         
-        print(f"✅ Found {len(sources)} sources")
+        print(f"✅ Found {len(sources)} sources ({len(results_list)} candidates)")
     except Exception as e:
         print(f"❌ Source search failed: {e}")
     
     return sources
 
+
+def format_source_reference(src: dict) -> str:
+    """IEEE reference for a web source found by search_academic_sources."""
+    fields = {
+        "title": src["title"],
+        "journal": src.get("venue"),
+        "year": src.get("year"),
+        "url": src["url"],
+        "accessed": time.strftime("%b. %d, %Y").replace("May.", "May")
+    }
+    return format_ieee(fields, src["id"])
+
 # --- Request Models ---
 class GeneratePaperRequest(BaseModel):
     topic: str
@@ -118,17 +252,33 @@ class GeneratePaperRequest(BaseModel):
     domain: str = "Other"
     length: str = "medium"  # short, medium, long
     includeImages: bool = False
-
-class ImproveTextRequest(BaseModel):
-    text: str
+    compact: bool = False  # sections only; see render_paper_text
+
+class TextOrDocument(BaseModel):
+    """Text sent inline (in `text_field`) or as an uploaded document's id; exactly one."""
+    text_field: ClassVar[str] = "text"
+    documentId: Optional[str] = None  # see /documents/upload
+
+    @model_validator(mode="after")
+    def check_text_or_document(self):
+        has_text = bool((getattr(self, self.text_field) or "").strip())
+        if has_text == bool(self.documentId):
+            raise ValueError(f"Provide exactly one of `{self.text_field}` or `documentId`")
+        return self
+
+class ImproveTextRequest(TextOrDocument):
+    text: str = ""
     action: str  # grammar, academic_tone, remove_plagiarism, expand, summarize, professional
+    mode: str = "llm"  # summarize only: "fast" = local extractive summary, no LLM call
+    maxWords: Optional[int] = None  # summarize only; default ~1/4 of the text
 
-class AnalyzeContentRequest(BaseModel):
-    content: str
+class AnalyzeContentRequest(TextOrDocument):
+    text_field: ClassVar[str] = "content"
+    content: str = ""
     format: str = "text"
 
-class PlagiarismRequest(BaseModel):
-    text: str
+class PlagiarismRequest(TextOrDocument):
+    text: str = ""
 
 class SuggestionsRequest(BaseModel):
     text: str
@@ -137,34 +287,255 @@ class SuggestionsRequest(BaseModel):
 class LiteratureReviewRequest(BaseModel):
     topic: str
     papers: List[dict] = []
+    userId: Optional[str] = None  # ground the review in this user's reference library
+    maxReferences: int = 8
+    tokenBudget: int = 1200  # prompt tokens available for the reference block
 
-class AbstractRequest(BaseModel):
-    content: str
+class LibraryImportRequest(BaseModel):
+    references: List[dict]  # Reference records (id/_id, title, authors, journal, year, rawText, ...)
+    replace: bool = False  # True: library becomes exactly this list
+
+class AbstractRequest(TextOrDocument):
+    text_field: ClassVar[str] = "content"
+    content: str = ""
     maxWords: int = 250
+    mode: str = "llm"  # "fast" = local extractive abstract (TextRank), no LLM call
 
-class GrammarRequest(BaseModel):
-    text: str
+class GrammarRequest(TextOrDocument):
+    text: str = ""
+    mode: str = "auto"  # auto: LLM only for paragraphs the local checker can't resolve; local: never
 
-class AIDetectionRequest(BaseModel):
-    text: str
+class AIDetectionRequest(TextOrDocument):
+    text: str = ""
 
 class CitationConvertRequest(BaseModel):
     citation: str
     sourceFormat: str
     targetFormat: str = "IEEE"
 
+class CitationBatchRequest(BaseModel):
+    citations: List[str] = []
+    text: Optional[str] = None  # a pasted reference list, one entry per line
+    sourceFormat: str = ""
+
+class IncrementalAnalysisRequest(TextOrDocument):
+    text: str = ""  # or documentId: analyzed straight from the stored file, paragraph by paragraph
+    checks: List[str] = ["plagiarism", "ai", "grammar"]
+
+class PipelineCondition(BaseModel):
+    check: str  # a check stage that ran earlier in the pipeline
+    above: Optional[float] = None
+    below: Optional[float] = None
+
+class PipelineStep(BaseModel):
+    stage: str  # check-plagiarism, rewrite-text, detect-ai-content, humanize-text, check-grammar
+    when: Optional[PipelineCondition] = None
+
+PIPELINE_AI_THRESHOLD = float(os.getenv("PIPELINE_AI_THRESHOLD", "40"))
+# Input size of the rewrite prompts (paraphrase_text / humanize_content)
+REWRITE_INPUT_CHARS = 2500
+
+# Same flow as demo_workflow.py
+DEFAULT_PIPELINE = [
+    PipelineStep(stage="check-plagiarism"),
+    PipelineStep(stage="rewrite-text", when=PipelineCondition(check="check-plagiarism", above=0)),
+    PipelineStep(stage="detect-ai-content"),
+    PipelineStep(stage="humanize-text", when=PipelineCondition(check="detect-ai-content", above=PIPELINE_AI_THRESHOLD)),
+    PipelineStep(stage="detect-ai-content"),
+]
+
+class PipelineRequest(TextOrDocument):
+    text: str = ""
+    steps: List[PipelineStep] = DEFAULT_PIPELINE
+
+class BatchDocument(TextOrDocument):
+    id: str
+    text: str = ""
+
+class BatchAnalysisRequest(BaseModel):
+    documents: List[BatchDocument]
+    maxSearches: int = 25  # shared web-search budget for the whole batch
+    maxLLMCalls: int = 10  # shared LLM budget for the whole batch
+
+
+# --- Helper: Paper rendering ---
+COMPACT_PAPER_MEDIA_TYPE = "application/vnd.arps.paper-compact+json"
+
+
+def render_paper_text(sections: List[dict]) -> str:
+    """
+    Markdown text of a generated paper, derived from its sections.
+    This is the `rawContent` of the full response; compact consumers can
+    rebuild it the same way.
+    """
+    parts = []
+    for section in sorted(sections, key=lambda s: s["order"]):
+        if section["type"] == "title":
+            parts.append(f"# {section['content']}\n")
+        elif section["type"] == "abstract":
+            parts.append(f"**Abstract**—{section['content']}\n")
+        elif section["type"] == "keywords":
+            parts.append(f"**Keywords**—{section['content']}\n")
+        elif section["type"] == "references":
+            parts.append(f"## {section['title']}\n\n{section['content']}")
+        else:
+            parts.append(f"## {section['title']}\n\n{section['content']}\n")
+    return "\n".join(parts)
+
+
+def wants_compact(compact_flag: bool, raw_request: Request) -> bool:
+    return compact_flag or COMPACT_PAPER_MEDIA_TYPE in raw_request.headers.get("accept", "")
+
+
+# --- Helper: Idempotent execution ---
+def paper_is_complete(paper: dict) -> bool:
+    return (not any(section.get("failed") for section in paper["sections"])
+            and not paper["generation"]["outline"]["fallbackFields"])
+
+
+def result_is_complete(result: dict) -> bool:
+    """False for analysis results computed with a fallback (upstream failure)."""
+    return not result.get("degraded")
+
+async def run_idempotent(raw_request: Request, endpoint: str, payload: dict, compute, content_ttl: float,
+                         storable=None):
+    """
+    Run `compute` at most once per Idempotency-Key (or, without a header, per
+    identical request content, kept for `content_ttl`). The result is stored
+    unless `storable(result)` is false (a degraded/fallback result).
+    Returns (result, replayed).
+    """
+    request_fingerprint = fingerprint(endpoint, payload)
+    idempotency_key = raw_request.headers.get("idempotency-key")
+    if idempotency_key:
+        key, ttl = f"{endpoint}:key:{idempotency_key}", IDEMPOTENCY_TTL
+    else:
+        key, ttl = f"{endpoint}:content:{request_fingerprint}", content_ttl
+    try:
+        result, replayed = await result_store.run(key, request_fingerprint, compute, ttl, IDEMPOTENCY_WAIT,
+                                                  storable or (lambda result: True))
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    except StillInProgress:
+        raise HTTPException(status_code=409, detail="An identical request is still in progress, please retry shortly")
+    if replayed:
+        print(f"♻️  Replaying stored result for {endpoint}")
+    return result, replayed
+
+
+def idempotent_response(result, replayed: bool, headers: Optional[dict] = None) -> JSONResponse:
+    headers = dict(headers or {})
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return JSONResponse(content=result, headers=headers)
+
+
+# --- Helper: Uploaded documents ---
+def require_document(document_id: str) -> dict:
+    meta = document_store.meta(document_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Document not found or expired, please upload it again")
+    return meta
+
+
+def document_text(document_id: str) -> str:
+    try:
+        return document_store.text(document_id)
+    except KeyError:
+        # Unknown, expired, or removed since its metadata was read
+        raise HTTPException(status_code=404, detail="Document not found or expired, please upload it again")
+
+
+def resolve_text(text: str, document_id: Optional[str]) -> str:
+    """
+    Request text, or the stored text of an uploaded document when `documentId`
+    is given (loaded whole; only /analyze-incremental streams its paragraphs).
+    """
+    if document_id:
+        return document_text(document_id)
+    return text
+
 
 # --- Helper Functions ---
-def generate_with_groq(prompt: str, system_prompt: str = "You are a helpful academic research assistant.", max_tokens: int = 2048) -> str:
+def generate_with_groq(prompt: str, system_prompt: str = "You are a helpful academic research assistant.", max_tokens: int = 2048, cache: bool = False) -> str:
+    """
+    Call the Groq chat API.
+    With cache=True (analysis-style prompts) the output is stored in the shared
+    store, so identical prompts from any worker are answered without a new call.
+    """
+    client = get_groq_client()
     if not client:
         print("⚠️  Groq API called but client not configured")
         raise HTTPException(
             status_code=500, 
             detail="Groq API not configured. Please add a valid GROQ_API_KEY to the .env file"
         )
+    memo = active_llm_memo.get()
+    memo_key = (system_prompt, prompt, max_tokens)
+    if memo is not None:
+        cached = memo.get(memo_key)
+        if cached is not None:
+            print("♻️  Reusing LLM output from this pipeline run")
+            return cached
+
+    shared_key = cache_key(MODEL_NAME, system_prompt, prompt, max_tokens) if cache else None
+    if shared_key:
+        cached = shared_store.get("llm", shared_key)
+        if cached is not None:
+            print("♻️  Reusing cached LLM output")
+            return cached
+
+    with (shared_store.single_flight(f"llm:{shared_key}", lambda: shared_store.get("llm", shared_key))
+          if shared_key else nullcontext()) as cached:
+        # Another worker may have produced it while we waited
+        if cached is not None:
+            return cached
+        if not groq_bucket.acquire(timeout=RATE_LIMIT_WAIT):
+            raise HTTPException(status_code=429, detail="Groq rate limit reached, please retry shortly")
+        try:
+            print(f"🤖 Generating with Groq...")
+            completion = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=max_tokens,
+                top_p=1,
+                stream=False,
+                stop=None,
+            )
+            response = completion.choices[0].message.content
+            print(f"✅ Response generated successfully")
+        except Exception as e:
+            print(f"❌ Groq API error: {e}")
+            raise HTTPException(status_code=500, detail=f"Groq API error: {str(e)}")
+        if shared_key:
+            shared_store.set("llm", shared_key, response, LLM_CACHE_TTL)
+
+    if memo is not None:
+        memo.put(memo_key, response)
+    return response
+
+
+def stream_with_groq(prompt: str, system_prompt: str = "You are a helpful academic research assistant.", max_tokens: int = 2048):
+    """
+    Call the Groq chat API with streaming; yields the answer in chunks as it is
+    generated. Not cached: used where the output is consumed while it arrives.
+    """
+    client = get_groq_client()
+    if not client:
+        print("⚠️  Groq API called but client not configured")
+        raise HTTPException(
+            status_code=500,
+            detail="Groq API not configured. Please add a valid GROQ_API_KEY to the .env file"
+        )
+    if not groq_bucket.acquire(timeout=RATE_LIMIT_WAIT):
+        raise HTTPException(status_code=429, detail="Groq rate limit reached, please retry shortly")
     try:
-        print(f"🤖 Generating with Groq...")
-        completion = client.chat.completions.create(
+        print(f"🤖 Streaming from Groq...")
+        stream = client.chat.completions.create(
             model=MODEL_NAME,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -173,31 +544,115 @@ def generate_with_groq(prompt: str, system_prompt: str = "You are a helpful acad
             temperature=0.7,
             max_tokens=max_tokens,
             top_p=1,
-            stream=False,
+            stream=True,
             stop=None,
         )
-        response = completion.choices[0].message.content
-        print(f"✅ Response generated successfully")
-        return response
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        print(f"✅ Stream finished")
     except Exception as e:
         print(f"❌ Groq API error: {e}")
         raise HTTPException(status_code=500, detail=f"Groq API error: {str(e)}")
 
 
+# --- Startup: background warm-up and probes ---
+def _warm_groq():
+    if not GROQ_CONFIGURED:
+        return "not configured"
+    if get_groq_client() is None:
+        raise RuntimeError("Groq client unavailable")
+    return "client ready"
+
+
+def _warm_search():
+    if not search_clients.available:
+        return "search backend unavailable"
+    return f"{search_clients.warm()} sessions"
+
+
+def _warm_textstat():
+    return "loaded" if get_textstat() is not None else "not installed"
+
+
+warmup = Warmup()
+warmup.step("groq", _warm_groq)
+warmup.step("search", _warm_search)
+warmup.step("textstat", _warm_textstat)
+warmup.step("grammar", lambda: f"{len(get_spell_index())} dictionary words")
+warmup.step("sharedStore", lambda: f"{search_cache.stats()['entries']} cached searches")
+
+IMPORT_SECONDS = round(time.perf_counter() - STARTED_AT, 3)
+
+
+def _report_ready():
+    warmup.wait()
+    report = warmup.report()
+    steps = ", ".join(f"{name} {step['seconds']}s" for name, step in report["steps"].items())
+    print(f"✅ Ready {round(time.perf_counter() - STARTED_AT, 3)}s after start (warm-up {report['warmupSeconds']}s: {steps})")
+
+
+def start_warmup():
+    print(f"🚀 Module import took {IMPORT_SECONDS}s, warming up clients in the background")
+    warmup.start()
+    threading.Thread(target=_report_ready, daemon=True).start()
+
+
 # --- Endpoints ---
 @app.get("/")
 async def root():
     return {"message": "ARPS AI Engine Running (Groq Powered)", "version": "1.0.0"}
 
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok", "uptimeSeconds": round(time.perf_counter() - STARTED_AT, 3)}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once background warm-up has finished, 503 until then."""
+    report = warmup.report()
+    report["importSeconds"] = IMPORT_SECONDS
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
 @app.post("/generate-paper")
-async def generate_paper(request: GeneratePaperRequest):
+async def generate_paper(request: GeneratePaperRequest, raw_request: Request):
     """
     Generate a research paper with:
     - Real academic sources from web search
     - Humanized writing style to avoid AI detection
     - Proper citations linked to real sources
+
+    With `compact: true` (or `Accept: application/vnd.arps.paper-compact+json`)
+    the paper is returned once, as `sections`; `content`/`rawContent` are left
+    for the consumer to derive (render_paper_text).
+
+    Retries with the same `Idempotency-Key` (and identical requests, while in
+    progress and for PAPER_DEDUPE_TTL after) get the stored result instead of
+    a new paper. Papers with failed sections or a fallback outline are not stored.
     """
+    payload = request.dict()
+    payload.pop("compact")  # response shape only
+    paper, replayed = await run_idempotent(raw_request, "generate-paper", payload,
+                                           lambda: run_in_threadpool(build_paper, request), PAPER_DEDUPE_TTL,
+                                           paper_is_complete)
+
+    if wants_compact(request.compact, raw_request):
+        return idempotent_response({**paper, "format": "compact"}, replayed, {"Vary": "Accept"})
+
+    final_text = render_paper_text(paper["sections"])
+    return idempotent_response({
+        **paper,
+        "content": {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": final_text}]}]},
+        "rawContent": final_text
+    }, replayed, {"Vary": "Accept"})
+
+
+def build_paper(request: GeneratePaperRequest) -> dict:
+    """Sources, outline, sections and references of a new paper (compact form)."""
     
     # Step 1: Search for real academic sources
     print("Step 1: Searching for real academic sources...")
@@ -208,103 +663,95 @@ async def generate_paper(request: GeneratePaperRequest):
     if real_sources:
         sources_context = "Use these REAL sources for citations:\n"
         for src in real_sources:
-            sources_context += f"[{src['id']}] {src['title']} - {src['snippet'][:100]}...\n"
+            details = ", ".join(str(v) for v in (src.get("venue"), src.get("year")) if v)
+            details = f" ({details})" if details else ""
+            sources_context += f"[{src['id']}] {src['title']}{details} - {src['snippet'][:100]}...\n"
     else:
         sources_context = "Note: No real sources found. Generate realistic but clearly marked placeholder citations."
     
-    # Step 2: Generate Outline
+    # Step 2: Generate Outline (streamed; sections start as their titles arrive)
     print("Step 2: Generating Outline...")
     outline_prompt = f"""Create an outline for a research paper on: "{request.topic}"
     Domain: {request.domain}
     
     IMPORTANT: Be specific and creative with the title. Avoid generic titles.
     
-    Return ONLY a JSON object:
+    Return ONLY a JSON object, with the keys in this order:
     {{
         "title": "A specific, engaging title (not generic)",
+        "sections": ["I. INTRODUCTION", "II. RELATED WORK", "III. PROPOSED APPROACH", "IV. EXPERIMENTAL RESULTS", "V. DISCUSSION", "VI. CONCLUSION"],
         "abstract": "Draft abstract (100-150 words) - be specific about contributions",
-        "keywords": ["keyword1", "keyword2", ...],
-        "sections": ["I. INTRODUCTION", "II. RELATED WORK", "III. PROPOSED APPROACH", "IV. EXPERIMENTAL RESULTS", "V. DISCUSSION", "VI. CONCLUSION"]
+        "keywords": ["keyword1", "keyword2", ...]
     }}"""
-    
+    fallback_outline = {
+        "title": f"An Analysis of {request.topic}: Methods and Applications",
+        "abstract": f"This paper presents a comprehensive analysis of {request.topic}...",
+        "keywords": request.keywords or ["Research", request.domain],
+        "sections": ["I. INTRODUCTION", "II. RELATED WORK", "III. METHODOLOGY", "IV. RESULTS", "V. CONCLUSION"]
+    }
+
+    # Step 3 starts inside step 2: each section is queued as soon as its title is complete
+    pipeline = SectionPipeline(
+        request.topic, sources_context, request.length,
+        lambda prompt, system_prompt, max_tokens: generate_with_groq(prompt, system_prompt, max_tokens=max_tokens),
+        workers=PAPER_SECTION_WORKERS
+    )
+
+    def on_outline_value(path, value):
+        if not isinstance(value, str) or not value.strip():
+            return
+        if path == ("title",):
+            pipeline.set_title(value.strip())
+        elif path[:1] == ("sections",) and (len(path) == 2 or path[2:] == ("title",)):
+            pipeline.add(value.strip())
+
+    outline_parser = TolerantJSONParser(on_value=on_outline_value)
     try:
-        outline_res = generate_with_groq(outline_prompt, "You are a JSON generator. Output only valid JSON.", max_tokens=1024)
-        outline_res = outline_res.replace("```json", "").replace("```", "").strip()
-        outline_data = json.loads(outline_res)
+        for chunk in stream_with_groq(outline_prompt, "You are a JSON generator. Output only valid JSON.", max_tokens=1024):
+            outline_parser.feed(chunk)
     except Exception as e:
+        # Keep whatever arrived; missing fields come from the fallback outline
         print(f"Outline generation failed: {e}")
-        outline_data = {
-            "title": f"An Analysis of {request.topic}: Methods and Applications",
-            "abstract": f"This paper presents a comprehensive analysis of {request.topic}...",
-            "keywords": request.keywords or ["Research", request.domain],
-            "sections": ["I. INTRODUCTION", "II. RELATED WORK", "III. METHODOLOGY", "IV. RESULTS", "V. CONCLUSION"]
-        }
+    try:
+        parsed_outline = outline_parser.close()
+    except ValueError as e:
+        print(f"Outline could not be parsed: {e}")
+        parsed_outline = {}
+    outline_data, fallback_fields = complete_outline(parsed_outline, fallback_outline)
+    started_early = pipeline.started
+    if fallback_fields:
+        print(f"  Outline fields taken from the fallback: {', '.join(fallback_fields)}")
 
-    # Step 3: Generate Content for each section with humanized prompts
-    full_content = []
     sections_data = []
     
     # Add Title, Abstract, Keywords first
-    full_content.append(f"# {outline_data['title']}\n")
-    full_content.append(f"**Abstract**—{outline_data['abstract']}\n")
-    full_content.append(f"**Keywords**—{', '.join(outline_data['keywords'])}\n")
-    
     sections_data.append({"type": "title", "title": "Title", "content": outline_data['title'], "order": 0})
     sections_data.append({"type": "abstract", "title": "Abstract", "content": outline_data['abstract'], "order": 1})
     sections_data.append({"type": "keywords", "title": "Keywords", "content": ", ".join(outline_data['keywords']), "order": 2})
 
-    print("Step 3: Generating Sections with humanized writing...")
-    
-    # Humanization instructions to inject into every section prompt
-    humanization_rules = """
-CRITICAL WRITING STYLE RULES (follow these exactly):
-1. VARY sentence length dramatically - mix very short sentences (5-8 words) with longer ones (20-30 words)
-2. NEVER use these AI phrases: "It is important to note", "In this paper, we", "This study aims to", "Moreover", "Furthermore", "In conclusion"
-3. Use active voice predominantly: "We implemented..." not "The implementation was..."
-4. Include occasional rhetorical questions or direct reader address
-5. Add specific numbers, percentages, or measurements (even if estimated)
-6. Use contractions sparingly but naturally: "doesn't" instead of "does not" occasionally
-7. Start some sentences with "And" or "But" for natural flow
-8. Include brief asides or parenthetical comments (like this one)
-9. Reference the cited sources naturally: "Smith et al. demonstrated that..." or "As shown in [1]..."
-"""
+    print(f"Step 3: Generating Sections with humanized writing ({started_early} started while the outline streamed)...")
+    section_texts, generation_stats = pipeline.finish(outline_data['title'], outline_data['sections'])
+    generation_stats["outline"] = {"sectionsStartedEarly": started_early, "fallbackFields": fallback_fields}
+    print(f"  {generation_stats['calls']} LLM calls, ~{generation_stats['inputTokens']} input tokens "
+          f"(~{generation_stats['perSectionInputTokens']} with one full prompt per section)")
 
     for i, section_title in enumerate(outline_data['sections']):
-        print(f"  - Generating {section_title}...")
-        
-        section_prompt = f"""Write content for section "{section_title}" of the paper "{outline_data['title']}".
-Topic: {request.topic}
-
-{sources_context}
-
-{humanization_rules}
-
-SECTION-SPECIFIC GUIDANCE:
-- For INTRODUCTION: Start with a compelling hook. State the problem clearly. Preview your approach.
-- For RELATED WORK: Compare and contrast different approaches. Cite sources [1], [2], etc.
-- For METHODOLOGY/APPROACH: Be specific about steps. Use numbered lists if helpful.
-- For RESULTS: Include specific (realistic) metrics. Compare with baselines.
-- For DISCUSSION: Acknowledge limitations. Suggest future directions.
-- For CONCLUSION: Summarize key contributions. End with impact statement.
-
-Length: 250-350 words. Write ONLY the section content, not the title."""
-        
-        try:
-            time.sleep(0.5)
-            section_content = generate_with_groq(section_prompt, 
-                "You are an experienced academic researcher writing in a natural, engaging style.", 
-                max_tokens=1536)
-            
-            full_content.append(f"## {section_title}\n\n{section_content}\n")
+        section_content = section_texts.get(section_title)
+        if section_content is not None:
             sections_data.append({
                 "type": "section", 
                 "title": section_title, 
                 "content": section_content, 
                 "order": i + 3
             })
-        except Exception as e:
-            print(f"  Failed to generate {section_title}: {e}")
-            full_content.append(f"## {section_title}\n\n[Content generation failed]\n")
+        else:
+            sections_data.append({
+                "type": "section",
+                "title": section_title,
+                "content": "[Content generation failed]",
+                "order": i + 3,
+                "failed": True
+            })
 
     # Step 4: Generate References from real sources
     print("Step 4: Generating References...")
@@ -312,8 +759,7 @@ Length: 250-350 words. Write ONLY the section content, not the title."""
         ref_content = ""
         for src in real_sources:
             # Format as IEEE citation
-            ref_content += f"[{src['id']}] \"{src['title']},\" Available: {src['url']}, Accessed: 2024.\n"
-        full_content.append(f"## REFERENCES\n\n{ref_content}")
+            ref_content += format_source_reference(src) + "\n"
         sections_data.append({"type": "references", "title": "REFERENCES", "content": ref_content, "order": len(sections_data)})
     else:
         # Fallback: generate realistic placeholder citations
@@ -323,25 +769,21 @@ Length: 250-350 words. Write ONLY the section content, not the title."""
         
         try:
             ref_content = generate_with_groq(ref_prompt, max_tokens=512)
-            full_content.append(f"## REFERENCES\n\n{ref_content}")
             sections_data.append({"type": "references", "title": "REFERENCES", "content": ref_content, "order": len(sections_data)})
         except:
             pass
 
-    final_text = "\n".join(full_content)
-    
     return {
         "title": outline_data['title'],
         "keywords": outline_data['keywords'],
         "sections": sections_data,
         "sources": real_sources,  # Include found sources in response
-        "content": {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": final_text}]}]},
-        "rawContent": final_text
+        "generation": generation_stats,
     }
 
 
 @app.post("/improve-text")
-async def improve_text(request: ImproveTextRequest):
+def improve_text(request: ImproveTextRequest):
     action_prompts = {
         "grammar": "Fix all grammar, spelling, and punctuation errors in the following text. Only correct errors, don't change the meaning:",
         "academic_tone": "Rewrite the following text in formal academic tone suitable for a research paper. Make it more scholarly and professional:",
@@ -350,9 +792,23 @@ async def improve_text(request: ImproveTextRequest):
         "summarize": "Summarize the following text concisely while preserving the key points:",
         "professional": "Rewrite the following text to be more professional and polished:"
     }
+    request.text = resolve_text(request.text, request.documentId)
     
-    base_prompt = action_prompts.get(request.action, action_prompts["professional"])
-    truncated_text = truncate_text(request.text, 4000)
+    if request.action == "summarize":
+        max_words = request.maxWords or max(60, len(request.text.split()) // 4)
+        if request.mode == "fast":
+            return {
+                "original": request.text,
+                "improved": extract_summary(request.text, max_words=max_words)["summary"],
+                "action": request.action,
+                "mode": "fast"
+            }
+        # Long inputs: the LLM sees the salient sentences, not just the beginning
+        truncated_text = compress_for_llm(request.text, 4000)
+        base_prompt = f"{action_prompts['summarize']} Use at most {max_words} words."
+    else:
+        base_prompt = action_prompts.get(request.action, action_prompts["professional"])
+        truncated_text = truncate_text(request.text, 4000)
     prompt = f"{base_prompt}\n\n{truncated_text}"
     
     improved = generate_with_groq(prompt, max_tokens=2048)
@@ -365,7 +821,8 @@ async def improve_text(request: ImproveTextRequest):
 
 
 @app.post("/analyze-content")
-async def analyze_content(request: AnalyzeContentRequest):
+def analyze_content(request: AnalyzeContentRequest):
+    request.content = resolve_text(request.content, request.documentId)
     truncated_content = truncate_text(request.content, 3000)
     
     prompt = f"""Analyze the following content and identify:
@@ -378,7 +835,7 @@ Content:
 
 Be concise in your analysis."""
     
-    analysis = generate_with_groq(prompt, max_tokens=1024)
+    analysis = generate_with_groq(prompt, max_tokens=1024, cache=True)
     
     # Standard research paper sections
     standard_sections = ["Abstract", "Introduction", "Literature Review", "Methodology", 
@@ -392,66 +849,104 @@ Be concise in your analysis."""
     }
 
 
-@app.post("/check-plagiarism")
-async def check_plagiarism(request: PlagiarismRequest):
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences long enough to be worth fingerprinting."""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    return [s.strip() for s in sentences if len(s.strip()) > 30]
+
+
+def find_sentence_match(sentence: str) -> Optional[dict]:
+    """
+    Search the web for a single sentence.
+    Returns the best matching source (or None) - search errors propagate to the caller.
+    """
+    # Create a search query from the sentence (first 100 chars)
+    query = f'"{sentence[:100]}"'
+    results = cached_search(query, max_results=3)
+
+    # Check if any result snippet contains similar text
+    for result in results or []:
+        snippet = result.get('body', '').lower()
+        # Simple similarity check: if >50% of words match
+        sentence_words = set(sentence.lower().split())
+        snippet_words = set(snippet.split())
+        overlap = len(sentence_words & snippet_words) / max(len(sentence_words), 1)
+
+        if overlap > 0.4:  # 40% word overlap threshold
+            return {
+                "text": sentence,
+                "similarity": int(overlap * 100),
+                "source": result.get('title', 'Unknown Source'),
+                "sourceUrl": result.get('href', '#')
+            }
+    return None
+
+
+def llm_plagiarism_score(text: str) -> Optional[int]:
+    """LLM plagiarism estimate, or None if the LLM call/answer failed."""
+    truncated_text = truncate_text(text, 2000)
+    prompt = f"""Analyze this text for plagiarism indicators. Look for:
+1. Common phrases that appear copied
+2. Inconsistent writing styles
+3. Academic clichés
+
+Text: {truncated_text}
+
+Return JSON only: {{"score": 0-100, "reasons": ["reason1", "reason2"]}}"""
+    
+    try:
+        result = generate_with_groq(prompt, "You are a plagiarism detector. Return only valid JSON.", max_tokens=512, cache=True)
+        result = result.replace("```json", "").replace("```", "").strip()
+        data = json.loads(result)
+        return data.get("score", 15)
+    except Exception:
+        return None
+
+
+def plagiarism_suggestions(flagged_sentences: List[dict]) -> List[str]:
+    if flagged_sentences:
+        return [f"Found {len(flagged_sentences)} potential matches from web sources."]
+    return ["No exact matches found in web search."]
+
+
+def analyze_plagiarism(text: str, sentences: Optional[List[str]] = None) -> dict:
     """
     Professional plagiarism checker using web search.
     Extracts text fingerprints and searches for matches online.
+    Pass `sentences` to reuse an existing segmentation of the text.
     """
-    text = request.text.strip()
+    text = text.strip()
     if len(text) < 50:
         return {"score": 0, "flaggedSentences": [], "suggestions": ["Text too short to analyze."]}
     
-    # Split into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 30]
+    if sentences is None:
+        sentences = split_sentences(text)
     
     flagged_sentences = []
     total_checked = 0
     matched_count = 0
+    degraded = False
     
-    if DDGS_AVAILABLE and len(sentences) > 0:
+    if search_clients.available and len(sentences) > 0:
         try:
-            ddgs = DDGS()
             # Check up to 5 sentences to avoid rate limiting
             sentences_to_check = sentences[:5]
             
             for sentence in sentences_to_check:
                 total_checked += 1
-                # Create a search query from the sentence (first 100 chars)
-                query = f'"{sentence[:100]}"'
-                
                 try:
-                    results = list(ddgs.text(query, max_results=3))
-                    
-                    if results:
-                        # Check if any result snippet contains similar text
-                        for result in results:
-                            snippet = result.get('body', '').lower()
-                            # Simple similarity check: if >50% of words match
-                            sentence_words = set(sentence.lower().split())
-                            snippet_words = set(snippet.split())
-                            overlap = len(sentence_words & snippet_words) / max(len(sentence_words), 1)
-                            
-                            if overlap > 0.4:  # 40% word overlap threshold
-                                matched_count += 1
-                                flagged_sentences.append({
-                                    "id": len(flagged_sentences) + 1,
-                                    "text": sentence,
-                                    "similarity": int(overlap * 100),
-                                    "source": result.get('title', 'Unknown Source'),
-                                    "sourceUrl": result.get('href', '#')
-                                })
-                                break
+                    match = find_sentence_match(sentence)
+                    if match:
+                        matched_count += 1
+                        flagged_sentences.append({"id": len(flagged_sentences) + 1, **match})
                 except Exception as e:
                     print(f"Search error for sentence: {e}")
+                    degraded = True
                     continue
-                    
-                # Small delay to avoid rate limiting
-                time.sleep(0.3)
                 
         except Exception as e:
             print(f"DuckDuckGo search error: {e}")
+            degraded = True
     
     # Calculate plagiarism score
     if total_checked > 0:
@@ -460,34 +955,36 @@ async def check_plagiarism(request: PlagiarismRequest):
         score = 0
     
     # If no web search available, fall back to LLM analysis
-    if not DDGS_AVAILABLE or total_checked == 0:
-        truncated_text = truncate_text(text, 2000)
-        prompt = f"""Analyze this text for plagiarism indicators. Look for:
-1. Common phrases that appear copied
-2. Inconsistent writing styles
-3. Academic clichés
-
-Text: {truncated_text}
-
-Return JSON only: {{"score": 0-100, "reasons": ["reason1", "reason2"]}}"""
-        
-        try:
-            result = generate_with_groq(prompt, "You are a plagiarism detector. Return only valid JSON.", max_tokens=512)
-            result = result.replace("```json", "").replace("```", "").strip()
-            data = json.loads(result)
-            score = data.get("score", 15)
-        except:
+    if not search_clients.available or total_checked == 0:
+        score = llm_plagiarism_score(text)
+        if score is None:
             score = 10  # Default low score if analysis fails
+            degraded = True
     
-    return {
+    result = {
         "score": min(score, 100),
         "flaggedSentences": flagged_sentences,
-        "suggestions": [f"Found {len(flagged_sentences)} potential matches from web sources."] if flagged_sentences else ["No exact matches found in web search."]
+        "suggestions": plagiarism_suggestions(flagged_sentences)
     }
+    if degraded:
+        result["degraded"] = True  # fallback score; not stored for replay
+    return result
+
+
+@app.post("/check-plagiarism")
+async def check_plagiarism(request: PlagiarismRequest, raw_request: Request):
+    text = await run_in_threadpool(resolve_text, request.text, request.documentId)
+
+    async def compute():
+        return await run_in_threadpool(analyze_plagiarism, text)
+    result, replayed = await run_idempotent(raw_request, "check-plagiarism", request.dict(), compute,
+                                            ANALYSIS_RESULT_TTL, result_is_complete)
+    return idempotent_response(result, replayed)
 
 
 @app.post("/fix-plagiarism")
-async def fix_plagiarism(request: PlagiarismRequest):
+def fix_plagiarism(request: PlagiarismRequest):
+    request.text = resolve_text(request.text, request.documentId)
     truncated_text = truncate_text(request.text, 3000)
     
     prompt = f"""Completely rewrite the following text to be 100% original while preserving the meaning and academic tone. Use different:
@@ -509,7 +1006,7 @@ Provide the rewritten version."""
 
 
 @app.post("/get-suggestions")
-async def get_suggestions(request: SuggestionsRequest):
+def get_suggestions(request: SuggestionsRequest):
     context_info = f"Context: {request.context}" if request.context else ""
     truncated_text = truncate_text(request.text, 3000)
     
@@ -536,8 +1033,22 @@ Be concise."""
 
 
 @app.post("/generate-literature-review")
-async def generate_literature_review(request: LiteratureReviewRequest):
-    papers_info = "\n".join([f"- {p.get('title', 'Unknown')}: {p.get('abstract', '')[:200]}" for p in request.papers[:5]]) if request.papers else "No specific papers provided"
+def generate_literature_review(request: LiteratureReviewRequest):
+    """
+    Literature review grounded in the most relevant references: the user's
+    library (BM25 over the topic) followed by any papers sent with the request,
+    packed into the prompt within `tokenBudget`.
+    """
+    candidates = []
+    if request.userId:
+        started = time.perf_counter()
+        hits = reference_library.search(request.userId, request.topic, limit=request.maxReferences)
+        print(f"📚 Retrieved {len(hits)} library references in {(time.perf_counter() - started) * 1000:.1f}ms")
+        candidates.extend(record for record, _ in hits)
+    candidates.extend(request.papers)
+    papers_info, used = pack_references(candidates[:request.maxReferences + len(request.papers)], request.tokenBudget)
+    if not papers_info:
+        papers_info = "No specific papers provided"
     
     prompt = f"""Generate a comprehensive literature review section for a research paper on: "{request.topic}"
 
@@ -554,13 +1065,109 @@ Write a proper academic literature review that:
     
     return {
         "content": content,
-        "citations": []
+        "citations": [
+            {"number": i + 1, "id": r.get("id") or r.get("_id"), "title": r.get("title", "Unknown")}
+            for i, r in enumerate(used)
+        ]
     }
 
 
+@app.post("/library/{user_id}/references")
+def import_library_references(user_id: str, request: LibraryImportRequest):
+    """Add/update (or, with replace, sync) a user's reference library."""
+    try:
+        result = reference_library.upsert(user_id, request.references, replace=request.replace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "total": reference_library.size(user_id)}
+
+
+@app.delete("/library/{user_id}/references/{ref_id}")
+def delete_library_reference(user_id: str, ref_id: str):
+    removed = reference_library.delete(user_id, [ref_id])
+    return {"deleted": removed, "total": reference_library.size(user_id)}
+
+
+@app.get("/library/{user_id}/search")
+def search_library(user_id: str, q: str, limit: int = 10):
+    """Ranked references for a query (BM25, no LLM call)."""
+    hits = reference_library.search(user_id, q, limit=limit)
+    return {"results": [{**record, "score": round(score, 3)} for record, score in hits]}
+
+
+class UploadTooLarge(MultiPartException):
+    pass
+
+
+async def limited_body(raw_request: Request):
+    """The request body, aborting as soon as it exceeds MAX_UPLOAD_BYTES."""
+    received = 0
+    async for chunk in raw_request.stream():
+        received += len(chunk)
+        if received > MAX_UPLOAD_BYTES:
+            # Raised inside the multipart parser, which then closes its spooled files
+            raise UploadTooLarge(f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+        yield chunk
+
+
+@app.post("/documents/upload")
+async def upload_document(raw_request: Request):
+    """
+    Upload a PDF, DOCX or text file (multipart, field `file`). The body is
+    size-checked while it streams in and spooled to disk; its text is then
+    extracted page/paragraph by paragraph into the document store.
+    Returns a `documentId` that text endpoints accept instead of the text itself.
+    """
+    declared = raw_request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+    if not raw_request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=422, detail="Expected a multipart/form-data upload with a `file` field")
+    try:
+        form = await MultiPartParser(raw_request.headers, limited_body(raw_request), max_files=1, max_fields=10).parse()
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=e.message)
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=422, detail="Expected a multipart/form-data upload with a `file` field")
+        try:
+            meta = await run_in_threadpool(document_store.ingest, file.file, file.filename, file.content_type)
+        except UnsupportedDocument as e:
+            raise HTTPException(status_code=415, detail=str(e))
+    finally:
+        await form.close()
+    print(f"📄 Ingested {meta['filename']}: {meta['paragraphs']} paragraphs, {meta['words']} words")
+    return meta
+
+
+@app.get("/documents/{document_id}")
+def get_document(document_id: str, includeText: bool = False):
+    meta = require_document(document_id)
+    if includeText:
+        return {**meta, "text": document_text(document_id)}
+    return meta
+
+
+@app.delete("/documents/{document_id}")
+def delete_document(document_id: str):
+    if not document_store.delete(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"deleted": document_id}
+
+
 @app.post("/generate-abstract")
-async def generate_abstract(request: AbstractRequest):
-    truncated_content = truncate_text(request.content, 4000)
+def generate_abstract(request: AbstractRequest):
+    request.content = resolve_text(request.content, request.documentId)
+    if request.mode == "fast":
+        summary = extract_summary(request.content, max_words=request.maxWords)
+        return {"abstract": summary["summary"], "mode": "fast"}
+
+    # Long documents: pre-compress to their most salient sentences
+    truncated_content = compress_for_llm(request.content, 4000)
     
     prompt = f"""Generate a professional research paper abstract based on the following content.
     
@@ -579,46 +1186,118 @@ Content:
     return {"abstract": abstract}
 
 
-@app.post("/check-grammar")
-async def check_grammar(request: GrammarRequest):
-    truncated_text = truncate_text(request.text, 3000)
-    
-    prompt = f"""Analyze the following text for grammar, spelling, and punctuation errors.
+def paragraph_spans(text: str) -> List[tuple]:
+    """(start, end) offsets of the blank-line separated paragraphs of a text."""
+    spans = []
+    start = 0
+    for match in re.finditer(r'\n\s*\n', text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [(s, e) for s, e in spans if text[s:e].strip()]
+
+
+def llm_grammar_errors(paragraph: str, base_offset: int) -> List[dict]:
+    """Ask the LLM for errors in one paragraph and anchor them to offsets."""
+    prompt = f"""Find the grammar, spelling, and punctuation errors in the text below.
 
 Text:
-{truncated_text}
+{truncate_text(paragraph, 3000)}
 
-For each error found, provide:
-1. The error
-2. The correction
-3. Brief explanation
+Return ONLY a JSON array (empty if there are no errors):
+[{{"error": "exact erroneous text as it appears", "correction": "corrected text", "explanation": "brief reason"}}]"""
 
-Also provide an overall grammar score from 0-100. Be concise."""
-    
-    result = generate_with_groq(prompt, max_tokens=1024)
-    
-    return {
-        "score": 85,  # Placeholder
-        "errors": [],
-        "corrections": [result]
+    raw = generate_with_groq(prompt, "You are a JSON generator. Output only valid JSON.", max_tokens=1024, cache=True)
+    raw = raw.replace("```json", "").replace("```", "").strip()
+    try:
+        items = json.loads(raw[raw.index("["):raw.rindex("]") + 1])
+    except ValueError:
+        print("⚠️  Could not parse LLM grammar response")
+        return []
+
+    errors = []
+    search_from = 0
+    for item in items:
+        if not isinstance(item, dict) or not item.get("error"):
+            continue
+        position = paragraph.find(item["error"], search_from)
+        if position == -1:
+            position = paragraph.find(item["error"])
+        if position == -1:
+            continue
+        search_from = position + len(item["error"])
+        errors.append({
+            "offset": base_offset + position,
+            "length": len(item["error"]),
+            "text": item["error"],
+            "type": "grammar",
+            "rule": "LLM",
+            "message": item.get("explanation", ""),
+            "suggestions": [item["correction"]] if item.get("correction") else []
+        })
+    return errors
+
+
+def analyze_grammar(text: str, mode: str = "auto") -> dict:
+    """
+    Local spelling/grammar check with offset-anchored errors and a computed
+    score. Only paragraphs containing words the local dictionary can't
+    resolve are escalated to the LLM (mode="auto").
+    """
+    local = check_text(text)
+    errors = list(local["errors"])
+    unresolved = local["unresolved"]
+
+    escalated = 0
+    degraded = False
+    if mode != "local" and unresolved and get_groq_client() is not None:
+        spans = [span for span in paragraph_spans(text)
+                 if any(span[0] <= word["offset"] < span[1] for word in unresolved)]
+        for start, end in spans[:GRAMMAR_MAX_ESCALATIONS]:
+            try:
+                llm_errors = llm_grammar_errors(text[start:end], start)
+            except HTTPException as e:
+                print(f"⚠️  Grammar escalation skipped: {e.detail}")
+                degraded = True
+                break
+            escalated += 1
+            covered = {(e["offset"], e["length"]) for e in errors}
+            errors.extend(e for e in llm_errors if (e["offset"], e["length"]) not in covered)
+            unresolved = [w for w in unresolved if not start <= w["offset"] < end]
+        errors.sort(key=lambda e: e["offset"])
+
+    result = {
+        "score": grammar_score(errors, local["words"]),
+        "errors": errors,
+        "corrections": [f"{e['text']} → {e['suggestions'][0]}: {e['message']}" for e in errors if e["suggestions"]],
+        "unresolved": unresolved,
+        "stats": {
+            "words": local["words"],
+            "localErrors": len(local["errors"]),
+            "escalatedParagraphs": escalated
+        }
     }
+    if degraded:
+        result["degraded"] = True  # escalation failed; unresolved words left unchecked
+    return result
 
 
-@app.post("/detect-ai-content")
-async def detect_ai_content(request: AIDetectionRequest):
+@app.post("/check-grammar")
+def check_grammar(request: GrammarRequest):
+    return analyze_grammar(resolve_text(request.text, request.documentId), mode=request.mode)
+
+
+def compute_ai_indicators(text: str):
     """
-    Professional AI content detector using text metrics and LLM analysis.
-    Combines statistical analysis (readability, patterns) with AI evaluation.
+    Local (no network) statistical analysis of a text.
+    Returns (indicators, metrics).
     """
-    text = request.text.strip()
-    if len(text) < 50:
-        return {"score": 0, "analysis": "Text too short to analyze."}
-    
     indicators = []
     metrics = {}
     
     # --- Metric Analysis using textstat ---
-    if TEXTSTAT_AVAILABLE:
+    textstat = get_textstat()
+    if textstat is not None:
         try:
             # Readability scores - AI text often falls in specific ranges
             flesch_reading = textstat.flesch_reading_ease(text)
@@ -673,6 +1352,11 @@ async def detect_ai_content(request: AIDetectionRequest):
             if variance < 20:  # Low variance = very consistent = likely AI
                 indicators.append("Very low sentence length variance (AI pattern)")
     
+    return indicators, metrics
+
+
+def score_ai_content(text: str, indicators: List[str], metrics: dict, use_llm: bool = True) -> dict:
+    """Combine local indicators with an LLM verdict into the final AI score."""
     # --- LLM Analysis for final scoring ---
     truncated_text = truncate_text(text, 2000)
     prompt = f"""You are an expert AI content detector. Analyze this text and determine if it was written by AI or a human.
@@ -692,27 +1376,32 @@ Analyze for:
 Return ONLY valid JSON:
 {{"ai_probability": 0-100, "confidence": 0-100, "key_reasons": ["reason1", "reason2", "reason3"]}}"""
 
-    try:
-        result = generate_with_groq(prompt, "You are an AI detector. Return only valid JSON.", max_tokens=512)
-        result = result.replace("```json", "").replace("```", "").strip()
-        data = json.loads(result)
-        
-        ai_score = data.get("ai_probability", 50)
-        confidence = data.get("confidence", 70)
-        reasons = data.get("key_reasons", [])
-        
-        # Adjust score based on our metric indicators
-        indicator_boost = len(indicators) * 8  # Each indicator adds 8%
-        final_score = min(100, ai_score + indicator_boost)
-        
-    except Exception as e:
-        print(f"AI detection LLM error: {e}")
-        # Fallback to indicator-based scoring
+    final_score = None
+    if use_llm:
+        try:
+            result = generate_with_groq(prompt, "You are an AI detector. Return only valid JSON.", max_tokens=512, cache=True)
+            result = result.replace("```json", "").replace("```", "").strip()
+            data = json.loads(result)
+            
+            ai_score = data.get("ai_probability", 50)
+            confidence = data.get("confidence", 70)
+            reasons = data.get("key_reasons", [])
+            
+            # Adjust score based on our metric indicators
+            indicator_boost = len(indicators) * 8  # Each indicator adds 8%
+            final_score = min(100, ai_score + indicator_boost)
+            
+        except Exception as e:
+            print(f"AI detection LLM error: {e}")
+    
+    degraded = use_llm and final_score is None
+    if final_score is None:
+        # Fallback to indicator-based scoring (LLM failed or was skipped)
         final_score = min(100, 30 + len(indicators) * 15)
         confidence = 60
-        reasons = indicators or ["Analysis based on text patterns"]
+        reasons = [] if indicators else ["Analysis based on text patterns"]  # indicators are appended below
     
-    return {
+    result = {
         "score": final_score,
         "confidence": confidence,
         "analysis": {
@@ -720,33 +1409,286 @@ Return ONLY valid JSON:
             "metrics": metrics
         }
     }
+    if degraded:
+        result["degraded"] = True  # LLM failed, indicator-only score; not stored for replay
+    return result
 
 
-@app.post("/convert-citation")
-async def convert_citation(request: CitationConvertRequest):
-    prompt = f"""Convert the following citation from {request.sourceFormat} format to IEEE format.
+def analyze_ai_content(text: str, precomputed: Optional[tuple] = None) -> dict:
+    """
+    Professional AI content detector using text metrics and LLM analysis.
+    Combines statistical analysis (readability, patterns) with AI evaluation.
+    Pass `precomputed` (indicators, metrics) to reuse an earlier local analysis.
+    """
+    text = text.strip()
+    if len(text) < 50:
+        return {"score": 0, "analysis": "Text too short to analyze."}
+    
+    indicators, metrics = precomputed if precomputed is not None else compute_ai_indicators(text)
+    return score_ai_content(text, indicators, metrics)
+
 
-Original citation:
-{request.citation}
+def analyze_ai_paragraph(paragraph: str) -> dict:
+    """Local-only (no LLM) AI score of one paragraph, for batch and incremental checks."""
+    paragraph = paragraph.strip()
+    if len(paragraph) < 50:
+        return {"score": 0, "analysis": "Text too short to analyze."}
+    indicators, metrics = compute_ai_indicators(paragraph)
+    return score_ai_content(paragraph, indicators, metrics, use_llm=False)
+
+
+def ai_document_verdict(text: str, aggregate: dict) -> dict:
+    """
+    One LLM verdict for a document whose paragraphs were scored locally
+    (`aggregate`); the LLM sees the same leading 2000 chars as /detect-ai-content.
+    Falls back to the aggregate, marked degraded, if the LLM call fails.
+    """
+    verdict = analyze_ai_content(text[:2000])
+    if verdict.get("degraded") or not isinstance(verdict.get("analysis"), dict):
+        return {**aggregate, "degraded": True}
+    verdict["analysis"]["paragraphScores"] = aggregate["analysis"]["paragraphScores"]
+    return verdict
 
-Provide the properly formatted IEEE citation."""
+
+@app.post("/detect-ai-content")
+async def detect_ai_content(request: AIDetectionRequest, raw_request: Request):
+    text = await run_in_threadpool(resolve_text, request.text, request.documentId)
+
+    async def compute():
+        return await run_in_threadpool(analyze_ai_content, text)
+    result, replayed = await run_idempotent(raw_request, "detect-ai-content", request.dict(), compute,
+                                            ANALYSIS_RESULT_TTL, result_is_complete)
+    return idempotent_response(result, replayed)
+
+
+MAX_BATCH_DOCUMENTS = int(os.getenv("MAX_BATCH_DOCUMENTS", "200"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "3"))
+
+
+def validate_batch(request: BatchAnalysisRequest) -> List[tuple]:
+    if not request.documents:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    if len(request.documents) > MAX_BATCH_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {MAX_BATCH_DOCUMENTS} documents)")
+    ids = [doc.id for doc in request.documents]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Document ids must be unique")
+    documents = []
+    for doc in request.documents:
+        if doc.documentId:
+            documents.append((doc.id, document_text(doc.documentId).strip()))
+        else:
+            documents.append((doc.id, doc.text.strip()))
+    return documents
+
+
+@app.post("/batch/check-plagiarism")
+def batch_check_plagiarism(request: BatchAnalysisRequest):
+    """
+    Plagiarism scan for many documents in one request.
+    Identical sentences are searched once, the search/LLM budget is shared by the
+    whole batch, and documents are cross-compared for collusion.
+    Streams one NDJSON line per document as it completes, then a summary line.
+    """
+    documents = validate_batch(request)
+    budget = BatchBudget(request.maxSearches, request.maxLLMCalls)
+    print(f"📦 Batch plagiarism scan: {len(documents)} documents")
+    lines = stream_plagiarism_batch(documents, split_sentences, find_sentence_match,
+                                    llm_plagiarism_score, budget,
+                                    search_available=search_clients.available, workers=BATCH_WORKERS)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.post("/batch/detect-ai-content")
+def batch_detect_ai_content(request: BatchAnalysisRequest):
+    """
+    AI-content detection for many documents in one request.
+    Local metrics run in parallel once per unique paragraph (paragraphs shared
+    by several documents are scored once); LLM verdicts are requested per
+    document only while the shared budget lasts.
+    Streams one NDJSON line per document as it completes, then a summary line.
+    """
+    documents = validate_batch(request)
+    budget = BatchBudget(0, request.maxLLMCalls)
+    print(f"📦 Batch AI detection: {len(documents)} documents")
+    lines = stream_ai_detection_batch(documents, analyze_ai_paragraph, ai_document_verdict,
+                                      budget, workers=BATCH_WORKERS)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+# Per-paragraph results shared by all incremental analysis requests
+paragraph_cache = ParagraphCache(max_entries=int(os.getenv("PARAGRAPH_CACHE_SIZE", "5000")),
+                                 store=shared_store, ttl=LLM_CACHE_TTL)
+# Web searches / LLM estimates one incremental plagiarism check may spend on
+# its changed paragraphs (a full /check-plagiarism searches 5 sentences)
+INCREMENTAL_MAX_SEARCHES = int(os.getenv("INCREMENTAL_MAX_SEARCHES", "10"))
+INCREMENTAL_MAX_LLM_CALLS = int(os.getenv("INCREMENTAL_MAX_LLM_CALLS", "2"))
+
+
+def incremental_plagiarism(paragraphs: List[str]) -> List[dict]:
+    """Changed paragraphs checked like a batch: shared sentences once, one search budget."""
+    budget = BatchBudget(INCREMENTAL_MAX_SEARCHES, INCREMENTAL_MAX_LLM_CALLS)
+    results = {}
+    for item in iter_plagiarism_batch([(str(i), p.strip()) for i, p in enumerate(paragraphs)],
+                                      split_sentences, find_sentence_match, llm_plagiarism_score, budget,
+                                      search_available=search_clients.available, workers=BATCH_WORKERS,
+                                      collusion=False):
+        if item["type"] == "result":
+            results[item["id"]] = item["result"]
+    return [results[str(i)] for i in range(len(paragraphs))]
+
+
+def incremental_ai_detection(paragraphs: List[str]) -> List[dict]:
+    # Local scores only; the LLM verdict is taken once for the document (ai_document_verdict)
+    return [analyze_ai_paragraph(p) for p in paragraphs]
+
+
+def incremental_grammar(paragraphs: List[str]) -> List[dict]:
+    """Local checks; LLM escalations are capped per request like a full /check-grammar."""
+    results = []
+    escalations_left = GRAMMAR_MAX_ESCALATIONS
+    for paragraph in paragraphs:
+        result = analyze_grammar(paragraph, mode="auto" if escalations_left > 0 else "local")
+        escalations_left -= result["stats"]["escalatedParagraphs"]
+        if escalations_left <= 0 and result["unresolved"] and not result["stats"]["escalatedParagraphs"] \
+                and get_groq_client() is not None:
+            result["degraded"] = True  # not escalated this time; retried on the next check
+        results.append(result)
+    return results
+
+
+@app.post("/analyze-incremental")
+def analyze_incremental(request: IncrementalAnalysisRequest):
+    """
+    Incremental re-analysis for the editor.
+    Only paragraphs whose content changed since a previous check are re-analyzed,
+    together and within one search/LLM budget; document-level scores are
+    aggregated from cached per-paragraph results. AI detection scores paragraphs
+    locally and takes a single LLM verdict for the document.
+    """
+    analyzers = {
+        "plagiarism": incremental_plagiarism,
+        "ai": incremental_ai_detection,
+        "grammar": incremental_grammar,
+    }
+    unknown = [c for c in request.checks if c not in analyzers]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown checks: {', '.join(unknown)}")
+
+    paragraphs = None
+    if request.documentId:
+        # Streamed from the stored file; only changed paragraphs are kept in memory
+        try:
+            paragraphs = document_store.iter_paragraphs(request.documentId)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Document not found or expired, please upload it again")
+    result = analyze_incrementally(request.text, analyzers, request.checks, paragraph_cache, paragraphs=paragraphs,
+                                   finalizers={"ai": ai_document_verdict})
+    print(f"♻️  Incremental analysis: {result['stats']['recomputed']} recomputed, {result['stats']['cached']} cached")
+    return result
+
+
+def convert_citations_with_llm(citations: List[str], source_format: str) -> List[Optional[str]]:
+    """Convert citations the rule-based parser couldn't handle, in a single LLM call."""
+    numbered = "\n".join(f"[{i + 1}] {c}" for i, c in enumerate(citations))
+    prompt = f"""Convert each of the following citations from {source_format or "their current"} format to IEEE format.
+
+Original citations:
+{numbered}
+
+Return one line per citation, keeping the same [N] numbers, and nothing else."""
     
-    converted = generate_with_groq(prompt, max_tokens=256)
+    converted = generate_with_groq(prompt, max_tokens=256 * len(citations), cache=True)
+    
+    if len(citations) == 1:
+        return [re.sub(r'^\s*\[1\]\s*', '', converted.strip())]
+    results = [None] * len(citations)
+    for line in converted.splitlines():
+        match = re.match(r'^\s*\[(\d+)\]\s*(.+)$', line)
+        if match and 1 <= int(match.group(1)) <= len(citations):
+            results[int(match.group(1)) - 1] = match.group(2).strip()
+    return results
+
+
+@app.post("/convert-citation")
+def convert_citation(request: CitationConvertRequest):
+    """
+    Convert a citation to IEEE.
+    Common APA/MLA/Chicago/IEEE citations are parsed and formatted locally;
+    the LLM is only used when the citation can't be parsed.
+    """
+    fields = parse_citation(request.citation, request.sourceFormat) if request.targetFormat.upper() == "IEEE" else None
+    if fields:
+        return {
+            "original": request.citation,
+            "converted": format_ieee(fields),
+            "format": "IEEE",
+            "method": "rules",
+            "fields": fields
+        }
+    
+    converted = convert_citations_with_llm([request.citation], request.sourceFormat)[0]
     
     return {
         "original": request.citation,
         "converted": converted,
-        "format": "IEEE"
+        "format": "IEEE",
+        "method": "llm"
     }
 
 
-@app.post("/rewrite-text")
-async def rewrite_text(request: PlagiarismRequest):
+@app.post("/convert-citations")
+def convert_citations(request: CitationBatchRequest):
+    """
+    Convert a whole reference list to numbered IEEE references.
+    Entries are parsed locally; unparseable ones go to the LLM together in one call.
+    """
+    citations = list(request.citations)
+    if request.text:
+        citations += split_reference_list(request.text)
+    if not citations:
+        raise HTTPException(status_code=400, detail="No citations provided")
+
+    results = []
+    unparsed = []
+    for i, citation in enumerate(citations):
+        fields = parse_citation(citation, request.sourceFormat)
+        if fields:
+            results.append({"original": citation, "converted": format_ieee(fields, i + 1), "method": "rules", "fields": fields})
+        else:
+            results.append({"original": citation, "converted": None, "method": "llm"})
+            unparsed.append(i)
+
+    if unparsed:
+        print(f"📚 {len(unparsed)}/{len(citations)} citations need LLM conversion")
+        try:
+            converted = convert_citations_with_llm([citations[i] for i in unparsed], request.sourceFormat)
+        except HTTPException as e:
+            print(f"❌ LLM citation fallback failed: {e.detail}")
+            converted = [None] * len(unparsed)
+        for i, text in zip(unparsed, converted):
+            if text:
+                results[i]["converted"] = f"[{i + 1}] {text}"
+            else:
+                results[i]["method"] = "failed"
+
+    return {
+        "references": results,
+        "format": "IEEE",
+        "stats": {
+            "total": len(citations),
+            "rules": len(citations) - len(unparsed),
+            "llm": sum(1 for r in results if r["method"] == "llm")
+        }
+    }
+
+
+def paraphrase_text(text: str) -> str:
     """
     Rewrite text to reduce plagiarism while maintaining meaning.
     Uses paraphrasing techniques that preserve academic quality.
     """
-    truncated_text = truncate_text(request.text, 2500)
+    truncated_text = truncate_text(text, REWRITE_INPUT_CHARS)
     
     prompt = f"""You are an academic paraphrasing expert. Rewrite this text to be 100% original while preserving its meaning and academic quality.
 
@@ -769,9 +1711,15 @@ Original text:
 
 Provide ONLY the rewritten version."""
     
-    rewritten = generate_with_groq(prompt, 
+    return generate_with_groq(prompt, 
         "You are an expert academic paraphraser who helps researchers express ideas originally.",
         max_tokens=2048)
+
+
+@app.post("/rewrite-text")
+def rewrite_text(request: PlagiarismRequest):
+    request.text = resolve_text(request.text, request.documentId)
+    rewritten = paraphrase_text(request.text)
     
     return {
         "rewrittenText": rewritten.strip(),
@@ -780,13 +1728,12 @@ Provide ONLY the rewritten version."""
     }
 
 
-@app.post("/humanize-text")
-async def humanize_text(request: AIDetectionRequest):
+def humanize_content(text: str) -> str:
     """
     Humanize AI-generated text to make it sound more natural.
     Uses sophisticated techniques to avoid AI detection patterns.
     """
-    truncated_text = truncate_text(request.text, 2500)
+    truncated_text = truncate_text(text, REWRITE_INPUT_CHARS)
     
     prompt = f"""You are a skilled academic editor. Rewrite this text to sound like it was written by an experienced human researcher.
 
@@ -814,9 +1761,15 @@ Original text:
 
 Provide ONLY the humanized version. Preserve the core meaning and academic rigor."""
     
-    humanized = generate_with_groq(prompt, 
+    return generate_with_groq(prompt, 
         "You are an experienced academic writer helping a colleague polish their draft.",
         max_tokens=2048)
+
+
+@app.post("/humanize-text")
+def humanize_text(request: AIDetectionRequest):
+    request.text = resolve_text(request.text, request.documentId)
+    humanized = humanize_content(request.text)
     
     return {
         "humanizedText": humanized.strip(),
@@ -825,6 +1778,35 @@ Provide ONLY the humanized version. Preserve the core meaning and academic rigor
     }
 
 
+@app.post("/run-pipeline")
+def run_analysis_pipeline(request: PipelineRequest):
+    """
+    Run a chain of check/rewrite stages server-side in one round trip.
+    Segmentation, metrics and check results are shared between stages, identical
+    LLM prompts are answered once, and steps with an unmet `when` are skipped.
+    """
+    checks = {
+        "check-plagiarism": lambda ctx: analyze_plagiarism(
+            ctx.text, sentences=ctx.artifact("sentences", lambda: split_sentences(ctx.text))),
+        "detect-ai-content": lambda ctx: analyze_ai_content(
+            ctx.text, precomputed=ctx.artifact("ai-indicators", lambda: compute_ai_indicators(ctx.text))),
+        "check-grammar": lambda ctx: analyze_grammar(ctx.text),
+    }
+    # The rewrite prompts only take REWRITE_INPUT_CHARS; longer documents are
+    # rewritten chunk by chunk so no text is lost between stages
+    transforms = {
+        "rewrite-text": lambda ctx: transform_in_chunks(ctx.text, paraphrase_text, REWRITE_INPUT_CHARS),
+        "humanize-text": lambda ctx: transform_in_chunks(ctx.text, humanize_content, REWRITE_INPUT_CHARS),
+    }
+    unknown = [step.stage for step in request.steps if step.stage not in checks and step.stage not in transforms]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown stages: {', '.join(unknown)}")
+
+    steps = [step.dict(exclude_none=True) for step in request.steps]
+    result = run_pipeline(resolve_text(request.text, request.documentId), steps, checks, transforms)
+    print(f"🔗 Pipeline finished: {len(steps)} steps, {result['stats']['llmCalls']} LLM calls")
+    return result
+
 
 if __name__ == "__main__":
     import uvicorn
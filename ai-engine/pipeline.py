@@ -0,0 +1,163 @@
+"""
+Server-side analysis pipeline: check -> rewrite -> re-check in one round trip.
+
+A pipeline is an ordered list of stages. "Check" stages score the current text,
+"transform" stages replace it. Intermediate artifacts (segmentation, metrics,
+check results) are keyed by a hash of the text they were computed from, so a
+re-check of unchanged text is free, and identical LLM prompts within a run are
+answered from a per-run memo. Transforms whose LLM prompt only fits part of
+a document are applied chunk by chunk (`transform_in_chunks`).
+"""
+import hashlib
+import re
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+# Set for the duration of a pipeline run; generate_with_groq consults it.
+active_llm_memo = ContextVar("active_llm_memo", default=None)
+
+
+class LLMMemo:
+    """Per-run memo of LLM outputs keyed by (system prompt, prompt, max tokens)."""
+
+    def __init__(self):
+        self._outputs = {}
+        self.hits = 0
+        self.calls = 0
+
+    def get(self, key) -> Optional[str]:
+        if key in self._outputs:
+            self.hits += 1
+            return self._outputs[key]
+        return None
+
+    def put(self, key, output: str) -> None:
+        self.calls += 1
+        self._outputs[key] = output
+
+
+class PipelineContext:
+    """Current text plus artifacts computed from each version of it."""
+
+    def __init__(self, text: str):
+        self.text = text.strip()
+        self._artifacts = {}
+        self.artifact_hits = 0
+
+    def text_hash(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+    def has_artifact(self, kind: str) -> bool:
+        return (kind, self.text_hash()) in self._artifacts
+
+    def artifact(self, kind: str, compute: Callable[[], object]):
+        key = (kind, self.text_hash())
+        if key in self._artifacts:
+            self.artifact_hits += 1
+        else:
+            self._artifacts[key] = compute()
+        return self._artifacts[key]
+
+
+def split_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into chunks of at most `max_chars`, on paragraph boundaries
+    where possible, then on sentence boundaries, then hard.
+    """
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    # Pack consecutive pieces into chunks; paragraphs keep their blank line
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 2 + len(piece) <= max_chars:
+            chunks[-1] += "\n\n" + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def transform_in_chunks(text: str, transform: Callable[[str], str], max_chars: int) -> str:
+    """Apply `transform` to each chunk of `text` and join the results."""
+    if len(text) <= max_chars:
+        return transform(text)
+    return "\n\n".join(transform(chunk).strip() for chunk in split_chunks(text, max_chars))
+
+
+def condition_met(when: Optional[dict], scores: Dict[str, int]):
+    """
+    Evaluate a step condition such as {"check": "detect-ai-content", "above": 40}.
+    Returns (met, reason).
+    """
+    if not when:
+        return True, None
+    check = when.get("check")
+    if check not in scores:
+        return False, f"{check} has not run"
+    score = scores[check]
+    above = when.get("above")
+    below = when.get("below")
+    if above is not None and not score > above:
+        return False, f"{check} score {score} is not above {above}"
+    if below is not None and not score < below:
+        return False, f"{check} score {score} is not below {below}"
+    return True, None
+
+
+def run_pipeline(text: str, steps: List[dict],
+                 checks: Dict[str, Callable[[PipelineContext], dict]],
+                 transforms: Dict[str, Callable[[PipelineContext], str]]) -> dict:
+    """Run the steps in order and report what each one did."""
+    ctx = PipelineContext(text)
+    memo = LLMMemo()
+    token = active_llm_memo.set(memo)
+    scores: Dict[str, int] = {}
+    step_reports = []
+
+    try:
+        for step in steps:
+            stage = step["stage"]
+            met, reason = condition_met(step.get("when"), scores)
+            if not met:
+                step_reports.append({"stage": stage, "status": "skipped", "reason": reason})
+                continue
+
+            if stage in checks:
+                cached = ctx.has_artifact(stage)
+                result = ctx.artifact(stage, lambda: checks[stage](ctx))
+                scores[stage] = result.get("score", 0)
+                step_reports.append({"stage": stage, "status": "cached" if cached else "done", "result": result})
+            else:
+                before = len(ctx.text)
+                ctx.text = transforms[stage](ctx).strip()
+                step_reports.append({
+                    "stage": stage,
+                    "status": "done",
+                    "originalLength": before,
+                    "newLength": len(ctx.text)
+                })
+    finally:
+        active_llm_memo.reset(token)
+
+    return {
+        "text": ctx.text,
+        "scores": scores,
+        "steps": step_reports,
+        "stats": {
+            "llmCalls": memo.calls,
+            "llmCacheHits": memo.hits,
+            "artifactHits": ctx.artifact_hits
+        }
+    }
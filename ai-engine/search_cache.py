@@ -0,0 +1,123 @@
+"""
+Persistent TTL cache for web search results.
+
+Queries are normalized before lookup (case, whitespace, punctuation, and word
+order for keyword queries) so trivially different searches share an entry.
+Results live in the shared SQLite store (so every worker process sees them)
+with a configurable TTL and a bounded number of rows; empty result sets are
+cached too, with a shorter TTL (negative caching).
+"""
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from shared_state import SharedStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    results TEXT NOT NULL,
+    max_results INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query.
+    Exact-phrase queries (in double quotes) keep their word order; keyword
+    queries are order-insensitive.
+    """
+    query = query.strip()
+    phrase = len(query) > 1 and query[0] == '"' and query[-1] == '"'
+    words = re.findall(r'\w+', query.lower())
+    if phrase:
+        return '"' + " ".join(words) + '"'
+    return " ".join(sorted(words))
+
+
+class SearchCache:
+    """Search cache with TTL and size bound, stored in the shared SQLite store."""
+
+    def __init__(self, store: SharedStore, ttl: float = 86400, negative_ttl: float = 3600,
+                 max_entries: int = 10000, prune_every: int = 100):
+        self.store = store
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # Hit times not yet written back; recorded in memory so a cache hit
+        # stays a single read, and flushed in one batch before pruning
+        self._touched: Dict[str, float] = {}
+        self._touched_lock = threading.Lock()
+        self.store.connection().execute(SCHEMA)
+
+    def get(self, query: str, max_results: int) -> Optional[List[dict]]:
+        """Cached results for the query, or None on a miss/expired entry."""
+        key = normalize_query(query)
+        now = time.time()
+        conn = self.store.connection()
+        row = conn.execute(
+            "SELECT results, max_results, expires_at FROM search_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] < now:
+            self.misses += 1
+            return None
+        results = json.loads(row[0])
+        # An entry fetched with a smaller limit can't answer a larger request,
+        # unless the search had already run out of results.
+        if row[1] < max_results and len(results) >= row[1]:
+            self.misses += 1
+            return None
+        with self._touched_lock:
+            self._touched[key] = now
+            flush = len(self._touched) >= self.prune_every
+        if flush:
+            self._flush_access_times()
+        self.hits += 1
+        return results[:max_results]
+
+    def set(self, query: str, max_results: int, results: List[dict]) -> None:
+        key = normalize_query(query)
+        now = time.time()
+        ttl = self.ttl if results else self.negative_ttl
+        conn = self.store.connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO search_cache (key, results, max_results, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(results), max_results, now + ttl, now)
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self._prune(now)
+
+    def _flush_access_times(self) -> None:
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            with self.store.transaction() as conn:
+                conn.executemany(
+                    "UPDATE search_cache SET last_access = MAX(last_access, ?) WHERE key = ?",
+                    [(at, key) for key, at in touched.items()]
+                )
+
+    def _prune(self, now: float) -> None:
+        self._flush_access_times()
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        entries = self.store.connection().execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,248 @@
+"""
+Pooled, long-lived web search sessions.
+
+Creating a DDGS client per request pays a fresh TLS handshake and session
+bootstrap every time. `SearchClientManager` keeps a bounded pool of warm
+sessions (HTTP keep-alive is reused as long as the session lives), checks them
+out per query, and recycles sessions that are too old, overused or failing.
+
+Backends are pluggable: `DDGSBackend` talks to DuckDuckGo, `StubBackend` serves
+canned results so the engine can run without network access (tests, demos).
+Select one with SEARCH_BACKEND=ddgs|stub.
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from warmup import lazy_import
+
+
+class SearchBackend(ABC):
+    """Interface for search providers used by SearchClientManager."""
+
+    name = "base"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def create_session(self):
+        """Return an object with a `text(query, max_results=...)` method."""
+
+    def close_session(self, session) -> None:
+        pass
+
+
+class DDGSBackend(SearchBackend):
+    """DuckDuckGo search; `duckduckgo_search` is imported on first use."""
+    name = "ddgs"
+
+    def __init__(self):
+        self._warned = False
+
+    def _module(self):
+        module = lazy_import("duckduckgo_search")
+        if module is None and not self._warned:
+            self._warned = True
+            print("⚠️  duckduckgo-search not installed. Plagiarism search will be limited.")
+        return module
+
+    @property
+    def available(self) -> bool:
+        return self._module() is not None
+
+    def create_session(self):
+        return self._module().DDGS()
+
+    def close_session(self, session) -> None:
+        # DDGS keeps its HTTP client on the instance; close it if supported
+        client = getattr(session, "client", None)
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+
+class StubSession:
+    def __init__(self, results: Dict[str, List[dict]]):
+        self._results = results
+
+    def text(self, query: str, max_results: int = 10) -> List[dict]:
+        return list(self._results.get(query, self._results.get("*", [])))[:max_results]
+
+
+class StubBackend(SearchBackend):
+    """
+    Offline backend. Results come from a dict (or the JSON file named by
+    SEARCH_STUB_FILE) mapping query -> list of {"title", "href", "body"};
+    the "*" key is used for queries without an entry.
+    """
+    name = "stub"
+
+    def __init__(self, results: Optional[Dict[str, List[dict]]] = None):
+        if results is None:
+            path = os.getenv("SEARCH_STUB_FILE")
+            results = {}
+            if path and os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    results = json.load(f)
+        self.results = results
+
+    def create_session(self):
+        return StubSession(self.results)
+
+
+class PooledSession:
+    def __init__(self, session):
+        self.session = session
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.errors = 0
+
+
+class SearchClientManager:
+    """Bounded pool of warm search sessions with health-based recycling."""
+
+    def __init__(self, backend: SearchBackend, pool_size: int = 4, max_session_age: float = 600,
+                 max_session_uses: int = 200, max_consecutive_errors: int = 2, acquire_timeout: float = 30):
+        self.backend = backend
+        self.pool_size = pool_size
+        self.max_session_age = max_session_age
+        self.max_session_uses = max_session_uses
+        self.max_consecutive_errors = max_consecutive_errors
+        self.acquire_timeout = acquire_timeout
+        # Idle sessions (LIFO) and the open count, guarded by one condition that
+        # every release signals, whether the session is kept or discarded
+        self._idle: List[PooledSession] = []
+        self._cond = threading.Condition()
+        self._open = 0
+        self.created = 0
+        self.recycled = 0
+
+    @property
+    def available(self) -> bool:
+        return self.backend.available
+
+    def _healthy(self, pooled: PooledSession) -> bool:
+        return (time.monotonic() - pooled.created_at < self.max_session_age
+                and pooled.uses < self.max_session_uses
+                and pooled.errors < self.max_consecutive_errors)
+
+    def _close(self, sessions: List[PooledSession]) -> None:
+        for pooled in sessions:
+            self.backend.close_session(pooled.session)
+
+    def _acquire(self) -> PooledSession:
+        deadline = time.monotonic() + self.acquire_timeout
+        stale = []
+        try:
+            with self._cond:
+                while True:
+                    # Same health check for idle sessions whether or not we waited
+                    while self._idle:
+                        pooled = self._idle.pop()
+                        if self._healthy(pooled):
+                            return pooled
+                        stale.append(pooled)
+                        self._open -= 1
+                        self.recycled += 1
+                    if self._open < self.pool_size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No search session available within {self.acquire_timeout}s")
+                    # Woken by _release (a session returned or capacity freed)
+                    self._cond.wait(remaining)
+        finally:
+            self._close(stale)
+
+        try:
+            pooled = PooledSession(self.backend.create_session())
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        return pooled
+
+    def _release(self, pooled: PooledSession) -> None:
+        healthy = self._healthy(pooled)
+        with self._cond:
+            if healthy:
+                self._idle.append(pooled)
+            else:
+                self._open -= 1
+                self.recycled += 1
+            self._cond.notify()
+        if not healthy:
+            self._close([pooled])
+
+    @contextmanager
+    def session(self):
+        """Check out a warm session for the duration of the block."""
+        pooled = self._acquire()
+        pooled.uses += 1
+        try:
+            yield pooled.session
+            pooled.errors = 0
+        except Exception:
+            pooled.errors += 1
+            raise
+        finally:
+            self._release(pooled)
+
+    def text(self, query: str, max_results: int = 10) -> List[dict]:
+        with self.session() as session:
+            results = session.text(query, max_results=max_results)
+            return list(results) if results else []
+
+    def warm(self, count: Optional[int] = None) -> int:
+        """Pre-create idle sessions so the first requests don't pay for setup."""
+        created = 0
+        for _ in range(min(count or self.pool_size, self.pool_size)):
+            with self._cond:
+                if self._open >= self.pool_size:
+                    break
+                self._open += 1
+            try:
+                pooled = PooledSession(self.backend.create_session())
+            except Exception as e:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                print(f"⚠️  Search session warm-up failed: {e}")
+                break
+            with self._cond:
+                self.created += 1
+                self._idle.append(pooled)
+                self._cond.notify()
+            created += 1
+        return created
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "backend": self.backend.name,
+                "available": self.available,
+                "open": self._open,
+                "idle": len(self._idle),
+                "created": self.created,
+                "recycled": self.recycled
+            }
+
+
+def create_search_backend(name: Optional[str] = None) -> SearchBackend:
+    name = (name or os.getenv("SEARCH_BACKEND", "ddgs")).lower()
+    if name == "stub":
+        return StubBackend()
+    return DDGSBackend()
@@ -0,0 +1,186 @@
+"""
+State shared by every worker process on one machine.
+
+When main.py runs under several uvicorn/gunicorn workers, each process would
+otherwise keep its own caches and its own idea of the upstream rate limits.
+`SharedStore` is a SQLite database in WAL mode that all workers open:
+- a namespaced key/value table with TTLs (LLM outputs, search results, ...)
+- token buckets, updated inside IMMEDIATE transactions, so the Groq and DDGS
+  request rates are enforced globally rather than per worker
+- in-progress markers for cross-process single-flight of identical work
+  (no lock is held while the work runs; only exact duplicates wait)
+
+Connections are opened per process and per thread, so the store is safe to
+create before a pre-forking server forks its workers.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class SharedStore:
+    """SQLite (WAL) key/value store shared by all worker processes."""
+
+    def __init__(self, path: str, prune_every: int = 200):
+        self.path = path
+        self.prune_every = prune_every
+        self._writes = 0
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """Connection for the calling process/thread (reopened after fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """IMMEDIATE transaction: serializes writers across all processes."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, namespace: str, key: str):
+        row = self.connection().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value, ttl: float) -> None:
+        now = time.time()
+        self.connection().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.connection().execute("DELETE FROM kv WHERE expires_at < ?", (now,))
+
+    def delete(self, namespace: str, key: str) -> None:
+        self.connection().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _mark_in_progress(self, name: str, lease: float) -> bool:
+        """Set the in-progress marker for `name`; False if someone else holds it."""
+        with self.transaction() as conn:
+            now = time.time()
+            row = conn.execute(
+                "SELECT expires_at FROM kv WHERE namespace = 'inflight' AND key = ?", (name,)
+            ).fetchone()
+            if row is not None and row[0] >= now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES ('inflight', ?, 'true', ?)",
+                (name, now + lease)
+            )
+            return True
+
+    @contextmanager
+    def single_flight(self, name: str, lookup: Callable[[], object], lease: float = 120,
+                      poll_interval: float = 0.2):
+        """
+        Run identical work once across processes without holding a lock during it.
+        Yields `lookup()`'s result when one exists (waiting while another caller
+        has `name` in progress); otherwise yields None with `name` marked in
+        progress until the block exits. Markers expire after `lease` seconds, so
+        a crashed worker can't block others; waiters then do the work themselves.
+        """
+        deadline = time.monotonic() + lease
+        while True:
+            result = lookup()
+            if result is not None:
+                yield result
+                return
+            if self._mark_in_progress(name, lease):
+                break
+            if time.monotonic() > deadline:
+                yield None
+                return
+            time.sleep(poll_interval)
+        try:
+            # The previous holder may have finished between lookup and marking
+            yield lookup()
+        finally:
+            self.delete("inflight", name)
+
+
+class TokenBucket:
+    """Token bucket whose state lives in the shared store, so limits are global."""
+
+    def __init__(self, store: SharedStore, name: str, rate_per_minute: float, capacity: float):
+        if rate_per_minute <= 0 or capacity <= 0:
+            raise ValueError(f"Token bucket '{name}' needs a positive rate and capacity "
+                             f"(got rate_per_minute={rate_per_minute}, capacity={capacity})")
+        self.store = store
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+
+    def acquire(self, tokens: float = 1, timeout: float = 60) -> bool:
+        """Block until `tokens` are available; False if that takes longer than `timeout`."""
+        if tokens > self.capacity:
+            return False
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.store.transaction() as conn:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                available = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+                if available >= tokens:
+                    available -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - available) / self.rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, available, now)
+                )
+            if wait == 0.0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+def cache_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def create_shared_store(path: Optional[str] = None) -> SharedStore:
+    path = path or os.getenv("SHARED_STATE_PATH",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "shared_state.sqlite3"))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return SharedStore(path)
@@ -0,0 +1,165 @@
+"""
+Post-processing of web search hits before they are used as paper sources.
+
+Raw hits are near-duplicate deduplicated (normalized URL and title), annotated
+with a year and venue guessed from the snippet/URL, ranked against the topic
+with BM25, and cut to the top-k so only the most relevant sources reach the
+section prompts and the reference list.
+"""
+import re
+import time
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from retrieval import BM25Index
+
+TITLE_DUPLICATE_THRESHOLD = 0.85
+
+# Domain -> venue name for well-known academic hosts
+VENUE_DOMAINS = {
+    "arxiv.org": "arXiv",
+    "ieeexplore.ieee.org": "IEEE Xplore",
+    "dl.acm.org": "ACM Digital Library",
+    "link.springer.com": "Springer",
+    "sciencedirect.com": "ScienceDirect",
+    "nature.com": "Nature",
+    "science.org": "Science",
+    "ncbi.nlm.nih.gov": "PubMed Central",
+    "pubmed.ncbi.nlm.nih.gov": "PubMed",
+    "researchgate.net": "ResearchGate",
+    "semanticscholar.org": "Semantic Scholar",
+    "openreview.net": "OpenReview",
+    "proceedings.neurips.cc": "NeurIPS Proceedings",
+    "papers.nips.cc": "NeurIPS Proceedings",
+    "aclanthology.org": "ACL Anthology",
+    "mdpi.com": "MDPI",
+    "frontiersin.org": "Frontiers",
+    "plos.org": "PLOS",
+    "wiley.com": "Wiley Online Library",
+    "tandfonline.com": "Taylor & Francis Online",
+    "jmlr.org": "Journal of Machine Learning Research",
+    "wikipedia.org": "Wikipedia",
+}
+
+VENUE_PATTERNS = [
+    r'(Proceedings of (?:the )?[A-Z][\w&\- ]+?)(?=[,.;(]|\s\d|$)',
+    r'((?:IEEE|ACM) Transactions on [A-Z][\w&\- ]+?)(?=[,.;(]|\s\d|$)',
+    r'((?:International )?Journal of [A-Z][\w&\- ]+?)(?=[,.;(]|\s\d|$)',
+    r'((?:International )?Conference on [A-Z][\w&\- ]+?)(?=[,.;(]|\s\d|$)',
+]
+
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|ref|source|fbclid|gclid)$')
+
+
+def normalize_url(url: str) -> str:
+    """Scheme/www/trailing-slash/tracking-insensitive form of a URL for dedup."""
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    # arXiv: /pdf/2101.00001v2.pdf and /abs/2101.00001 are the same paper
+    arxiv = re.match(r'^/(?:abs|pdf)/(\d{4}\.\d{4,5})(?:v\d+)?(?:\.pdf)?$', path)
+    if host.endswith("arxiv.org") and arxiv:
+        path = f"/abs/{arxiv.group(1)}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+def normalize_title(title: str) -> str:
+    """Lowercased title without punctuation or a trailing " - Site Name" suffix."""
+    title = title or ""
+    suffix = re.match(r'^(.*\S)\s+[-|–—]\s+([^-|–—]+)$', title)
+    if suffix and len(suffix.group(2).split()) <= 4:
+        title = suffix.group(1)
+    return " ".join(re.findall(r'\w+', title.lower()))
+
+
+def _title_similarity(a: str, b: str) -> float:
+    words_a, words_b = set(a.split()), set(b.split())
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def extract_year(title: str, snippet: str, url: str) -> Optional[str]:
+    """Best-effort publication year from the hit; None when there is no evidence."""
+    current_year = time.localtime().tm_year
+    arxiv = re.search(r'arxiv\.org/(?:abs|pdf)/(\d{2})(\d{2})\.\d{4,5}', url or "")
+    if arxiv:
+        return f"20{arxiv.group(1)}"
+    for text in (snippet, title, url):
+        for match in re.finditer(r'(?<!\d)(19[5-9]\d|20\d{2})(?!\d)', text or ""):
+            year = int(match.group(1))
+            if year <= current_year:
+                return str(year)
+    return None
+
+
+def extract_venue(title: str, snippet: str, url: str) -> Optional[str]:
+    """Venue from a publication pattern in the snippet, else from the host."""
+    for pattern in VENUE_PATTERNS:
+        match = re.search(pattern, f"{snippet or ''} {title or ''}")
+        if match:
+            return match.group(1).strip()
+    host = urlsplit(url or "").netloc.lower()
+    for domain, venue in VENUE_DOMAINS.items():
+        if host == domain or host.endswith("." + domain):
+            return venue
+    return None
+
+
+def deduplicate_hits(hits: List[dict]) -> List[dict]:
+    """Drop hits whose URL or (near-identical) title was already seen."""
+    kept = []
+    seen_urls = set()
+    seen_titles = []
+    for hit in hits:
+        url_key = normalize_url(hit.get("href", ""))
+        title_key = normalize_title(hit.get("title", ""))
+        if url_key and url_key in seen_urls:
+            continue
+        if title_key and any(_title_similarity(title_key, t) >= TITLE_DUPLICATE_THRESHOLD for t in seen_titles):
+            continue
+        if url_key:
+            seen_urls.add(url_key)
+        if title_key:
+            seen_titles.append(title_key)
+        kept.append(hit)
+    return kept
+
+
+def process_sources(hits: List[dict], query: str, top_k: int) -> List[dict]:
+    """
+    Turn raw DDGS hits into ranked, deduplicated source records:
+    {"id", "title", "url", "snippet", "year", "venue", "score"}.
+    """
+    hits = deduplicate_hits(hits)
+
+    index = BM25Index()
+    for i, hit in enumerate(hits):
+        # Title counted twice: it says more about relevance than the snippet
+        index.add(str(i), f"{hit.get('title', '')} {hit.get('title', '')} {hit.get('body', '')}")
+    ranked = index.search(query, limit=len(hits))
+    order = [int(doc_id) for doc_id, _ in ranked]
+    scores = {int(doc_id): score for doc_id, score in ranked}
+    # Hits that share no terms with the query keep their search-engine order at the end
+    order += [i for i in range(len(hits)) if i not in scores]
+
+    sources = []
+    for i in order[:top_k]:
+        hit = hits[i]
+        title = hit.get("title", "Unknown Title")
+        url = hit.get("href", "#")
+        snippet = hit.get("body", "")
+        sources.append({
+            "id": len(sources) + 1,
+            "title": title,
+            "url": url,
+            "snippet": snippet[:200],
+            "year": extract_year(title, snippet, url),
+            "venue": extract_venue(title, snippet, url),
+            "score": round(scores.get(i, 0.0), 3)
+        })
+    return sources
+
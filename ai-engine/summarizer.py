@@ -0,0 +1,228 @@
+"""
+Extractive summarization with TextRank.
+
+Sentences become TF-IDF vectors, the sentence similarity graph is the cosine
+similarity matrix (one matrix product with NumPy), and sentences are ranked by
+PageRank power iteration over that graph. The best sentences are picked until
+the word/char budget is used up and returned in document order.
+
+The graph is quadratic in the number of sentences, so long documents are
+ranked over at most MAX_RANKED_SENTENCES candidates: the leading sentences of
+every paragraph/section, taken round-robin. That keeps the cost bounded
+(milliseconds, a few MB) however large the document, so it serves both as the
+`mode=fast` summarizer and as pre-compression before an LLM call (the model
+sees the salient sentences of a long document instead of its first N chars).
+NumPy is optional; without it a pure-Python implementation is used.
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Optional
+
+from retrieval import tokenize
+from warmup import lazy_import
+
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+MIN_SENTENCE_WORDS = 4
+# Skip a sentence whose terms overlap this much with an already chosen one
+REDUNDANCY_THRESHOLD = 0.7
+# Upper bound on the sentences in the similarity graph (n x n)
+MAX_RANKED_SENTENCES = 400
+
+
+def _split_blocks(text: str) -> List[List[str]]:
+    """Sentences of each paragraph/section (headings and blank lines end a block)."""
+    blocks = []
+    for block in re.split(r'\n\s*\n|\n(?=#)', text or ""):
+        block = " ".join(block.split())
+        if not block:
+            continue
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+(?=[A-Z0-9"(\[])', block) if s.strip()]
+        if sentences:
+            blocks.append(sentences)
+    return blocks
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences in document order (headings and blank lines also end a sentence)."""
+    return [sentence for block in _split_blocks(text) for sentence in block]
+
+
+def _preselect(blocks: List[List[str]], limit: int) -> List[int]:
+    """
+    Indices (into the flattened sentences) of the sentences to rank: all of
+    them when they fit, otherwise the first sentence of every block, then the
+    second, and so on until `limit`, so every part of the document is covered.
+    """
+    starts, offset = [], 0
+    for block in blocks:
+        starts.append(offset)
+        offset += len(block)
+    eligible = [[starts[b] + i for i, s in enumerate(block) if len(s.split()) >= MIN_SENTENCE_WORDS]
+                for b, block in enumerate(blocks)]
+    if not any(eligible):
+        eligible = [[starts[b] + i for i in range(len(block))] for b, block in enumerate(blocks)]
+    if sum(len(e) for e in eligible) <= limit:
+        return [index for e in eligible for index in e]
+
+    selected = []
+    depth = 0
+    while len(selected) < limit:
+        row = [e[depth] for e in eligible if depth < len(e)]
+        if not row:
+            break
+        selected.extend(row[:limit - len(selected)])
+        depth += 1
+    return sorted(selected)
+
+
+def _tfidf(token_lists: List[List[str]]):
+    doc_freq = Counter(term for tokens in token_lists for term in set(tokens))
+    n = len(token_lists)
+    vocabulary = {term: i for i, term in enumerate(doc_freq)}
+    idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in doc_freq.items()}
+    return vocabulary, idf
+
+
+def _rank_numpy(np, token_lists: List[List[str]]) -> List[float]:
+    vocabulary, idf = _tfidf(token_lists)
+    matrix = np.zeros((len(token_lists), len(vocabulary)))
+    for row, tokens in enumerate(token_lists):
+        for term, count in Counter(tokens).items():
+            matrix[row, vocabulary[term]] = count * idf[term]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Row-stochastic transition matrix; isolated sentences jump uniformly
+    n = len(token_lists)
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1, out_weight), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            scores = updated
+            break
+        scores = updated
+    return scores.tolist()
+
+
+def _rank_python(token_lists: List[List[str]]) -> List[float]:
+    _, idf = _tfidf(token_lists)
+    vectors = []
+    for tokens in token_lists:
+        weights = {term: count * idf[term] for term, count in Counter(tokens).items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        vectors.append({term: w / norm for term, w in weights.items()})
+
+    n = len(vectors)
+    similarity = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            small, large = (vectors[i], vectors[j]) if len(vectors[i]) < len(vectors[j]) else (vectors[j], vectors[i])
+            value = sum(w * large.get(term, 0.0) for term, w in small.items())
+            similarity[i][j] = similarity[j][i] = value
+    # Row-stochastic transition matrix; isolated sentences jump uniformly
+    transition = []
+    for row in similarity:
+        total = sum(row)
+        transition.append([value / total for value in row] if total > 0 else [1.0 / n] * n)
+
+    scores = [1.0 / n] * n
+    for _ in range(MAX_ITERATIONS):
+        updated = [
+            (1 - DAMPING) / n + DAMPING * sum(scores[i] * transition[i][j] for i in range(n))
+            for j in range(n)
+        ]
+        delta = sum(abs(a - b) for a, b in zip(updated, scores))
+        scores = updated
+        if delta < TOLERANCE:
+            break
+    return scores
+
+
+def rank_sentences(sentences: List[str]) -> List[float]:
+    """TextRank score for each sentence (NumPy when available)."""
+    if not sentences:
+        return []
+    token_lists = [tokenize(s) for s in sentences]
+    np = lazy_import("numpy")
+    if np is not None:
+        return _rank_numpy(np, token_lists)
+    return _rank_python(token_lists)
+
+
+def extract_summary(text: str, max_words: Optional[int] = None, max_chars: Optional[int] = None) -> dict:
+    """
+    Highest-ranked sentences that fit in `max_words` / `max_chars`, in
+    document order. Returns {"summary", "sentences" (indices), "total"}.
+    """
+    blocks = _split_blocks(text)
+    sentences = [sentence for block in blocks for sentence in block]
+    candidates = _preselect(blocks, MAX_RANKED_SENTENCES)
+    scores = rank_sentences([sentences[i] for i in candidates])
+    ranked = [index for _, index in sorted(zip(scores, candidates), key=lambda pair: -pair[0])]
+
+    chosen = []
+    chosen_terms = []
+    words = chars = 0
+    for index in ranked:
+        sentence = sentences[index]
+        terms = set(tokenize(sentence))
+        if any(len(terms & other) / (len(terms | other) or 1) >= REDUNDANCY_THRESHOLD for other in chosen_terms):
+            continue
+        sentence_words = len(sentence.split())
+        if max_words is not None and words + sentence_words > max_words:
+            continue
+        if max_chars is not None and chars + len(sentence) + 1 > max_chars:
+            continue
+        chosen.append(index)
+        chosen_terms.append(terms)
+        words += sentence_words
+        chars += len(sentence) + 1
+    chosen.sort()
+
+    if not chosen and ranked:
+        # Every sentence is over budget: trim the best one instead of returning nothing
+        return {
+            "summary": _trim(sentences[ranked[0]], max_words, max_chars),
+            "sentences": [ranked[0]],
+            "total": len(sentences)
+        }
+    return {
+        "summary": " ".join(sentences[i] for i in chosen),
+        "sentences": chosen,
+        "total": len(sentences)
+    }
+
+
+def _trim(sentence: str, max_words: Optional[int], max_chars: Optional[int]) -> str:
+    """Cut a sentence to the budget, marking the cut with "..." (counted in max_chars)."""
+    words = sentence.split()
+    if max_words is not None:
+        words = words[:max(1, max_words)]
+    trimmed = " ".join(words)
+    if max_chars is not None and len(trimmed) > max_chars:
+        limit = max(1, max_chars - 3)
+        trimmed = trimmed[:limit].rsplit(" ", 1)[0] if " " in trimmed[:limit] else trimmed[:limit]
+    if trimmed != sentence:
+        trimmed = trimmed.rstrip(",;:") + "..."
+        if max_chars is not None and len(trimmed) > max_chars:
+            trimmed = trimmed[:max_chars]
+    return trimmed
+
+
+def compress_for_llm(text: str, max_chars: int) -> str:
+    """
+    Fit a document into `max_chars` for a prompt: unchanged when it already
+    fits, otherwise its most salient sentences (instead of a hard truncation).
+    """
+    if len(text) <= max_chars:
+        return text
+    summary = extract_summary(text, max_chars=max_chars)["summary"]
+    return summary or text[:max_chars]
@@ -0,0 +1,103 @@
+import json
+
+from batch import BatchBudget, find_collusion, iter_plagiarism_batch, stream_ai_detection_batch
+
+SHARED = "This sentence was copied word for word by several students in the class."
+DOC_A = f"{SHARED} Student A then wrote their own closing remarks here."
+DOC_B = f"{SHARED} Student B added a different conclusion of their own."
+
+
+def split(text):
+    return [s.strip() + "." for s in text.split(".") if len(s.strip()) > 30]
+
+
+def results(items):
+    return {item["id"]: item for item in items if item["type"] == "result"}
+
+
+def test_shared_sentences_are_searched_once():
+    searched = []
+
+    def search(sentence):
+        searched.append(sentence)
+        return {"text": sentence, "similarity": 90, "source": "S", "sourceUrl": "#"} if sentence == SHARED else None
+
+    items = list(iter_plagiarism_batch([("a", DOC_A), ("b", DOC_B)], split, search, lambda t: 50, BatchBudget(10, 0)))
+    assert searched.count(SHARED) == 1
+    assert len(searched) == 3
+    by_id = results(items)
+    assert by_id["a"]["result"]["score"] == 50
+    assert by_id["a"]["result"]["sharedSentences"] == [SHARED]
+    assert by_id["a"]["result"]["collusion"][0]["id"] == "b"
+    assert items[-1]["stats"]["uniqueSentences"] == 3
+
+
+def test_failed_searches_are_reported_not_counted_as_clean():
+    def search(sentence):
+        if sentence == SHARED:
+            raise RuntimeError("rate limited")
+        return None
+
+    items = list(iter_plagiarism_batch([("a", DOC_A)], split, search, lambda t: 50, BatchBudget(10, 0)))
+    result = results(items)["a"]["result"]
+    assert result["degraded"] is True
+    assert result["searchErrors"] == 1
+    assert result["checkedSentences"] == 1
+    assert items[-1]["stats"]["searchErrors"] == 1
+
+
+def test_exhausted_budget_marks_results_degraded():
+    items = list(iter_plagiarism_batch([("a", DOC_A)], split, lambda s: None, lambda t: None, BatchBudget(0, 1)))
+    result = results(items)["a"]["result"]
+    assert result["degraded"] is True and result["score"] == 10
+
+
+def test_collusion_pairs():
+    pairs = find_collusion([("a", DOC_A), ("b", DOC_B), ("c", "Nothing in common with the others at all, entirely original.")])
+    assert [p["documents"] for p in pairs] == [["a", "b"]]
+
+
+PARAGRAPH = "A paragraph shared by two submissions, long enough to be analyzed on its own."
+
+
+def ai_batch(documents, paragraph_fn, verdict_fn, llm_calls):
+    lines = list(stream_ai_detection_batch(documents, paragraph_fn, verdict_fn, BatchBudget(0, llm_calls)))
+    return [json.loads(line) for line in lines]
+
+
+def test_shared_paragraphs_are_scored_once():
+    scored = []
+
+    def paragraph_fn(paragraph):
+        scored.append(paragraph)
+        return {"score": 40, "confidence": 60, "analysis": {"reasons": ["r"]}}
+
+    documents = [("a", f"{PARAGRAPH}\n\nOnly in the first document, written separately by its author."),
+                 ("b", PARAGRAPH)]
+    items = ai_batch(documents, paragraph_fn, lambda text, aggregate: aggregate, 0)
+    assert scored.count(PARAGRAPH) == 1 and len(scored) == 2
+    by_id = results(items)
+    assert by_id["a"]["result"]["score"] == 40
+    assert by_id["b"]["result"]["llmAssessed"] is False
+    assert items[-1]["stats"]["uniqueParagraphs"] == 2
+
+
+def test_failed_llm_verdict_is_not_llm_assessed():
+    paragraph_fn = lambda p: {"score": 30, "confidence": 60, "analysis": {"reasons": []}}
+    verdict_fn = lambda text, aggregate: {**aggregate, "degraded": True}
+    result = results(ai_batch([("a", PARAGRAPH)], paragraph_fn, verdict_fn, 1))["a"]["result"]
+    assert result["degraded"] is True and result["llmAssessed"] is False
+
+
+def test_errors_are_reported_per_document():
+    def paragraph_fn(paragraph):
+        if "bad" in paragraph:
+            raise RuntimeError("boom")
+        return {"score": 10, "confidence": 60, "analysis": {"reasons": []}}
+
+    documents = [("a", "A bad paragraph that makes the local analysis fail for this document."), ("b", PARAGRAPH)]
+    items = ai_batch(documents, paragraph_fn, lambda text, aggregate: aggregate, 0)
+    by_id = results(items)
+    assert by_id["a"]["error"] == "boom"
+    assert by_id["b"]["result"]["score"] == 10
+    assert items[-1]["stats"]["errors"] == 1
@@ -0,0 +1,41 @@
+from citations import format_ieee, parse_citation
+
+
+def test_chapter_page_range_is_removed_from_venue():
+    fields = parse_citation("Smith, J. (2020). Deep nets. In Advances in X (pp. 1-10).", "APA")
+    assert fields["journal"] == "Advances in X"
+    assert fields["type"] == "chapter"
+    assert fields["pages"] == "1-10"
+    assert "()" not in format_ieee(fields)
+
+
+def test_chapter_publisher_after_page_range():
+    fields = parse_citation(
+        "Smith, J. (2020). Deep nets. In Advances in Neural Information Processing Systems (pp. 1-10). Curran Associates.",
+        "APA")
+    assert fields["journal"] == "Advances in Neural Information Processing Systems"
+    assert fields["publisher"] == "Curran Associates"
+    assert format_ieee(fields) == (
+        'J. Smith, "Deep nets," in Advances in Neural Information Processing Systems, Curran Associates, '
+        'pp. 1-10, 2020.')
+
+
+def test_journal_article_pages():
+    fields = parse_citation("Smith, J. (2019). A study. Journal of Things, 12(3), 45-67.", "APA")
+    assert format_ieee(fields) == 'J. Smith, "A study," Journal of Things, vol. 12, no. 3, pp. 45-67, 2019.'
+
+
+def test_ieee_conference_paper():
+    fields = parse_citation(
+        'K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learning for image recognition," '
+        'in Proc. IEEE CVPR, 2016, pp. 770-778.', "IEEE")
+    assert fields["journal"] == "Proc. IEEE CVPR"
+    formatted = format_ieee(fields)
+    assert ",," not in formatted
+    assert formatted.endswith('," in Proc. IEEE CVPR, pp. 770-778, 2016.')
+
+
+def test_book_names_its_publisher():
+    fields = parse_citation("Smith, J. (2018). The book of things. Springer.", "APA")
+    assert fields["publisher"] == "Springer"
+    assert format_ieee(fields) == 'J. Smith, "The book of things," Springer, 2018.'
@@ -0,0 +1,87 @@
+import importlib
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from grammar import check_text
+
+TEXT = ("The first paragraph is fine.\n\n"
+        "This one has a zorblaxian term in it.\n\n"
+        "A third paragraph is fine too.")
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    os.environ.setdefault("SHARED_STATE_PATH", str(tmp_path_factory.mktemp("state") / "s.db"))
+    os.environ.setdefault("SEARCH_BACKEND", "stub")
+    return importlib.import_module("main")
+
+
+def texts(errors):
+    return [e["text"] for e in errors]
+
+
+def test_spelling_errors_are_offset_anchored():
+    text = "This is a speling mistake."
+    errors = check_text(text)["errors"]
+    assert texts(errors) == ["speling"]
+    assert text[errors[0]["offset"]:errors[0]["offset"] + errors[0]["length"]] == "speling"
+    assert errors[0]["suggestions"][0] == "spelling"
+
+
+def test_sentence_start_keeps_case_in_suggestions():
+    errors = check_text("Teh model works.")["errors"]
+    assert texts(errors) == ["Teh"]
+    assert errors[0]["suggestions"][0] == "The"
+
+
+def test_acronyms_and_identifiers_are_not_spell_checked():
+    result = check_text("We report mIoU for GPT-4o, BERT and ResNet50 with word2vec features.")
+    assert result["errors"] == []
+    assert result["unresolved"] == []
+
+
+def test_unknown_words_without_a_fix_are_unresolved():
+    result = check_text(TEXT)
+    assert result["errors"] == []
+    assert texts(result["unresolved"]) == ["zorblaxian"]
+
+
+def test_only_paragraphs_with_unresolved_words_are_escalated(main, monkeypatch):
+    escalated = []
+
+    def llm_grammar_errors(paragraph, base_offset):
+        escalated.append(paragraph)
+        offset = base_offset + paragraph.index("zorblaxian")
+        return [{"offset": offset, "length": 10, "text": "zorblaxian", "type": "spelling", "rule": "LLM",
+                 "message": "Unknown word", "suggestions": []}]
+
+    monkeypatch.setattr(main, "get_groq_client", lambda: object())
+    monkeypatch.setattr(main, "llm_grammar_errors", llm_grammar_errors)
+    result = main.analyze_grammar(TEXT)
+    assert escalated == ["This one has a zorblaxian term in it."]
+    assert texts(result["errors"]) == ["zorblaxian"]
+    assert result["unresolved"] == []
+    assert result["stats"]["escalatedParagraphs"] == 1
+    assert "degraded" not in result
+
+
+def test_local_mode_never_escalates(main, monkeypatch):
+    monkeypatch.setattr(main, "get_groq_client", lambda: object())
+    monkeypatch.setattr(main, "llm_grammar_errors", pytest.fail)
+    result = main.analyze_grammar(TEXT, mode="local")
+    assert texts(result["unresolved"]) == ["zorblaxian"]
+    assert result["stats"]["escalatedParagraphs"] == 0
+
+
+def test_failed_escalation_is_degraded(main, monkeypatch):
+    def llm_grammar_errors(paragraph, base_offset):
+        raise HTTPException(status_code=503, detail="rate limited")
+
+    monkeypatch.setattr(main, "get_groq_client", lambda: object())
+    monkeypatch.setattr(main, "llm_grammar_errors", llm_grammar_errors)
+    result = main.analyze_grammar(TEXT)
+    assert result["degraded"] is True
+    assert texts(result["unresolved"]) == ["zorblaxian"]
+    assert result["stats"]["escalatedParagraphs"] == 0
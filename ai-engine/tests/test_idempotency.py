@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyConflict, ResultStore, StillInProgress, fingerprint
+from shared_state import SharedStore
+
+
+@pytest.fixture
+def results(tmp_path):
+    return ResultStore(SharedStore(str(tmp_path / "state.sqlite3")), poll_interval=0.01)
+
+
+def counting(value):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_claim_states(results):
+    assert results.claim("k", "fp") == ("new", None)
+    assert results.claim("k", "fp") == ("pending", None)
+    results.complete("k", {"score": 1}, ttl=60)
+    assert results.claim("k", "fp") == ("done", {"score": 1})
+
+
+def test_result_is_replayed(results):
+    compute, calls = counting({"score": 42})
+    assert asyncio.run(results.run("k", "fp", compute, ttl=60, wait_timeout=1)) == ({"score": 42}, False)
+    assert asyncio.run(results.run("k", "fp", compute, ttl=60, wait_timeout=1)) == ({"score": 42}, True)
+    assert len(calls) == 1
+
+
+def test_concurrent_duplicates_compute_once(results):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"score": 7}
+
+    async def main():
+        return await asyncio.gather(*(results.run("k", "fp", compute, ttl=60, wait_timeout=5) for _ in range(3)))
+
+    outcomes = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in outcomes) == [False, True, True]
+
+
+def test_fingerprint_mismatch(results):
+    compute, _ = counting({"score": 1})
+    asyncio.run(results.run("k", fingerprint("e", {"text": "a"}), compute, ttl=60, wait_timeout=1))
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(results.run("k", fingerprint("e", {"text": "b"}), compute, ttl=60, wait_timeout=1))
+
+
+def test_claim_is_released_on_failure(results):
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(results.run("k", "fp", failing, ttl=60, wait_timeout=1))
+    compute, calls = counting({"score": 3})
+    assert asyncio.run(results.run("k", "fp", compute, ttl=60, wait_timeout=1)) == ({"score": 3}, False)
+    assert len(calls) == 1
+
+
+def test_unstorable_results_are_not_replayed(results):
+    compute, calls = counting({"score": 10, "degraded": True})
+    for _ in range(2):
+        result, replayed = asyncio.run(results.run("k", "fp", compute, ttl=60, wait_timeout=1,
+                                                   storable=lambda r: not r.get("degraded")))
+        assert not replayed
+    assert len(calls) == 2
+
+
+def test_waiting_on_a_pending_claim_times_out(results):
+    results.claim("k", "fp")
+    compute, _ = counting({})
+    with pytest.raises(StillInProgress):
+        asyncio.run(results.run("k", "fp", compute, ttl=60, wait_timeout=0.05))
+
+
+def test_expired_results_are_recomputed(results):
+    results.claim("k", "fp")
+    results.complete("k", {"score": 1}, ttl=-1)
+    assert results.claim("k", "fp") == ("new", None)
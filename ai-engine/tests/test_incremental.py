@@ -0,0 +1,89 @@
+from incremental import (ParagraphCache, aggregate_ai_detection, aggregate_grammar, aggregate_plagiarism,
+                         analyze_incrementally, paragraph_hash)
+
+P1 = "The first paragraph is long enough to carry weight in the document score."
+P2 = "The second paragraph is also long enough to count toward the aggregate."
+
+
+class Recorder:
+    """Batch analyzer that records the paragraphs it was asked to analyze."""
+
+    def __init__(self, score=50, degraded=False):
+        self.calls = []
+        self.score = score
+        self.degraded = degraded
+
+    def __call__(self, paragraphs):
+        self.calls.append(list(paragraphs))
+        result = {"score": self.score, "confidence": 70, "analysis": {"reasons": ["r"]}}
+        if self.degraded:
+            result["degraded"] = True
+        return [dict(result) for _ in paragraphs]
+
+
+def run(text, analyzer, cache, **kwargs):
+    return analyze_incrementally(text, {"ai": analyzer}, ["ai"], cache, **kwargs)
+
+
+def test_only_changed_paragraphs_are_recomputed_in_one_call():
+    cache = ParagraphCache()
+    analyzer = Recorder()
+    first = run(f"{P1}\n\n{P2}", analyzer, cache)
+    assert analyzer.calls == [[P1, P2]]
+    assert first["stats"] == {"paragraphs": 2, "recomputed": 2, "cached": 0}
+
+    edited = P2.replace("also", "certainly")
+    second = run(f"{P1}\n\n{edited}", analyzer, cache)
+    assert analyzer.calls[-1] == [edited]
+    assert second["stats"] == {"paragraphs": 2, "recomputed": 1, "cached": 1}
+    assert second["paragraphs"][0]["recomputed"] == [] and second["paragraphs"][1]["recomputed"] == ["ai"]
+
+
+def test_whitespace_changes_keep_the_hash():
+    assert paragraph_hash("a  b\nc") == paragraph_hash("a b c")
+
+
+def test_degraded_results_are_not_cached():
+    cache = ParagraphCache()
+    failing = Recorder(degraded=True)
+    result = run(P1, failing, cache)
+    assert result["ai"]["degraded"] is True
+    assert cache.get("ai", paragraph_hash(P1)) is None
+
+    healthy = Recorder()
+    run(P1, healthy, cache)
+    assert healthy.calls == [[P1]]
+
+
+def test_finalizer_sees_a_sample_and_the_aggregate():
+    seen = []
+
+    def finalizer(sample, aggregate):
+        seen.append((sample, aggregate["score"]))
+        return {**aggregate, "score": 99}
+
+    result = run(f"{P1}\n\n{P2}", Recorder(score=40), ParagraphCache(), finalizers={"ai": finalizer}, sample_chars=30)
+    assert seen == [(P1[:30], 40)]
+    assert result["ai"]["score"] == 99
+
+
+def test_generator_input():
+    result = run("", Recorder(), ParagraphCache(), paragraphs=iter([P1, P2]))
+    assert result["stats"]["paragraphs"] == 2
+
+
+def test_aggregation_is_length_weighted_and_ignores_short_paragraphs():
+    ai = aggregate_ai_detection([100, 300, 10], [{"score": 20}, {"score": 60}, {"score": 100}])
+    assert ai["score"] == 50
+    assert ai["analysis"]["paragraphScores"] == [20, 60, 100]
+
+    plagiarism = aggregate_plagiarism([100, 100], [
+        {"score": 0, "flaggedSentences": []},
+        {"score": 100, "flaggedSentences": [{"id": 1, "text": "x"}]},
+    ])
+    assert plagiarism["score"] == 50
+    assert plagiarism["flaggedSentences"] == [{"id": 1, "text": "x", "paragraph": 1}]
+
+    grammar = aggregate_grammar([10], [{"score": 40, "errors": [{"offset": 3}]}])
+    assert grammar["score"] == 100  # too short to weigh in
+    assert grammar["errors"] == [{"offset": 3, "paragraph": 0}]
@@ -0,0 +1,131 @@
+import io
+import os
+import time
+import zipfile
+
+import pytest
+
+from ingest import DocumentStore, UnsupportedDocument, detect_format, extract_paragraphs
+from shared_state import SharedStore
+
+DOCX_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>First </w:t></w:r><w:r><w:t>paragraph.</w:t></w:r></w:p>'
+    '<w:p></w:p>'
+    '<w:p><w:r><w:t>Second</w:t><w:tab/><w:t>paragraph.</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+)
+
+
+def make_docx() -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", DOCX_XML)
+    buffer.seek(0)
+    return buffer
+
+
+def make_pdf(pages) -> io.BytesIO:
+    """Minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3 + 2 * i} 0 R" for i in range(count)), count),
+    ]
+    font = 3 + 2 * count
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {4 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return io.BytesIO(out)
+
+
+@pytest.fixture
+def documents(tmp_path):
+    return DocumentStore(SharedStore(str(tmp_path / "state.sqlite3")), str(tmp_path / "documents"), max_chars=1000)
+
+
+def test_detect_format():
+    assert detect_format("paper.PDF") == "pdf"
+    assert detect_format("notes.md") == "text"
+    assert detect_format("upload", "application/vnd.openxmlformats-officedocument.wordprocessingml.document") == "docx"
+    assert detect_format("upload", "text/plain; charset=utf-8") == "text"
+    with pytest.raises(UnsupportedDocument):
+        detect_format("image.png", "image/png")
+
+
+def test_docx_paragraphs():
+    assert list(extract_paragraphs(make_docx(), "docx")) == ["First paragraph.", "Second\tparagraph."]
+
+
+def test_invalid_docx():
+    with pytest.raises(UnsupportedDocument):
+        list(extract_paragraphs(io.BytesIO(b"not a zip"), "docx"))
+
+
+def test_pdf_pages():
+    pytest.importorskip("pypdf")
+    assert list(extract_paragraphs(make_pdf(["Page one text.", "Page two text."]), "pdf")) == [
+        "Page one text.", "Page two text."]
+
+
+def test_text_lines_are_joined_into_paragraphs():
+    text = io.BytesIO(b"wrapped\r\nline\n\n\nnext one\n")
+    assert list(extract_paragraphs(text, "text")) == ["wrapped line", "next one"]
+
+
+def test_store_round_trip_and_content_addressed_ids(documents):
+    meta = documents.ingest(io.BytesIO(b"Alpha.\n\nBeta."), "a.txt")
+    again = documents.ingest(make_docx(), "b.docx")
+    assert meta["paragraphs"] == 2 and meta["format"] == "text"
+    assert documents.text(meta["documentId"]) == "Alpha.\n\nBeta."
+    assert list(documents.iter_paragraphs(meta["documentId"])) == ["Alpha.", "Beta."]
+    assert documents.ingest(io.BytesIO(b"Alpha.\n\n\nBeta.\n"), "c.txt")["documentId"] == meta["documentId"]
+    assert again["documentId"] != meta["documentId"]
+
+
+def test_store_limits(documents):
+    with pytest.raises(UnsupportedDocument):
+        documents.ingest(io.BytesIO(b"x" * 2000), "big.txt")
+    with pytest.raises(UnsupportedDocument):
+        documents.ingest(io.BytesIO(b"\n\n"), "empty.txt")
+    assert [name for name in os.listdir(documents.directory) if name.endswith(".part")] == []
+
+
+def test_missing_and_removed_documents(documents):
+    assert documents.meta("not-an-id") is None
+    meta = documents.ingest(io.BytesIO(b"Some text."), "a.txt")
+    os.remove(documents._path(meta["documentId"]))
+    with pytest.raises(KeyError):
+        documents.text(meta["documentId"])
+    with pytest.raises(KeyError):
+        documents.iter_paragraphs(meta["documentId"])
+
+
+def test_expired_documents_are_gone_and_cleaned_up(tmp_path):
+    documents = DocumentStore(SharedStore(str(tmp_path / "state.sqlite3")), str(tmp_path / "documents"), ttl=0.05)
+    meta = documents.ingest(io.BytesIO(b"Short lived."), "a.txt")
+    time.sleep(0.1)
+    assert documents.meta(meta["documentId"]) is None
+    documents.cleanup()
+    assert os.listdir(documents.directory) == []
+
+
+def test_delete(documents):
+    meta = documents.ingest(io.BytesIO(b"Delete me."), "a.txt")
+    assert documents.delete(meta["documentId"]) is True
+    assert documents.delete(meta["documentId"]) is False
+    assert documents.meta(meta["documentId"]) is None
@@ -0,0 +1,49 @@
+from pipeline import run_pipeline, split_chunks, transform_in_chunks
+
+MAX_CHARS = 2500
+
+
+def truncating_rewrite(text):
+    # Like paraphrase_text: only the first MAX_CHARS characters reach the model
+    return text[:MAX_CHARS].upper()
+
+
+def long_document(paragraphs=12):
+    return "\n\n".join(
+        f"Paragraph {i}. " + " ".join(f"Sentence {j} of paragraph {i} has some words in it." for j in range(8))
+        for i in range(paragraphs)
+    )
+
+
+def test_chunks_respect_the_limit_and_keep_all_text():
+    text = long_document()
+    assert len(text) > MAX_CHARS
+    chunks = split_chunks(text, MAX_CHARS)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_CHARS for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_oversized_paragraph_is_split_on_sentences():
+    paragraph = " ".join(f"Sentence number {i} is here." for i in range(200))
+    chunks = split_chunks(paragraph, MAX_CHARS)
+    assert all(len(chunk) <= MAX_CHARS for chunk in chunks)
+    assert " ".join(" ".join(c.split("\n\n")) for c in chunks) == paragraph
+
+
+def test_pipeline_transform_keeps_text_beyond_the_prompt_limit():
+    text = long_document()
+    result = run_pipeline(
+        text,
+        [{"stage": "rewrite-text"}],
+        checks={},
+        transforms={"rewrite-text": lambda ctx: transform_in_chunks(ctx.text, truncating_rewrite, MAX_CHARS)},
+    )
+    assert result["text"] == text.upper()
+    assert result["steps"][0]["newLength"] == len(text)
+
+
+def test_short_text_is_transformed_in_one_call():
+    calls = []
+    transform_in_chunks("short text", lambda t: calls.append(t) or t, MAX_CHARS)
+    assert calls == ["short text"]
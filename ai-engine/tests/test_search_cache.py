@@ -0,0 +1,71 @@
+import time
+
+from search_cache import SearchCache, normalize_query
+from shared_state import SharedStore
+
+RESULTS = [{"title": "t", "href": "h", "body": "b"}]
+
+
+def make_cache(tmp_path, **kwargs) -> SearchCache:
+    return SearchCache(SharedStore(str(tmp_path / "s.db")), **kwargs)
+
+
+def last_access(cache: SearchCache, query: str) -> float:
+    return cache.store.connection().execute(
+        "SELECT last_access FROM search_cache WHERE key = ?", (normalize_query(query),)
+    ).fetchone()[0]
+
+
+def test_keyword_queries_ignore_order_case_and_punctuation():
+    assert normalize_query("Deep  Learning, survey") == normalize_query("survey deep learning")
+
+
+def test_phrase_queries_keep_word_order():
+    assert normalize_query('"Deep learning survey"') == '"deep learning survey"'
+    assert normalize_query('"deep learning survey"') != normalize_query('"survey deep learning"')
+    assert normalize_query('"deep learning"') != normalize_query("deep learning")
+
+
+def test_hit_and_limit_check(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("deep learning", 3, RESULTS * 3)
+    assert cache.get("Learning deep", 2) == RESULTS * 2
+    # Fetched with a smaller limit and filled it: can't answer a larger request
+    assert cache.get("deep learning", 5) is None
+    cache.set("rare topic", 5, RESULTS)
+    assert cache.get("rare topic", 10) == RESULTS
+
+
+def test_empty_results_use_the_negative_ttl(tmp_path):
+    cache = make_cache(tmp_path, ttl=60, negative_ttl=0.05)
+    cache.set("nothing here", 5, [])
+    cache.set("something", 5, RESULTS)
+    assert cache.get("nothing here", 5) == []
+    time.sleep(0.1)
+    assert cache.get("nothing here", 5) is None
+    assert cache.get("something", 5) == RESULTS
+
+
+def test_hits_do_not_write_until_flushed(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("q", 5, RESULTS)
+    written = last_access(cache, "q")
+    time.sleep(0.01)
+    assert cache.get("q", 5) == RESULTS
+    assert last_access(cache, "q") == written
+    cache._flush_access_times()
+    assert last_access(cache, "q") > written
+
+
+def test_prune_drops_expired_and_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, ttl=60, negative_ttl=0.01, max_entries=2, prune_every=1000)
+    cache.set("expired", 5, [])
+    cache.set("old", 5, RESULTS)
+    cache.set("recent", 5, RESULTS)
+    cache.set("newest", 5, RESULTS)
+    time.sleep(0.02)
+    # A hit makes "old" recently used even though its row was written first
+    assert cache.get("old", 5) == RESULTS
+    cache._prune(time.time())
+    keys = {row[0] for row in cache.store.connection().execute("SELECT key FROM search_cache")}
+    assert keys == {normalize_query("old"), normalize_query("newest")}
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+from search_client import SearchClientManager, StubBackend
+
+
+class CountingBackend(StubBackend):
+    """Stub backend that records session creation and closing."""
+
+    def __init__(self, results=None):
+        super().__init__(results or {"*": [{"title": "t", "href": "h", "body": "b"}]})
+        self.closed = 0
+
+    def close_session(self, session) -> None:
+        self.closed += 1
+
+
+def test_sessions_are_reused_between_queries():
+    backend = CountingBackend()
+    manager = SearchClientManager(backend, pool_size=2)
+    for _ in range(5):
+        assert manager.text("anything") == [{"title": "t", "href": "h", "body": "b"}]
+    stats = manager.stats()
+    assert stats["created"] == 1
+    assert stats["open"] == 1 and stats["idle"] == 1
+
+
+def test_recycles_sessions_by_use_count():
+    backend = CountingBackend()
+    manager = SearchClientManager(backend, max_session_uses=2)
+    for _ in range(4):
+        manager.text("q")
+    assert manager.stats()["created"] == 2
+    assert manager.stats()["recycled"] == 2
+    assert backend.closed == 2
+
+
+def test_recycles_sessions_by_age():
+    backend = CountingBackend()
+    manager = SearchClientManager(backend, max_session_age=0.05)
+    manager.text("q")
+    time.sleep(0.1)
+    manager.text("q")
+    assert manager.stats()["created"] == 2
+    assert manager.stats()["recycled"] >= 1
+    assert backend.closed >= 1
+
+
+def test_recycles_sessions_after_consecutive_errors():
+    backend = CountingBackend()
+    manager = SearchClientManager(backend, max_consecutive_errors=2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with manager.session():
+                raise RuntimeError("search failed")
+    stats = manager.stats()
+    assert stats["recycled"] == 1 and stats["open"] == 0
+    manager.text("q")
+    assert manager.stats()["created"] == 2
+
+
+def test_success_resets_error_count():
+    manager = SearchClientManager(CountingBackend(), max_consecutive_errors=2)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            with manager.session():
+                raise RuntimeError("search failed")
+        manager.text("q")
+    assert manager.stats()["created"] == 1
+
+
+def test_exhausted_pool_waits_for_a_release():
+    manager = SearchClientManager(CountingBackend(), pool_size=1, acquire_timeout=5)
+    checked_out = threading.Event()
+    release = threading.Event()
+    acquired_at = []
+
+    def holder():
+        with manager.session():
+            checked_out.set()
+            release.wait(5)
+
+    def waiter():
+        with manager.session():
+            acquired_at.append(time.monotonic())
+
+    first = threading.Thread(target=holder)
+    first.start()
+    assert checked_out.wait(5)
+    second = threading.Thread(target=waiter)
+    second.start()
+    time.sleep(0.1)
+    assert acquired_at == []
+    released_at = time.monotonic()
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert acquired_at and acquired_at[0] >= released_at
+    stats = manager.stats()
+    assert stats["created"] == 1 and stats["open"] == 1
+
+
+def test_exhausted_pool_times_out():
+    manager = SearchClientManager(CountingBackend(), pool_size=1, acquire_timeout=0.1)
+    with manager.session():
+        with pytest.raises(TimeoutError):
+            with manager.session():
+                pass
+
+
+def test_concurrent_queries_never_exceed_pool_size():
+    manager = SearchClientManager(CountingBackend(), pool_size=3, acquire_timeout=10)
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def worker():
+        for _ in range(20):
+            with manager.session():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.001)
+                with lock:
+                    active[0] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert peak[0] <= 3
+    stats = manager.stats()
+    assert stats["created"] <= 3
+    assert stats["open"] == stats["idle"]
+
+
+def test_warm_prefills_the_pool():
+    manager = SearchClientManager(CountingBackend(), pool_size=3)
+    assert manager.warm() == 3
+    assert manager.warm() == 0
+    manager.text("q")
+    assert manager.stats()["created"] == 3
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from shared_state import SharedStore, TokenBucket
+
+
+def test_single_flight_follower_waits_for_leader(tmp_path):
+    store = SharedStore(str(tmp_path / "s.db"))
+    results = {}
+    leader_inside = threading.Event()
+    calls = []
+
+    def lookup():
+        return store.get("results", "k")
+
+    def leader():
+        with store.single_flight("k", lookup, poll_interval=0.01) as cached:
+            results["leader"] = cached
+            leader_inside.set()
+            time.sleep(0.2)
+            calls.append("leader")
+            store.set("results", "k", {"value": 1}, ttl=60)
+
+    def follower():
+        with store.single_flight("k", lookup, poll_interval=0.01) as cached:
+            results["follower"] = cached
+            if cached is None:
+                calls.append("follower")
+
+    first = threading.Thread(target=leader)
+    first.start()
+    assert leader_inside.wait(5)
+    second = threading.Thread(target=follower)
+    second.start()
+    first.join(5)
+    second.join(5)
+    assert results == {"leader": None, "follower": {"value": 1}}
+    assert calls == ["leader"]
+    assert store.get("inflight", "k") is None
+
+
+def test_single_flight_takes_over_a_stale_marker(tmp_path):
+    store = SharedStore(str(tmp_path / "s.db"))
+    # A worker that crashed while holding the marker: its lease has run out
+    store.set("inflight", "k", True, ttl=-1)
+    started = time.monotonic()
+    with store.single_flight("k", lambda: None, lease=30, poll_interval=0.01) as cached:
+        assert cached is None
+        assert store.get("inflight", "k") is True
+    assert time.monotonic() - started < 1
+    assert store.get("inflight", "k") is None
+
+
+def test_single_flight_gives_up_waiting_after_the_lease(tmp_path):
+    store = SharedStore(str(tmp_path / "s.db"))
+    store.set("inflight", "k", True, ttl=60)
+    with store.single_flight("k", lambda: None, lease=0.1, poll_interval=0.01) as cached:
+        assert cached is None
+    # The marker belongs to the other holder and is left alone
+    assert store.get("inflight", "k") is True
+
+
+def test_bucket_allows_a_burst_then_refills(tmp_path):
+    store = SharedStore(str(tmp_path / "s.db"))
+    bucket = TokenBucket(store, "b", rate_per_minute=600, capacity=2)
+    assert bucket.acquire(timeout=0)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+    started = time.monotonic()
+    # 10 tokens a second: the next one arrives within about 0.1s
+    assert bucket.acquire(timeout=1)
+    assert 0.05 < time.monotonic() - started < 0.5
+
+
+def test_bucket_state_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "s.db")
+    first = TokenBucket(SharedStore(path), "b", rate_per_minute=1, capacity=1)
+    second = TokenBucket(SharedStore(path), "b", rate_per_minute=1, capacity=1)
+    assert first.acquire(timeout=0)
+    assert not second.acquire(timeout=0)
+
+
+def test_bucket_rejects_requests_larger_than_capacity(tmp_path):
+    bucket = TokenBucket(SharedStore(str(tmp_path / "s.db")), "b", rate_per_minute=60, capacity=2)
+    assert not bucket.acquire(tokens=3, timeout=5)
+
+
+@pytest.mark.parametrize("rate, capacity", [(0, 5), (-1, 5), (30, 0)])
+def test_bucket_requires_positive_rate_and_capacity(tmp_path, rate, capacity):
+    with pytest.raises(ValueError):
+        TokenBucket(SharedStore(str(tmp_path / "s.db")), "b", rate_per_minute=rate, capacity=capacity)
@@ -0,0 +1,62 @@
+import summarizer
+from summarizer import compress_for_llm, extract_summary
+
+TEXT = (
+    "Transformer models have changed natural language processing over the last several years. "
+    "Attention lets every token in a sequence look at every other token when building representations. "
+    "Training these models requires large datasets and considerable compute budgets in practice. "
+    "Sparse attention variants reduce the quadratic cost of attention for very long documents."
+)
+
+
+def test_summary_fits_the_word_budget():
+    result = extract_summary(TEXT, max_words=30)
+    assert result["summary"]
+    assert len(result["summary"].split()) <= 30
+    assert result["total"] == 4
+
+
+def test_falls_back_to_trimmed_top_sentence_when_all_sentences_are_too_long():
+    result = extract_summary(TEXT, max_words=5)
+    assert result["summary"]
+    assert len(result["sentences"]) == 1
+    assert len(result["summary"].rstrip(".").split()) <= 5
+    top_sentence = [s for s in TEXT.split(". ")][result["sentences"][0]]
+    assert top_sentence.startswith(result["summary"].rstrip("."))
+
+
+def test_empty_text():
+    assert extract_summary("", max_words=5)["summary"] == ""
+
+
+def test_trimmed_fallback_respects_the_char_budget():
+    for max_chars in (3, 20, 50):
+        result = extract_summary(TEXT, max_chars=max_chars)
+        assert result["summary"]
+        assert len(result["summary"]) <= max_chars
+
+
+def test_long_documents_rank_a_bounded_candidate_set(monkeypatch):
+    paragraphs = [
+        f"Paragraph {p} opens with its main claim about topic {p}. "
+        f"It continues with supporting detail number one for {p}. "
+        f"Then adds a second supporting detail for item {p}."
+        for p in range(300)
+    ]
+    text = "\n\n".join(paragraphs)
+    ranked_sizes = []
+    rank = summarizer.rank_sentences
+    monkeypatch.setattr(summarizer, "rank_sentences", lambda s: ranked_sizes.append(len(s)) or rank(s))
+
+    result = extract_summary(text, max_chars=2000)
+    assert result["total"] == 900
+    assert ranked_sizes == [summarizer.MAX_RANKED_SENTENCES]
+    assert 0 < len(result["summary"]) <= 2000
+    assert len(compress_for_llm(text, 2000)) <= 2000
+
+
+def test_preselection_takes_leading_sentences_of_every_block():
+    blocks = [[f"Block {b} sentence {i} has enough words." for i in range(3)] for b in range(4)]
+    assert summarizer._preselect(blocks, 12) == list(range(12))
+    # First sentence of each block, then the second of the first blocks
+    assert summarizer._preselect(blocks, 6) == [0, 1, 3, 4, 6, 9]
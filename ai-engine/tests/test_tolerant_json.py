@@ -0,0 +1,91 @@
+from tolerant_json import TolerantJSONParser
+
+
+def parse(text, chunk_size=None):
+    events = []
+    parser = TolerantJSONParser(on_value=lambda path, value: events.append((path, value)))
+    step = chunk_size or len(text)
+    for i in range(0, len(text), step):
+        parser.feed(text[i:i + step])
+    return parser.close(), events
+
+
+def test_valid_json_round_trips():
+    value, _ = parse('{"title": "A", "sections": ["I. INTRO", "II. WORK"], "n": 3}')
+    assert value == {"title": "A", "sections": ["I. INTRO", "II. WORK"], "n": 3}
+
+
+def test_array_item_paths():
+    _, events = parse('{"sections": ["a", "b", "c"]}')
+    assert events == [(("sections", 0), "a"), (("sections", 1), "b"), (("sections", 2), "c")]
+
+
+def test_paths_of_objects_nested_in_arrays():
+    value, events = parse('{"a": [1, 2, {"b": "c"}, [3, {"d": 4}]]}')
+    assert value == {"a": [1, 2, {"b": "c"}, [3, {"d": 4}]]}
+    assert events == [
+        (("a", 0), 1),
+        (("a", 1), 2),
+        (("a", 2, "b"), "c"),
+        (("a", 3, 0), 3),
+        (("a", 3, 1, "d"), 4),
+    ]
+
+
+def test_section_objects_report_their_index():
+    _, events = parse('{"sections": [{"title": "I"}, {"title": "II"}]}')
+    assert events == [(("sections", 0, "title"), "I"), (("sections", 1, "title"), "II")]
+
+
+def test_repairs_common_model_mistakes():
+    text = ("Here is the outline:\n```json\n"
+            "{'title': 'Don't panic', sections: ['I. A' 'II. B',], "
+            '"abstract": "We study "deep" nets\nacross tasks", // note\n'
+            '"ok": True, "missing": None}\n```')
+    value, _ = parse(text)
+    assert value == {
+        "title": "Don't panic",
+        "sections": ["I. A", "II. B"],
+        "abstract": 'We study "deep" nets\nacross tasks',
+        "ok": True,
+        "missing": None,
+    }
+
+
+def test_truncated_output_is_closed():
+    value, _ = parse('{"title": "T", "sections": ["I. INTRO", "II. REL')
+    assert value == {"title": "T", "sections": ["I. INTRO", "II. REL"]}
+
+
+def test_values_are_reported_before_the_stream_ends():
+    events = []
+    parser = TolerantJSONParser(on_value=lambda path, value: events.append((path, value)))
+    parser.feed('{"title": "X", "sections": ["I. A", "II. B"], "abstract": "long')
+    assert events == [(("title",), "X"), (("sections", 0), "I. A"), (("sections", 1), "II. B")]
+
+
+def test_chunking_does_not_change_the_result():
+    text = '```json\n{"title": "A \\"q\\" \\u00e9", "sections": ["I", "II",], "k": [1.5, false]}\n```'
+    expected = parse(text)
+    for size in (1, 2, 3, 7):
+        assert parse(text, size) == expected
+
+
+def test_curly_quotes_inside_valid_json_are_kept():
+    text = '{"title": "Why “Deep” Learning Works", "abstract": "a “scaling law”, then more", "sections": ["I"]}'
+    for size in (None, 1, 5):
+        value, _ = parse(text, size)
+        assert value == {"title": "Why “Deep” Learning Works",
+                         "abstract": "a “scaling law”, then more", "sections": ["I"]}
+
+
+def test_curly_quoted_strings_close_on_curly_quotes():
+    value, _ = parse('{“title”: “A”, "n": 1}')
+    assert value == {"title": "A", "n": 1}
+
+
+def test_truncated_values_are_not_reported():
+    _, events = parse('{"title": "T", "sections": ["I. INTRO", "II. REL')
+    assert events == [(("title",), "T"), (("sections", 0), "I. INTRO")]
+    _, events = parse('{"n": 1, "m": 12')
+    assert events == [(("n",), 1)]
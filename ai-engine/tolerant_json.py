@@ -0,0 +1,256 @@
+"""
+Incremental, tolerant JSON parsing for LLM output.
+
+`TolerantJSONParser` is fed text chunk by chunk (e.g. while a completion is
+streamed) and reports every scalar value as soon as it is complete, with its
+path (`("sections", 2)` for the third entry of "sections"). It rewrites what
+it reads into valid JSON on the fly, repairing the usual model mistakes:
+- code fences and prose around the object
+- trailing or missing commas, missing colons
+- single or typographic quotes, unquoted keys and words
+- unescaped quotes and raw newlines inside strings
+- Python literals (True/False/None) and // or /* */ comments
+- output cut off mid-way (open strings and containers are closed)
+Values cut off by the end of the input are kept in the result but not
+reported through `on_value`.
+"""
+import json
+import re
+from typing import Callable, Optional, Tuple
+
+# Opening quote -> quotes that may close the string. An ASCII-quoted string
+# only ends on an ASCII quote, so typographic quotes inside it are kept as text
+QUOTES = {'"': '"', "'": "'", "“": '"”', "”": '"”'}
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+LITERALS = {"true": True, "True": True, "false": False, "False": False,
+            "null": None, "None": None, "undefined": None, "NaN": None}
+# After a closing quote the next significant character must be one of these
+# (or another quote: two adjacent strings with the comma missing)
+STRUCTURAL = ',:}]`"\'“'
+WORD_RE = re.compile(r'[^\s,:\[\]{}"\'`/“”]+')
+NUMBER_RE = re.compile(r'-?\d+(\.\d+)?([eE][+-]?\d+)?')
+
+
+class TolerantJSONParser:
+    """
+    Streaming repairer: `feed()` chunks, then `close()` for the parsed value.
+    `on_value(path, value)` is called for each completed string/number/literal.
+    """
+
+    def __init__(self, on_value: Optional[Callable[[Tuple, object], None]] = None):
+        self.on_value = on_value
+        self.done = False
+        self._buffer = ""
+        self._out = []
+        # {"type": "{" | "[", "key": current key, "index": current item, "count": items}
+        self._stack = []
+        self._last = "start"  # start | open | key | colon | value | comma
+        self._string = None  # [closing quotes, chars] while inside a string
+        self._started = False
+
+    def feed(self, chunk: str) -> None:
+        if not self.done:
+            self._buffer += chunk
+            self._run(final=False)
+
+    def close(self):
+        """Finish the input, close whatever is still open and return the value."""
+        self._run(final=True)
+        if not self._started:
+            raise ValueError("No JSON object found in the output")
+        if self._string is not None:
+            self._end_string(report=False)  # cut off mid-string
+        while self._stack:
+            self._close_frame()
+        self.done = True
+        return json.loads("".join(self._out))
+
+    def text(self) -> str:
+        """Repaired JSON produced so far (valid only after close())."""
+        return "".join(self._out)
+
+    # --- Scanner ---
+    def _run(self, final: bool) -> None:
+        buffer, pos = self._buffer, 0
+        while pos < len(buffer) and not self.done:
+            if self._string is not None:
+                pos, complete = self._scan_string(buffer, pos, final)
+                if not complete:
+                    break
+                continue
+            ch = buffer[pos]
+            if not self._started:
+                # Skip fences / prose before the JSON value
+                if ch in "{[":
+                    self._started = True
+                else:
+                    pos += 1
+                continue
+            if ch.isspace() or ch == "`":
+                pos += 1
+            elif ch in QUOTES:
+                self._string = [QUOTES[ch], []]
+                pos += 1
+            elif ch in "{[":
+                self._place("open", ch)
+                self._stack.append({"type": ch, "key": None, "index": None, "count": 0})
+                pos += 1
+            elif ch in "}]":
+                self._close("{" if ch == "}" else "[")
+                pos += 1
+            elif ch == ",":
+                if self._last == "value":
+                    self._out.append(",")
+                    self._last = "comma"
+                pos += 1
+            elif ch == ":":
+                if self._last == "key":
+                    self._out.append(":")
+                    self._last = "colon"
+                pos += 1
+            elif ch == "/":
+                end = self._skip_comment(buffer, pos, final)
+                if end is None:
+                    break
+                pos = end
+            else:
+                match = WORD_RE.match(buffer, pos)
+                if match.end() == len(buffer) and not final:
+                    break  # the word may continue in the next chunk
+                # A word running into the end of the input may be cut off
+                self._word(match.group(), report=match.end() < len(buffer))
+                pos = match.end()
+        self._buffer = buffer[pos:]
+
+    def _skip_comment(self, buffer: str, pos: int, final: bool) -> Optional[int]:
+        if pos + 1 >= len(buffer):
+            return len(buffer) if final else None
+        if buffer[pos + 1] == "/":
+            end = buffer.find("\n", pos)
+        elif buffer[pos + 1] == "*":
+            end = buffer.find("*/", pos + 2)
+            end = end + 2 if end != -1 else -1
+        else:
+            return pos + 1
+        if end == -1:
+            return len(buffer) if final else None
+        return end
+
+    def _scan_string(self, buffer: str, pos: int, final: bool) -> Tuple[int, bool]:
+        closers, chars = self._string
+        while pos < len(buffer):
+            ch = buffer[pos]
+            if ch == "\\":
+                if pos + 1 >= len(buffer):
+                    # A lone trailing backslash is dropped by close()
+                    return (len(buffer) if final else pos), False
+                escaped = buffer[pos + 1]
+                if escaped == "u":
+                    if pos + 6 > len(buffer) and not final:
+                        return pos, False
+                    digits = buffer[pos + 2:pos + 6]
+                    if re.fullmatch(r'[0-9a-fA-F]{4}', digits):
+                        chars.append(chr(int(digits, 16)))
+                        pos += 6
+                        continue
+                chars.append(ESCAPES.get(escaped, escaped))
+                pos += 2
+            elif ch in closers:
+                # A quote only ends the string when structure follows it;
+                # otherwise it is an unescaped quote inside the text
+                end = pos + 1
+                newline = False
+                while end < len(buffer) and buffer[end].isspace():
+                    newline = newline or buffer[end] == "\n"
+                    end += 1
+                if end >= len(buffer) and not final:
+                    return pos, False
+                if end >= len(buffer) or newline or buffer[end] in STRUCTURAL:
+                    self._end_string()
+                    return pos + 1, True
+                chars.append(ch)
+                pos += 1
+            else:
+                chars.append(ch)
+                pos += 1
+        # Unterminated so far; close() ends it if the input stops here
+        return pos, False
+
+    def _end_string(self, report: bool = True) -> None:
+        value = "".join(self._string[1])
+        self._string = None
+        self._place("string", json.dumps(value, ensure_ascii=False), value, report)
+
+    def _word(self, word: str, report: bool = True) -> None:
+        if word in LITERALS and not self._at_key():
+            self._place("scalar", json.dumps(LITERALS[word]), LITERALS[word], report)
+        elif NUMBER_RE.fullmatch(word) and not self._at_key():
+            self._place("scalar", word, json.loads(word), report)
+        else:
+            self._place("string", json.dumps(word, ensure_ascii=False), word, report)
+
+    # --- Output ---
+    def _at_key(self) -> bool:
+        return bool(self._stack) and self._stack[-1]["type"] == "{" and self._last in ("open", "comma", "value")
+
+    def _place(self, kind: str, token: str, value=None, report: bool = True) -> None:
+        """Append a value (or container opener), inserting missing separators."""
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame["type"] == "{":
+            if self._last == "value":
+                self._out.append(",")
+                self._last = "comma"
+            if self._last in ("open", "comma"):
+                if kind != "string":
+                    self._out.append('"":')
+                    frame["key"] = ""
+                    self._last = "colon"
+                else:
+                    self._out.append(token)
+                    frame["key"] = value
+                    self._last = "key"
+                    return
+            if self._last == "key":
+                self._out.append(":")
+        elif frame is not None and self._last == "value":
+            self._out.append(",")
+
+        if frame is not None and frame["type"] == "[":
+            # Index of this item; stays current while a child container is open
+            frame["index"] = frame["count"]
+            frame["count"] += 1
+        path = self._path()
+        self._out.append(token)
+        if kind == "open":
+            self._last = "open"
+        else:
+            self._last = "value"
+            if self.on_value is not None and report:
+                self.on_value(path, value)
+
+    def _path(self) -> tuple:
+        return tuple(f["key"] if f["type"] == "{" else f["index"] for f in self._stack)
+
+    def _close(self, kind: str) -> None:
+        if not self._stack:
+            return
+        if any(frame["type"] == kind for frame in self._stack):
+            while self._close_frame() != kind:
+                pass
+        else:
+            self._close_frame()
+
+    def _close_frame(self) -> str:
+        if self._last == "comma":
+            self._out.pop()
+        elif self._last == "key":
+            self._out.append(":null")
+        elif self._last == "colon":
+            self._out.append("null")
+        frame = self._stack.pop()
+        self._out.append("}" if frame["type"] == "{" else "]")
+        self._last = "value"
+        if not self._stack:
+            self.done = True
+        return frame["type"]
+
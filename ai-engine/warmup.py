@@ -0,0 +1,95 @@
+"""
+Lazy loading of heavy optional dependencies and background warm-up.
+
+Importing `groq`, `duckduckgo_search` and `textstat` (and building the Groq
+client) at module import time delays every worker start. Instead, modules are
+imported on first use through `lazy_import`, and a `Warmup` runs the
+expensive initialization steps in a background thread right after startup.
+`/healthz` answers as soon as the process is up; `/readyz` only reports ready
+once every warm-up step has finished, so a load balancer sends traffic to warm
+workers only.
+"""
+import importlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+_modules: Dict[str, object] = {}
+_import_times: Dict[str, float] = {}
+_import_lock = threading.Lock()
+
+
+def lazy_import(name: str):
+    """Import a module on first use; returns None if it is not installed."""
+    if name in _modules:
+        return _modules[name]
+    with _import_lock:
+        if name not in _modules:
+            started = time.perf_counter()
+            try:
+                _modules[name] = importlib.import_module(name)
+            except ImportError:
+                _modules[name] = None
+            _import_times[name] = round(time.perf_counter() - started, 3)
+    return _modules[name]
+
+
+def import_times() -> Dict[str, float]:
+    """Seconds spent importing each lazily loaded module."""
+    return dict(_import_times)
+
+
+class Warmup:
+    """
+    Named initialization steps run once in a background thread.
+    A failing step is recorded (the feature stays degraded) but does not
+    keep the worker from becoming ready.
+    """
+
+    def __init__(self):
+        self.steps: List[tuple] = []
+        self.results: Dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def step(self, name: str, fn: Callable[[], object]) -> None:
+        self.steps.append((name, fn))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        for name, fn in self.steps:
+            started = time.perf_counter()
+            try:
+                detail = fn()
+                self.results[name] = {"status": "ok", "detail": detail}
+            except Exception as e:
+                print(f"⚠️  Warm-up step '{name}' failed: {e}")
+                self.results[name] = {"status": "failed", "detail": str(e)}
+            self.results[name]["seconds"] = round(time.perf_counter() - started, 3)
+        self.finished_at = time.perf_counter()
+        self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def report(self) -> dict:
+        pending = [name for name, _ in self.steps if name not in self.results]
+        return {
+            "ready": self.ready,
+            "warmupSeconds": round(self.finished_at - self.started_at, 3) if self.ready else None,
+            "steps": self.results,
+            "pending": pending,
+            "imports": import_times(),
+        }
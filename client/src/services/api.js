@@ -39,12 +39,15 @@ export const referencesAPI = {
     delete: (id) => api.delete(`/references/${id}`),
     lookupDOI: (doi) => api.get(`/references/lookup/${encodeURIComponent(doi)}`),
     searchPapers: (query) => api.get('/references/search', { params: { query } }),
-    convertToIEEE: (citation, format) => api.post('/references/convert', { citation, format })
+    convertToIEEE: (citation, format) => api.post('/references/convert', { citation, format }),
+    convertListToIEEE: (text, format) => api.post('/references/convert-list', { text, format })
 };
 
 // AI API
 export const aiAPI = {
-    generatePaper: (data) => api.post('/ai/generate-paper', data),
+    // Pass the same idempotencyKey when retrying to get the original paper back
+    generatePaper: (data, idempotencyKey) => api.post('/ai/generate-paper', data,
+        idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : undefined),
     improveText: (text, action) => api.post('/ai/improve-text', { text, action }),
     analyzeContent: (content, format) => api.post('/ai/analyze-content', { content, format }),
 
@@ -62,7 +65,19 @@ export const aiAPI = {
     getSuggestions: (text, context) => api.post('/ai/suggestions', { text, context }),
     generateLiteratureReview: (topic, papers) => api.post('/ai/generate-literature-review', { topic, papers }),
     generateAbstract: (content, maxWords) => api.post('/ai/generate-abstract', { content, maxWords }),
-    checkGrammar: (text) => api.post('/ai/check-grammar', { text })
+    checkGrammar: (text) => api.post('/ai/check-grammar', { text }),
+    analyzeIncremental: (text, checks) => api.post('/ai/analyze-incremental', { text, checks }),
+
+    // Upload a PDF/DOCX/text file once, then analyze it by documentId
+    uploadDocument: (file, onUploadProgress) => {
+        const formData = new FormData();
+        formData.append('file', file);
+        return api.post('/ai/documents/upload', formData, {
+            headers: { 'Content-Type': 'multipart/form-data' },
+            onUploadProgress
+        });
+    },
+    analyzeDocument: (documentId, checks) => api.post('/ai/analyze-incremental', { documentId, checks })
 };
 
 export default api;
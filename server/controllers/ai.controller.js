@@ -2,24 +2,64 @@ const axios = require('axios');
 const Document = require('../models/Document');
 
 const AI_ENGINE_URL = process.env.AI_ENGINE_URL || 'http://localhost:8000';
+// Sections-only paper response (see wants_compact in the AI engine)
+const COMPACT_PAPER_MEDIA_TYPE = 'application/vnd.arps.paper-compact+json';
+
+// Forward the client's Idempotency-Key (scoped to the user) so retries and
+// double submits reuse the AI engine's stored result instead of recomputing
+const idempotencyHeaders = (req) => {
+    const key = req.get('Idempotency-Key');
+    return key ? { 'Idempotency-Key': `${req.user._id}:${key}` } : {};
+};
+
+// Rebuild the markdown text of a compact paper from its sections
+// (mirrors render_paper_text in the AI engine)
+const renderPaperText = (sections) => [...sections]
+    .sort((a, b) => a.order - b.order)
+    .map((section) => {
+        switch (section.type) {
+            case 'title': return `# ${section.content}\n`;
+            case 'abstract': return `**Abstract**—${section.content}\n`;
+            case 'keywords': return `**Keywords**—${section.content}\n`;
+            case 'references': return `## ${section.title}\n\n${section.content}`;
+            default: return `## ${section.title}\n\n${section.content}\n`;
+        }
+    })
+    .join('\n');
 
 // Generate full research paper
 exports.generatePaper = async (req, res) => {
     try {
-        const { topic, keywords, domain, length } = req.body;
+        const { topic, keywords, domain, length, compact } = req.body;
+        const accept = req.get('Accept');
+        const wantsCompact = Boolean(compact) || Boolean(accept && accept.includes(COMPACT_PAPER_MEDIA_TYPE));
 
         try {
+            // Always fetch the compact form (sections only) from the engine;
+            // the full text is rendered here for clients that want it
             const response = await axios.post(`${AI_ENGINE_URL}/generate-paper`, {
                 topic,
                 keywords: keywords || [],
                 domain: domain || 'Other',
                 length: length || 'medium',
-                includeImages: false
-            }, { timeout: 120000 });
+                includeImages: false,
+                compact: true
+            }, { timeout: 120000, headers: idempotencyHeaders(req) });
+
+            const paper = response.data;
+            if (!wantsCompact) {
+                // Same shape as the engine's full response
+                delete paper.format;
+                paper.rawContent = renderPaperText(paper.sections);
+                paper.content = {
+                    type: 'doc',
+                    content: [{ type: 'paragraph', content: [{ type: 'text', text: paper.rawContent }] }]
+                };
+            }
 
             res.status(201).json({
                 message: 'Paper generated successfully',
-                ...response.data
+                ...paper
             });
         } catch (aiError) {
             // Fallback: Return mock generated paper when AI engine is unavailable
@@ -51,12 +91,15 @@ exports.generatePaper = async (req, res) => {
 // Improve/rewrite text
 exports.improveText = async (req, res) => {
     try {
-        const { text, action } = req.body;
+        const { text, action, mode, maxWords } = req.body;
         // Actions: 'grammar', 'academic_tone', 'remove_plagiarism', 'expand', 'summarize', 'professional'
+        // mode 'fast' (summarize only): local extractive summary, no LLM call
 
         const response = await axios.post(`${AI_ENGINE_URL}/improve-text`, {
             text,
-            action
+            action,
+            mode: mode || 'llm',
+            maxWords
         });
 
         res.json(response.data);
@@ -90,11 +133,12 @@ exports.analyzeContent = async (req, res) => {
 // Check plagiarism
 exports.checkPlagiarism = async (req, res) => {
     try {
-        const { text } = req.body;
+        const { text, documentId } = req.body;
 
         const response = await axios.post(`${AI_ENGINE_URL}/check-plagiarism`, {
-            text
-        });
+            text,
+            ...(documentId ? { documentId } : {})
+        }, { headers: idempotencyHeaders(req) });
 
         res.json({
             score: response.data.score,
@@ -153,7 +197,8 @@ exports.generateLiteratureReview = async (req, res) => {
 
         const response = await axios.post(`${AI_ENGINE_URL}/generate-literature-review`, {
             topic,
-            papers
+            papers: papers || [],
+            userId: String(req.user._id)
         });
 
         res.json({
@@ -168,11 +213,12 @@ exports.generateLiteratureReview = async (req, res) => {
 // Generate abstract
 exports.generateAbstract = async (req, res) => {
     try {
-        const { content, maxWords } = req.body;
+        const { content, maxWords, mode } = req.body;
 
         const response = await axios.post(`${AI_ENGINE_URL}/generate-abstract`, {
             content,
-            maxWords: maxWords || 250
+            maxWords: maxWords || 250,
+            mode: mode || 'llm'
         });
 
         res.json({
@@ -186,10 +232,11 @@ exports.generateAbstract = async (req, res) => {
 // Check grammar
 exports.checkGrammar = async (req, res) => {
     try {
-        const { text } = req.body;
+        const { text, documentId } = req.body;
 
         const response = await axios.post(`${AI_ENGINE_URL}/check-grammar`, {
-            text
+            text,
+            ...(documentId ? { documentId } : {})
         });
 
         res.json({
@@ -205,11 +252,12 @@ exports.checkGrammar = async (req, res) => {
 // Detect AI-generated content
 exports.detectAIContent = async (req, res) => {
     try {
-        const { text } = req.body;
+        const { text, documentId } = req.body;
 
         const response = await axios.post(`${AI_ENGINE_URL}/detect-ai-content`, {
-            text
-        });
+            text,
+            ...(documentId ? { documentId } : {})
+        }, { headers: idempotencyHeaders(req) });
 
         // Pass through the full response from AI engine
         res.json({
@@ -262,3 +310,79 @@ exports.humanizeText = async (req, res) => {
         res.status(500).json({ error: error.message });
     }
 };
+
+// Multipart upload (PDF/DOCX/text) streamed through to the AI engine, which
+// extracts the text and returns a documentId usable by the endpoints above
+exports.uploadDocument = async (req, res) => {
+    try {
+        const response = await axios.post(`${AI_ENGINE_URL}/documents/upload`, req, {
+            headers: {
+                'Content-Type': req.get('Content-Type'),
+                ...(req.get('Content-Length') ? { 'Content-Length': req.get('Content-Length') } : {})
+            },
+            maxBodyLength: Infinity,
+            maxContentLength: Infinity,
+            timeout: 0
+        });
+
+        res.json(response.data);
+    } catch (error) {
+        const status = error.response ? error.response.status : 500;
+        res.status(status).json({ error: error.response?.data?.detail || error.message });
+    }
+};
+
+// Incremental (per-paragraph) re-analysis for the editor
+exports.analyzeIncremental = async (req, res) => {
+    try {
+        const { text, documentId, checks } = req.body;
+
+        const response = await axios.post(`${AI_ENGINE_URL}/analyze-incremental`, {
+            text,
+            ...(documentId ? { documentId } : {}),
+            ...(checks ? { checks } : {})
+        });
+
+        res.json(response.data);
+    } catch (error) {
+        res.status(500).json({ error: error.message });
+    }
+};
+
+// Batch scans stream NDJSON (one line per document) straight through to the client
+const proxyBatch = (path) => async (req, res) => {
+    try {
+        const { documents, maxSearches, maxLLMCalls } = req.body;
+
+        const response = await axios.post(`${AI_ENGINE_URL}${path}`, {
+            documents,
+            ...(maxSearches !== undefined ? { maxSearches } : {}),
+            ...(maxLLMCalls !== undefined ? { maxLLMCalls } : {})
+        }, { responseType: 'stream', timeout: 0 });
+
+        res.setHeader('Content-Type', 'application/x-ndjson');
+        response.data.pipe(res);
+    } catch (error) {
+        res.status(500).json({ error: error.message });
+    }
+};
+
+exports.batchCheckPlagiarism = proxyBatch('/batch/check-plagiarism');
+exports.batchDetectAIContent = proxyBatch('/batch/detect-ai-content');
+
+// Check -> rewrite -> re-check chain executed by the AI engine in one call
+exports.runPipeline = async (req, res) => {
+    try {
+        const { text, documentId, steps } = req.body;
+
+        const response = await axios.post(`${AI_ENGINE_URL}/run-pipeline`, {
+            text,
+            ...(documentId ? { documentId } : {}),
+            ...(steps ? { steps } : {})
+        });
+
+        res.json(response.data);
+    } catch (error) {
+        res.status(500).json({ error: error.message });
+    }
+};
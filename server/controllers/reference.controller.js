@@ -2,6 +2,18 @@ const Reference = require('../models/Reference');
 const Document = require('../models/Document');
 const axios = require('axios');
 
+// Keep the AI engine's per-user reference index (used for literature reviews) in sync.
+// Failures are logged only: the index is a cache and can be rebuilt with /library/sync.
+const syncLibrary = (userId, references) => {
+    axios.post(`${process.env.AI_ENGINE_URL}/library/${userId}/references`, { references })
+        .catch(err => console.log('Reference library sync failed:', err.message));
+};
+
+const removeFromLibrary = (userId, referenceId) => {
+    axios.delete(`${process.env.AI_ENGINE_URL}/library/${userId}/references/${referenceId}`)
+        .catch(err => console.log('Reference library sync failed:', err.message));
+};
+
 // Add reference
 exports.addReference = async (req, res) => {
     try {
@@ -37,6 +49,7 @@ exports.addReference = async (req, res) => {
         // Add to document
         document.references.push(reference._id);
         await document.save();
+        syncLibrary(req.user._id, [reference.toObject()]);
 
         res.status(201).json(reference);
     } catch (error) {
@@ -127,6 +140,7 @@ exports.updateReference = async (req, res) => {
         // Regenerate IEEE format
         reference.formattedIEEE = reference.toIEEEFormat();
         await reference.save();
+        syncLibrary(req.user._id, [reference.toObject()]);
 
         res.json(reference);
     } catch (error) {
@@ -154,6 +168,7 @@ exports.deleteReference = async (req, res) => {
         );
 
         await reference.deleteOne();
+        removeFromLibrary(req.user._id, reference._id);
         res.json({ message: 'Reference deleted' });
     } catch (error) {
         res.status(500).json({ error: error.message });
@@ -178,3 +193,37 @@ exports.convertToIEEE = async (req, res) => {
         res.status(500).json({ error: error.message });
     }
 };
+
+// Convert a whole reference list to IEEE (parsed locally by the AI engine)
+exports.convertListToIEEE = async (req, res) => {
+    try {
+        const { citations, text, format } = req.body;
+
+        const response = await axios.post(`${process.env.AI_ENGINE_URL}/convert-citations`, {
+            citations: citations || [],
+            text,
+            sourceFormat: format || ''
+        });
+
+        res.json(response.data);
+    } catch (error) {
+        res.status(500).json({ error: error.message });
+    }
+};
+
+// Re-import every reference from the user's documents into the AI engine index
+exports.syncLibrary = async (req, res) => {
+    try {
+        const documents = await Document.find({ owner: req.user._id }).select('_id');
+        const references = await Reference.find({ document: { $in: documents.map(d => d._id) } }).lean();
+
+        const response = await axios.post(`${process.env.AI_ENGINE_URL}/library/${req.user._id}/references`, {
+            references,
+            replace: true
+        });
+
+        res.json(response.data);
+    } catch (error) {
+        res.status(500).json({ error: error.message });
+    }
+};
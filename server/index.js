@@ -3,6 +3,7 @@ const http = require('http');
 const { Server } = require('socket.io');
 const cors = require('cors');
 const mongoose = require('mongoose');
+const { compressJson } = require('./middleware/compression');
 require('dotenv').config();
 
 const app = express();
@@ -18,6 +19,8 @@ const io = new Server(server, {
 
 // Middleware
 app.use(cors());
+// br/gzip for large JSON responses (generated papers, analysis results)
+app.use(compressJson);
 app.use(express.json({ limit: '50mb' }));
 app.use(express.urlencoded({ extended: true, limit: '50mb' }));
 
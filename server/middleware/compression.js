@@ -0,0 +1,56 @@
+const zlib = require('zlib');
+
+// JSON bodies smaller than this are sent as is
+const MIN_COMPRESS_BYTES = 1024;
+
+// {"gzip": 1, "br": 0.8, ...} from an Accept-Encoding header
+const parseAcceptEncoding = (header) => {
+    const weights = {};
+    for (const part of (header || '').split(',')) {
+        const [name, ...params] = part.split(';').map((field) => field.trim());
+        if (!name) continue;
+        const q = params.find((param) => param.startsWith('q='));
+        const weight = q ? parseFloat(q.slice(2)) : 1;
+        weights[name.toLowerCase()] = Number.isNaN(weight) ? 0 : weight;
+    }
+    return weights;
+};
+
+const chooseEncoding = (header) => {
+    const weights = parseAcceptEncoding(header);
+    let best = null;
+    for (const encoding of ['br', 'gzip']) {
+        const q = weights[encoding] ?? weights['*'] ?? 0;
+        if (q > 0 && (!best || q > best.q)) best = { encoding, q };
+    }
+    return best && best.encoding;
+};
+
+const encoders = {
+    // Quality 5 keeps brotli close to gzip speed while still compressing better
+    br: (buffer, done) => zlib.brotliCompress(buffer, { params: { [zlib.constants.BROTLI_PARAM_QUALITY]: 5 } }, done),
+    gzip: (buffer, done) => zlib.gzip(buffer, done)
+};
+
+// Compress res.json() bodies for clients that accept br/gzip (streams are left alone)
+const compressJson = (req, res, next) => {
+    const sendJson = res.json.bind(res);
+    res.json = (body) => {
+        res.vary('Accept-Encoding');
+        const encoding = chooseEncoding(req.get('Accept-Encoding'));
+        const buffer = Buffer.from(JSON.stringify(body) ?? 'null');
+        if (!encoding || buffer.length < MIN_COMPRESS_BYTES || res.get('Content-Encoding')) {
+            return sendJson(body);
+        }
+        encoders[encoding](buffer, (error, compressed) => {
+            if (error) return sendJson(body);
+            res.set('Content-Encoding', encoding);
+            res.type('application/json');
+            res.send(compressed);
+        });
+        return res;
+    };
+    next();
+};
+
+module.exports = { compressJson, chooseEncoding };
@@ -28,9 +28,20 @@ router.post('/generate-abstract', aiController.generateAbstract);
 // Validation
 router.post('/check-grammar', aiController.checkGrammar);
 router.post('/detect-ai-content', aiController.detectAIContent);
+router.post('/analyze-incremental', aiController.analyzeIncremental);
+
+// Document upload (multipart; returns a documentId the checks above accept)
+router.post('/documents/upload', aiController.uploadDocument);
+
+// Batch scans (NDJSON stream, one line per document)
+router.post('/batch/check-plagiarism', aiController.batchCheckPlagiarism);
+router.post('/batch/detect-ai-content', aiController.batchDetectAIContent);
 
 // Rewrite & Humanize
 router.post('/rewrite-text', aiController.rewriteText);
 router.post('/humanize-text', aiController.humanizeText);
 
+// Server-side check -> rewrite -> re-check pipeline
+router.post('/run-pipeline', aiController.runPipeline);
+
 module.exports = router;
@@ -12,5 +12,7 @@ router.get('/search', referenceController.searchPapers);
 router.put('/:id', referenceController.updateReference);
 router.delete('/:id', referenceController.deleteReference);
 router.post('/convert', referenceController.convertToIEEE);
+router.post('/convert-list', referenceController.convertListToIEEE);
+router.post('/library/sync', referenceController.syncLibrary);
 
 module.exports = router;